@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from browser_supervisor import UserDeadlineExceeded
+from logging_setup import log_context
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# States of an account: scraping, waiting to log in again after its session broke, or given up on.
+HEALTHY = 'healthy'
+COOLING = 'cooling'
+RETIRED = 'retired'
+
+class PassAccount:
+    def __init__(self, username: str, password: str, scraper):
+        """One PASS account with its own scraper (browser and session) and its health."""
+        self.username = username
+        self.password = password
+        self.scraper = scraper
+        self.state = HEALTHY
+        self.available_at = 0.0
+        self.consecutive_failures = 0
+        self.login_failures = 0
+        self.users = 0
+        self.success = 0
+        self.failed = 0
+        self.session_breaks = 0
+        self.failovers = 0
+        self.last_error = None
+
+    def summary(self) -> dict:
+        return {
+            'username': self.username,
+            'state': self.state,
+            'users': self.users,
+            'success': self.success,
+            'failed': self.failed,
+            'session_breaks': self.session_breaks,
+            'failovers': self.failovers,
+            'last_error': self.last_error,
+            'browser': self.scraper.supervisor.summary()
+        }
+
+class AccountPool:
+    def __init__(self, accounts: list, max_failures: int = 3, cooldown: float = 300.0, max_logins: int = 3):
+        """
+        Spread the users of a run over several PASS accounts, one thread per account, and keep
+        the run going when the session of one of them breaks.
+
+        Users are taken from one shared iterator as accounts become free. After a failed user, the
+        account's session is probed: if it is no longer valid (revoked, expired, throttled into the
+        login page), or after max_failures failures in a row, the user goes back to the queue for
+        another account (failover) and the account logs in again. An account that cannot log in
+        waits cooldown seconds (doubled at each attempt) and is retired after max_logins attempts.
+
+        Args:
+            accounts (list): PassAccount of each account, logged in or not (see login_result).
+            max_failures (int): Failures in a row after which an account's session is considered broken.
+            cooldown (float): Seconds before an account whose login failed tries again.
+            max_logins (int): Failed logins in a row before an account is retired.
+        """
+        self.accounts = accounts
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.max_logins = max_logins
+        self._cond = threading.Condition()
+        self._users = None
+        self._retry = deque()
+        self._exhausted = False
+        self._in_flight = 0
+        self._attempts = {}
+
+    def _schedule_login(self, account, error):
+        """Record a failed login: the account cools down before its next attempt, or is retired."""
+        account.login_failures += 1
+        account.last_error = error
+        if account.login_failures >= self.max_logins:
+            account.state = RETIRED
+            logger.error("PASS account %s retired after %s failed logins: %s",
+                         account.username, account.login_failures, error)
+        else:
+            delay = self.cooldown * 2 ** (account.login_failures - 1)
+            account.state = COOLING
+            account.available_at = time.monotonic() + delay
+            logger.warning("PASS account %s could not log in (%s), next attempt in %.0fs.",
+                           account.username, error, delay)
+        with self._cond:
+            self._cond.notify_all()
+
+    def login_result(self, account, error):
+        """Outcome of an account's first login (run concurrently by the caller at startup)."""
+        if error:
+            self._schedule_login(account, error)
+        else:
+            account.state = HEALTHY
+
+    def _relogin(self, account, restart: bool) -> bool:
+        error = (account.scraper.restart_browser(account.username, account.password) if restart
+                 else account.scraper.ensure_logged_in(account.username, account.password))
+        if error:
+            self._schedule_login(account, error)
+            return False
+        logger.info("PASS account %s logged in again.", account.username)
+        account.state = HEALTHY
+        account.login_failures = 0
+        account.consecutive_failures = 0
+        return True
+
+    def _finished(self) -> bool:
+        return self._exhausted and not self._retry and self._in_flight == 0
+
+    def _wait_cooldown(self, account) -> bool:
+        """Wait for the account's next login attempt; False if the run finished in the meantime."""
+        with self._cond:
+            while time.monotonic() < account.available_at and not self._finished():
+                self._cond.wait(min(account.available_at - time.monotonic(), 5.0))
+            return not self._finished()
+
+    def _next_user(self):
+        """The next user to process: a user failed over by another account first, then the iterator."""
+        with self._cond:
+            while True:
+                if self._retry:
+                    self._in_flight += 1
+                    return self._retry.popleft()
+                if not self._exhausted:
+                    try:
+                        user = next(self._users)
+                    except StopIteration:
+                        self._exhausted = True
+                        self._cond.notify_all()
+                        continue
+                    self._in_flight += 1
+                    return user
+                if self._in_flight == 0:
+                    return None
+                # Users still in progress elsewhere may be failed over to this account.
+                self._cond.wait(1.0)
+
+    def _done(self, user=None):
+        """A user left this account: finished, or failed over (user given) to the others."""
+        with self._cond:
+            self._in_flight -= 1
+            if user is not None:
+                self._attempts[user.get('id')] = self._attempts.get(user.get('id'), 0) + 1
+                self._retry.append(user)
+            self._cond.notify_all()
+
+    def _session_broken(self, account, error) -> bool:
+        if isinstance(error, UserDeadlineExceeded):
+            # The supervisor killed the browser and restarts it before the next user.
+            return False
+        if account.consecutive_failures >= self.max_failures:
+            return True
+        return not account.scraper.is_pass_session_valid()
+
+    def _work(self, account, process, on_success, on_failure):
+        with log_context(account=account.username):
+            while account.state != RETIRED:
+                if account.state == COOLING:
+                    if not self._wait_cooldown(account):
+                        return
+                    self._relogin(account, restart=True)
+                    continue
+                user = self._next_user()
+                if user is None:
+                    return
+                user_id = user.get('id')
+                account.users += 1
+                started = time.monotonic()
+                try:
+                    entry = process(account, user)
+                except Exception as e:
+                    account.consecutive_failures += 1
+                    # A user is failed over at most once per account (with one account: retried once),
+                    # and never once step 8 started: some of their courses may have been posted already.
+                    with self._cond:
+                        can_fail_over = self._attempts.get(user_id, 0) < len(self.accounts)
+                    can_fail_over = can_fail_over and not account.scraper.submit_started
+                    session_broken = self._session_broken(account, e)
+                    if session_broken:
+                        account.session_breaks += 1
+                    if session_broken and can_fail_over:
+                        account.failovers += 1
+                        logger.warning("Session of PASS account %s broken (%s), "
+                                       "user #%s failed over to another account.", account.username, e, user_id)
+                        self._done(user)
+                        self._relogin(account, restart=False)
+                        continue
+                    account.failed += 1
+                    self._done()
+                    on_failure(user, e, time.monotonic() - started)
+                    if session_broken:
+                        self._relogin(account, restart=False)
+                    continue
+                account.consecutive_failures = 0
+                account.success += 1
+                self._done()
+                on_success(user, entry, time.monotonic() - started)
+
+    def run(self, users, process, on_success, on_failure):
+        """
+        Process every user with the accounts, the first one in the calling thread.
+
+        Args:
+            users (iterator): Users to process (pulled under a lock, one at a time).
+            process (callable): process(account, user) -> planning entry; raises on failure.
+            on_success (callable): on_success(user, entry, seconds), called from the account's thread.
+            on_failure (callable): on_failure(user, error, seconds), called from the account's thread.
+
+        Returns:
+            list: Users left unprocessed because every account was retired.
+        """
+        self._users = iter(users)
+        threads = [threading.Thread(target=self._work, args=(account, process, on_success, on_failure),
+                                    name=f"pass-account-{i}", daemon=True)
+                   for i, account in enumerate(self.accounts[1:], start=1)]
+        for thread in threads:
+            thread.start()
+        self._work(self.accounts[0], process, on_success, on_failure)
+        for thread in threads:
+            thread.join()
+        with self._cond:
+            left = list(self._retry)
+            self._retry.clear()
+        if left or not self._exhausted:
+            logger.error("No PASS account left: %s failed-over user(s) not processed%s.",
+                         len(left), '' if self._exhausted else ', and the rest of the user list')
+        return left
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the whole user iterator was consumed (False if every account was retired before)."""
+        return self._exhausted
+
+    def summary(self) -> list:
+        return [account.summary() for account in self.accounts]
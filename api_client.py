@@ -1,10 +1,24 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from config import Config
+from serialization import dumps
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
 
 class ApiClient:
-    def __init__(self):
-        self.base_api_url = Config.BASE_API_URL
+    def __init__(self, base_api_url=None, users_cache_file=None):
+        self.base_api_url = base_api_url or Config.BASE_API_URL
         self.token = None
+        self._credentials = None
+        self._auth_lock = threading.Lock()
+        # Local copy of the user list pages with their ETags, for conditional requests.
+        self.users_cache_file = users_cache_file or Config.USERS_CACHE_FILE or os.path.join(Config.OUTPUT_DIR, 'users_cache.json')
+        self.users_fetch_stats = {'pages': 0, 'not_modified': 0, 'bytes': 0}
 
     def authenticate(self, email, password):
         url = f"{self.base_api_url}/api/auth/login"
@@ -16,44 +30,179 @@ class ApiClient:
         self.token = data.get("token")
         if not self.token:
             raise Exception(f"No token found in API response: {data}")
+        self._credentials = (email, password)
         return self.token
 
-    def post_course(self, course_data):
+    def reauthenticate(self):
+        """Get a new token with the credentials of the last authentication (expired token)."""
+        if not self._credentials:
+            raise Exception("API client is not authenticated. Please authenticate first.")
+        return self.authenticate(*self._credentials)
+
+    def _send(self, method, url, headers=None, session=None, **kwargs):
+        """
+        Send a request with the current token. A 401 (the token expired during a long run) gets
+        a new token, once for all the threads sharing the client, and the request is sent again.
+        """
         if not self.token:
             raise Exception("API client is not authenticated. Please authenticate first.")
-        
+        for retried in (False, True):
+            token = self.token
+            resp = (session or requests).request(method, url, headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+                                                 **kwargs)
+            if resp.status_code != 401 or retried or not self._credentials:
+                return resp
+            with self._auth_lock:
+                # Another thread may have renewed the token meanwhile.
+                if self.token == token:
+                    logger.info("API token rejected (401), authenticating again.")
+                    self.reauthenticate()
+
+    def post_course(self, course_data, idempotency_key=None, session=None):
+        """
+        Args:
+            course_data (dict): The course (datetimes are sent as ISO 8601 strings)
+            idempotency_key (str): Sent as Idempotency-Key, so a retried delivery is not recorded twice
+            session (requests.Session): Keep-alive session to send the request with
+        """
         url = f"{self.base_api_url}/api/planning/courses"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}"
-        }
-        resp = requests.post(url, json=course_data, headers=headers)
+        headers = {"Content-Type": "application/json"}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        resp = self._send('POST', url, data=dumps(course_data), headers=headers, session=session)
         resp.raise_for_status()
         return resp.json()
 
+    def put_shared_course(self, course_key: str, course_data, session=None):
+        """
+        Store one course under its content key (shared-course endpoints, see Config.API_SHARED_COURSES).
+
+        Args:
+            course_key (str): course_store.course_key of the course
+            course_data (dict): The course, without user_email (datetimes are sent as ISO 8601 strings)
+        """
+        url = f"{self.base_api_url}/api/planning/courses/{course_key}"
+        headers = {"Content-Type": "application/json"}
+        resp = self._send('PUT', url, data=dumps(course_data), headers=headers, session=session)
+        resp.raise_for_status()
+
+    def put_user_course_refs(self, user_email: str, course_keys: list):
+        """Replace the planning of a user with references to shared courses (see put_shared_course)."""
+        url = f"{self.base_api_url}/api/planning/users/courses"
+        headers = {"Content-Type": "application/json"}
+        resp = self._send('PUT', url, data=dumps({"user_email": user_email, "course_keys": course_keys}), headers=headers)
+        resp.raise_for_status()
+
     def patch_user_pass_id(self, user_id: int, pass_id: int):
-        if not self.token:
-            raise Exception("API client is not authenticated. Please authenticate first.")
-        
         url = f"{self.base_api_url}/api/planning/users/{user_id}/passid"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}"
-        }
+        headers = {"Content-Type": "application/json"}
 
         data = {"pass_id": int(pass_id)}
-        resp = requests.patch(url, json=data, headers=headers)
+        resp = self._send('PATCH', url, json=data, headers=headers)
         resp.raise_for_status()
         return resp.json()
 
     def get_all_users(self):
-        if not self.token:
-            raise Exception("API client is not authenticated. Please authenticate first.")
+        """The whole user list (see iter_users)."""
+        return list(self.iter_users())
+
+    def _load_users_cache(self, page_size):
+        try:
+            with open(self.users_cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Pages of another size do not line up with the requested ones.
+        return cache.get('pages', {}) if cache.get('page_size') == page_size else {}
+
+    def _save_users_cache(self, page_size, pages):
+        try:
+            os.makedirs(os.path.dirname(self.users_cache_file) or '.', exist_ok=True)
+            tmp_path = f"{self.users_cache_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'page_size': page_size, 'pages': pages}, f)
+            os.replace(tmp_path, self.users_cache_file)
+        except OSError as e:
+            logger.warning("Could not write the users cache %s: %s", self.users_cache_file, e)
 
+    def _fetch_users_page(self, page, page_size, cached_page):
+        """
+        GET one page of users, conditionally if a cached copy of the page exists.
+
+        Returns:
+            tuple: (users, ETag or None)
+        """
         url = f"{self.base_api_url}/api/planning/users"
-        headers = {
-            "Authorization": f"Bearer {self.token}"
-        }
-        resp = requests.get(url, headers=headers)
+        headers = {}
+        params = {"page": page, "limit": page_size} if page_size else None
+        if cached_page and cached_page.get('etag'):
+            headers["If-None-Match"] = cached_page['etag']
+        # Later pages are fetched hours into a run: an expired token is renewed (see _send).
+        resp = self._send('GET', url, headers=headers, params=params)
+        if resp.status_code == 304:
+            self.users_fetch_stats['not_modified'] += 1
+            return cached_page['users'], cached_page['etag']
         resp.raise_for_status()
-        return resp.json()
+        self.users_fetch_stats['bytes'] += len(resp.content)
+        return resp.json(), resp.headers.get('ETag')
+
+    def iter_users(self, page_size=None, max_pages=None):
+        """
+        Iterate over the users to scrape, page by page.
+
+        The next page is fetched in the background while the current one is consumed, so callers
+        can start processing the first users right away. Each page is requested with the ETag of
+        its cached copy (If-None-Match): an unchanged page costs a 304 instead of its payload.
+        The list ends on the first page shorter than page_size; an API answering with more users
+        than asked for is not paging, and its response is taken as the whole list. It also ends on
+        a page without any user not seen on the previous pages (an API ignoring the page parameter
+        answers every page with the first one), and after max_pages pages. Users already yielded
+        are not yielded again.
+
+        Args:
+            page_size (int): Users per page, defaults to Config.USERS_PAGE_SIZE (0 fetches the list at once)
+            max_pages (int): Pages fetched at most, defaults to Config.USERS_MAX_PAGES
+
+        Yields:
+            dict: One user
+        """
+        if not self.token:
+            raise Exception("API client is not authenticated. Please authenticate first.")
+        page_size = Config.USERS_PAGE_SIZE if page_size is None else page_size
+        max_pages = Config.USERS_MAX_PAGES if max_pages is None else max_pages
+        cached_pages = self._load_users_cache(page_size)
+        fresh_pages = {}
+        self.users_fetch_stats = {'pages': 0, 'not_modified': 0, 'bytes': 0}
+
+        seen_ids = set()
+        complete = True
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='users-fetch') as executor:
+            page = 1
+            future = executor.submit(self._fetch_users_page, page, page_size, cached_pages.get(str(page)))
+            while future is not None:
+                users, etag = future.result()
+                self.users_fetch_stats['pages'] += 1
+                new_users = [user for user in users if user.get('id') not in seen_ids]
+                if users and not new_users:
+                    logger.warning("Page %s of the user list only repeats users of the previous pages "
+                                   "(is the API ignoring ?page=?), ending the listing there.", page)
+                    break
+                fresh_pages[str(page)] = {'etag': etag, 'users': users}
+                seen_ids.update(user.get('id') for user in new_users)
+                last_page = not page_size or len(users) != page_size
+                if not last_page and page >= max_pages:
+                    logger.error("User list still not finished after %s pages (USERS_MAX_PAGES), "
+                                 "ending the listing there.", max_pages)
+                    last_page, complete = True, False
+                if last_page:
+                    future = None
+                else:
+                    page += 1
+                    future = executor.submit(self._fetch_users_page, page, page_size, cached_pages.get(str(page)))
+                yield from new_users
+
+        # Only a complete listing replaces the cache (pages past the new end are dropped).
+        if complete and fresh_pages != cached_pages:
+            self._save_users_cache(page_size, fresh_pages)
+        logger.info("Users fetched: %s pages, %s not modified, %s bytes downloaded.", self.users_fetch_stats['pages'],
+                    self.users_fetch_stats['not_modified'], self.users_fetch_stats['bytes'])
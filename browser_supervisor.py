@@ -0,0 +1,175 @@
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+class UserDeadlineExceeded(Exception):
+    """A user took longer than the per-user deadline: its browser was killed."""
+
+def _process_table():
+    """{pid: (parent pid, argv list)} of every process, from /proc (empty where there is no /proc)."""
+    table = {}
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return table
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                # The command name may contain spaces and parentheses: the fields follow the last ')'.
+                ppid = int(f.read().rsplit(b')', 1)[1].split()[1])
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                # NUL-separated arguments, with a trailing NUL.
+                argv = f.read().decode('utf-8', 'replace').split('\0')[:-1]
+        except (OSError, ValueError, IndexError):
+            continue
+        table[pid] = (ppid, argv)
+    return table
+
+def browser_pids(driver) -> list:
+    """
+    Pids of the Chrome browser of a driver and of all its child processes (renderers, GPU, utilities).
+
+    The browser is found by its --user-data-dir, which every Chrome of a DriverFactory has its own of.
+    The flag is compared as a whole argument: the profile chrome-profile is not chrome-profile-2.
+    """
+    try:
+        user_data_dir = driver.capabilities.get('chrome', {}).get('userDataDir')
+    except Exception:
+        return []
+    if not user_data_dir:
+        return []
+    table = _process_table()
+    marker = f"--user-data-dir={user_data_dir}"
+    matching = {pid for pid, (_, argv) in table.items() if marker in argv}
+    roots = [pid for pid in matching if table[pid][0] not in matching]
+    children = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    pids, stack = [], list(roots)
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+def process_rss_bytes(pids) -> int:
+    """Resident memory of these processes (summed: pages shared between Chrome processes count more than once)."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+class BrowserSupervisor:
+    def __init__(self, max_users=100, max_rss_mb=1500, user_deadline=900.0):
+        """
+        Keeps one long-lived browser healthy over a run of many users.
+
+        After each user, the browser is scheduled for a restart when it has served max_users users
+        or its process tree uses more than max_rss_mb MB. A watchdog kills the browser of a user
+        running longer than user_deadline seconds, which makes the hung WebDriver call fail, and
+        schedules a restart too. Restarts happen before the next user, with a login (cheap when the
+        session is persisted), so the run goes on.
+
+        Args:
+            max_users (int): Users per browser before it is recycled (0 disables it).
+            max_rss_mb (float): Memory of the browser processes before it is recycled (0 disables it).
+            user_deadline (float): Seconds a user may take before its browser is killed (0 disables it).
+        """
+        self.max_users = max_users
+        self.max_rss_mb = max_rss_mb
+        self.user_deadline = user_deadline
+        self.users_since_restart = 0
+        self.restart_reason = None
+        self.restarts = {}
+        self.deadline_kills = 0
+        self.last_rss_mb = None
+        self.peak_rss_mb = None
+
+    def _kill(self, driver, user_id, fired):
+        fired.set()
+        pids = browser_pids(driver)
+        logger.error("User %s exceeded the %.0fs deadline, killing its browser (%s processes).",
+                     user_id, self.user_deadline, len(pids))
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        if not pids:
+            # Processes not found (no /proc): quitting from here is the next best way to unblock the driver.
+            threading.Thread(target=driver.quit, name='browser-kill', daemon=True).start()
+
+    @contextmanager
+    def watch(self, scraper, user_id):
+        """Run one user under the deadline watchdog, then check whether the browser is due for a restart."""
+        driver = scraper.driver
+        fired = threading.Event()
+        timer = None
+        if self.user_deadline:
+            timer = threading.Timer(self.user_deadline, self._kill, args=(driver, user_id, fired))
+            timer.daemon = True
+            timer.start()
+        try:
+            yield
+        except Exception as e:
+            if fired.is_set():
+                raise UserDeadlineExceeded(f"Exceeded the {self.user_deadline:.0f}s per-user deadline, browser killed ({e})") from e
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._after_user(driver, fired.is_set())
+
+    def _after_user(self, driver, killed):
+        self.users_since_restart += 1
+        if killed:
+            self.deadline_kills += 1
+            self.restart_reason = 'deadline'
+            return
+        if self.max_rss_mb:
+            self.last_rss_mb = process_rss_bytes(browser_pids(driver)) / (1024 * 1024)
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, self.last_rss_mb)
+            if self.last_rss_mb > self.max_rss_mb:
+                self.restart_reason = 'memory'
+                return
+        if self.max_users and self.users_since_restart >= self.max_users:
+            self.restart_reason = 'users'
+
+    def before_user(self, scraper, username, password):
+        """
+        Restart the browser if it was scheduled to, and log in again.
+
+        Raises:
+            Exception: If the new browser could not log in (retried before the next user).
+        """
+        if self.restart_reason is None:
+            return
+        reason = self.restart_reason
+        started = time.monotonic()
+        login_error = scraper.restart_browser(username, password, persist=reason != 'deadline')
+        if login_error:
+            raise Exception(f"Browser restarted ({reason}) but could not log in: {login_error}")
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        self.restart_reason = None
+        self.users_since_restart = 0
+        logger.info("Browser restarted (%s) and logged in again in %.1fs.", reason, time.monotonic() - started)
+
+    def summary(self) -> dict:
+        return {
+            'restarts': dict(self.restarts),
+            'deadline_kills': self.deadline_kills,
+            'last_rss_mb': round(self.last_rss_mb, 1) if self.last_rss_mb is not None else None,
+            'peak_rss_mb': round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None
+        }
@@ -5,24 +5,156 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'), override=True)
 
 class Config:
-    # Scraper credentials.
+    # Scraper credentials, checked by the modes using the browser (see require_pass_credentials).
     PASS_USERNAME = os.getenv('PASS_USERNAME', 'your_username_here')
     PASS_PASSWORD = os.getenv('PASS_PASSWORD', 'your_password_here')
+
+    # Several PASS accounts for full runs ("user1:password1,user2:password2"), each with its own browser and
+    # session, scraping users in parallel with failover. Empty: PASS_USERNAME/PASS_PASSWORD only.
+    # Each entry is split on its first ':', so passwords may contain ':' but not ','. PASS_ACCOUNTS_FILE
+    # (one username:password per line, '#' comments) takes any password and replaces PASS_ACCOUNTS.
+    PASS_ACCOUNTS = os.getenv('PASS_ACCOUNTS', '')
+    PASS_ACCOUNTS_FILE = os.getenv('PASS_ACCOUNTS_FILE', '')
+    # An account whose session broke logs in again; a failed login is retried after the cooldown (seconds,
+    # doubled each time) and the account is retired after ACCOUNT_MAX_LOGINS failed logins in a row.
+    ACCOUNT_MAX_FAILURES = int(os.getenv('ACCOUNT_MAX_FAILURES', '3'))
+    ACCOUNT_COOLDOWN_SECONDS = float(os.getenv('ACCOUNT_COOLDOWN_SECONDS', '300'))
+    ACCOUNT_MAX_LOGINS = int(os.getenv('ACCOUNT_MAX_LOGINS', '3'))
+
+    @classmethod
+    def pass_accounts(cls):
+        """
+        (username, password) of every PASS account: PASS_ACCOUNTS_FILE, PASS_ACCOUNTS, or PASS_USERNAME/PASS_PASSWORD.
+        Entries are split on their first ':' only (usernames cannot contain one, passwords can).
+        """
+        if cls.PASS_ACCOUNTS_FILE:
+            try:
+                with open(cls.PASS_ACCOUNTS_FILE, 'r', encoding='utf-8') as f:
+                    # Passwords are kept as is, spaces included.
+                    entries = [line.rstrip('\r\n') for line in f if line.strip() and not line.lstrip().startswith('#')]
+            except OSError as e:
+                raise ValueError(f"Cannot read PASS_ACCOUNTS_FILE {cls.PASS_ACCOUNTS_FILE}: {e}")
+        else:
+            entries = [entry.strip() for entry in cls.PASS_ACCOUNTS.split(',')]
+        accounts = []
+        for entry in entries:
+            username, _, password = entry.partition(':')
+            if username.strip():
+                accounts.append((username.strip(), password))
+        return accounts or [(cls.PASS_USERNAME, cls.PASS_PASSWORD)]
+
+    @classmethod
+    def require_pass_credentials(cls):
+        """Throw error if credentials are default placeholders (modes logging in to PASS only)."""
+        if cls.PASS_ACCOUNTS_FILE or cls.PASS_ACCOUNTS.strip():
+            if any(not password for _, password in cls.pass_accounts()):
+                raise ValueError("PASS_ACCOUNTS entries must be username:password, separated by commas "
+                                 "(one per line in PASS_ACCOUNTS_FILE)!")
+            return
+        if cls.PASS_USERNAME in ('', 'your_username_here') or cls.PASS_PASSWORD in ('', 'your_password_here'):
+            raise ValueError("PASS_USERNAME and PASS_PASSWORD must be set in your .env file and not use default values!")
     
-    # Throw error if credentials are default placeholders.
-    if PASS_USERNAME in ('', 'your_username_here') or PASS_PASSWORD in ('', 'your_password_here'):
-        raise ValueError("PASS_USERNAME and PASS_PASSWORD must be set in your .env file and not use default values!")
-    
+    # PASS and its CAS login, overridable to point the scraper at local stand-ins (tools/mock_pass.py).
+    PASS_BASE_URL = os.getenv('PASS_BASE_URL', 'https://pass.imt-atlantique.fr').rstrip('/')
+    CAS_BASE_URL = os.getenv('CAS_BASE_URL', 'https://cas.imt-atlantique.fr').rstrip('/')
+
     # Scraper settings.
     HEADLESS = os.getenv('HEADLESS', 'true').lower() == 'true'
     TIMEOUT = int(os.getenv('TIMEOUT', '10'))
+    # Lean driver: block images, fonts and CSS over CDP and use eager page loads.
+    LEAN_DRIVER = os.getenv('LEAN_DRIVER', 'true').lower() == 'true'
+    # Directory persisting the authenticated browser session between runs (empty disables it).
+    SESSION_DIR = os.getenv('SESSION_DIR', '')
+    # Idle pre-launched browsers kept ready by the driver factory (for long-lived processes).
+    DRIVER_POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', '0'))
+
+    # Browser supervision: recycle the browser after this many users or above this memory (MB, whole Chrome
+    # process tree), and kill it when one user takes longer than USER_DEADLINE_SECONDS (0 disables each).
+    BROWSER_RECYCLE_USERS = int(os.getenv('BROWSER_RECYCLE_USERS', '100'))
+    BROWSER_MAX_RSS_MB = float(os.getenv('BROWSER_MAX_RSS_MB', '1500'))
+    USER_DEADLINE_SECONDS = float(os.getenv('USER_DEADLINE_SECONDS', '900'))
+
+    # Adaptive (AIMD) concurrency toward PASS: bounds and the latency (seconds) considered overloaded.
+    PASS_MIN_CONCURRENCY = int(os.getenv('PASS_MIN_CONCURRENCY', '1'))
+    PASS_MAX_CONCURRENCY = int(os.getenv('PASS_MAX_CONCURRENCY', '4'))
+    PASS_TARGET_LATENCY = float(os.getenv('PASS_TARGET_LATENCY', '8'))
+
+    # Per-week retries in step 6: attempts per week and base backoff delay (seconds).
+    WEEK_MAX_ATTEMPTS = int(os.getenv('WEEK_MAX_ATTEMPTS', '3'))
+    WEEK_RETRY_BACKOFF = float(os.getenv('WEEK_RETRY_BACKOFF', '2'))
+    # Agenda tabs fetching weeks in parallel within one user session (1 disables multi-tab fetching).
+    AGENDA_TABS = int(os.getenv('AGENDA_TABS', '1'))
+    # Week parsing in step 6: 'webdriver' (each cell read through WebDriver) or 'html' (one snapshot per
+    # week, parsed by PARSE_WORKERS processes, 0 parses in the scraping thread).
+    WEEK_PARSER = os.getenv('WEEK_PARSER', 'webdriver').lower()
+    PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '2'))
+    # WebDriver commands allowed per user and step ("step5=200,step6=3000"); a warning is logged above it.
+    WEBDRIVER_BUDGETS = os.getenv('WEBDRIVER_BUDGETS', '')
     
     # Output settings.
     OUTPUT_DIR = os.getenv('OUTPUT_DIR', '/app/data')
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # Room/teacher occupancy index (OUTPUT_DIR/occupancy_index.json.gz) built after each full run.
+    OCCUPANCY_INDEX = os.getenv('OCCUPANCY_INDEX', 'true').lower() == 'true'
+    # Results files store each course once in a 'courses' table, plannings as references to it. Off by
+    # default: readers of results files outside this repository expect full plannings.
+    RESULTS_COURSE_TABLE = os.getenv('RESULTS_COURSE_TABLE', 'false').lower() == 'true'
+    # JSON encoding of results files and API requests: 'auto' (orjson if installed), 'orjson' or 'json'.
+    # Results files are compact unless RESULTS_PRETTY is set.
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+    RESULTS_PRETTY = os.getenv('RESULTS_PRETTY', 'false').lower() == 'true'
+    # Per-user iCalendar feeds written after step 7 (defaults to OUTPUT_DIR/calendars), served by the health server.
+    CALENDAR_FEEDS = os.getenv('CALENDAR_FEEDS', 'true').lower() == 'true'
+    CALENDAR_DIR = os.getenv('CALENDAR_DIR', '')
+    # Secret of the feed URLs (/calendar/<user_id>/<HMAC-SHA256(secret, user_id)[:32]>.ics); no feed is served while it is empty.
+    CALENDAR_SECRET = os.getenv('CALENDAR_SECRET', '')
+    # Logging: JSON lines instead of text, per-module levels ("selenium=WARNING,steps.step7_optimize_planning=DEBUG")
+    # and repetitions of one INFO/DEBUG message allowed per minute.
+    LOG_JSON = os.getenv('LOG_JSON', 'false').lower() == 'true'
+    LOG_MODULE_LEVELS = os.getenv('LOG_MODULE_LEVELS', '')
+    LOG_RATE_LIMIT_PER_MINUTE = int(os.getenv('LOG_RATE_LIMIT_PER_MINUTE', '20'))
+
+    # Run budget: minutes a full run may take (0 for no deadline); users not expected to finish in time
+    # are deferred to the next run. Scheduling uses the per-user history (defaults to OUTPUT_DIR/user_history.json).
+    RUN_DEADLINE_MINUTES = float(os.getenv('RUN_DEADLINE_MINUTES', '0'))
+    USER_HISTORY_FILE = os.getenv('USER_HISTORY_FILE', '')
+    # The history is saved every USER_HISTORY_SAVE_EVERY users. A user that failed is scheduled after the
+    # others for FAILURE_BACKOFF_HOURS, doubled with each failure in a row (up to a week).
+    USER_HISTORY_SAVE_EVERY = int(os.getenv('USER_HISTORY_SAVE_EVERY', '10'))
+    FAILURE_BACKOFF_HOURS = float(os.getenv('FAILURE_BACKOFF_HOURS', '6'))
+
+    # Sharded runs: shared work queue file (defaults to OUTPUT_DIR/work_queue.sqlite) and lease duration.
+    WORK_QUEUE_PATH = os.getenv('WORK_QUEUE_PATH', '')
+    WORK_QUEUE_LEASE_SECONDS = int(os.getenv('WORK_QUEUE_LEASE_SECONDS', '600'))
+
+    # User list: users per page requested from the API (0 disables paging) and local ETag cache
+    # (defaults to OUTPUT_DIR/users_cache.json).
+    USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', '100'))
+    USERS_CACHE_FILE = os.getenv('USERS_CACHE_FILE', '')
+    # Pages after which the listing is cut short (guards against an API that never ends its pages).
+    USERS_MAX_PAGES = int(os.getenv('USERS_MAX_PAGES', '1000'))
+
+    # Step 8 through the shared-course endpoints (each course stored once under its content key, plannings
+    # as references), for API versions supporting them; bypasses the outbox.
+    API_SHARED_COURSES = os.getenv('API_SHARED_COURSES', 'false').lower() == 'true'
+
+    # Outbox: step 8 queues courses on disk (defaults to OUTPUT_DIR/outbox.sqlite) and a drainer delivers them
+    # in batches of concurrent requests, retrying with backoff; the end of a run waits up to OUTBOX_DRAIN_TIMEOUT
+    # seconds for delivery, the rest is left for the next run or `run_scraper.py drain`.
+    OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'true').lower() == 'true'
+    OUTBOX_PATH = os.getenv('OUTBOX_PATH', '')
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+    OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', '4'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+    OUTBOX_RETRY_BACKOFF = float(os.getenv('OUTBOX_RETRY_BACKOFF', '5'))
+    OUTBOX_DRAIN_TIMEOUT = float(os.getenv('OUTBOX_DRAIN_TIMEOUT', '600'))
     
     # Health check.
     HEALTH_CHECK_PORT = int(os.getenv('HEALTH_CHECK_PORT', '8080'))
+    # On-demand refresh: seconds a POST /refresh/<user_id> waits for the result before answering 202.
+    REFRESH_WAIT_SECONDS = float(os.getenv('REFRESH_WAIT_SECONDS', '60'))
+    # Shared secret of the refresh endpoints (Authorization: Bearer <token>); they are disabled while it is empty.
+    REFRESH_TOKEN = os.getenv('REFRESH_TOKEN', '')
 
     # API settings
     TRANSAT_API_EMAIL = os.getenv('TRANSAT_API_EMAIL', 'your_email_here')
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+# Students of one promo or group share most of their courses. Courses are stored once under a
+# hash of their content and plannings refer to them: shared in memory during a run (CourseStore),
+# and as a course table plus per-user references in the results files (compact_results).
+
+COURSE_FIELDS = ('date', 'title', 'start_time', 'end_time', 'teacher', 'room', 'group')
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def course_key(course: dict) -> str:
+    """Stable content hash of a course: the same course of two users has the same key, across runs."""
+    content = [_json_value(course.get(field)) for field in COURSE_FIELDS]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode('utf-8')).hexdigest()[:20]
+
+class CourseStore:
+    def __init__(self):
+        """
+        Course table of a run, keyed by course_key. Interned plannings share their course
+        dictionaries: they must be treated as read-only (step 8 and the outbox copy them).
+        """
+        self.courses = {}
+        self.references = 0
+        # Course keys submitted to the API (shared-course endpoints), set once stored.
+        self._sent = {}
+        self._lock = threading.Lock()
+
+    def intern(self, planning: list) -> list:
+        """The planning with each course replaced by the store's copy of it."""
+        interned = []
+        with self._lock:
+            for course in planning:
+                interned.append(self.courses.setdefault(course_key(course), course))
+            self.references += len(planning)
+        return interned
+
+    def claim_unsent(self, keys) -> list:
+        """
+        Keys not yet submitted to the API by this store: the caller submits them, then calls finish_sending.
+        Keys claimed by another thread are left to it (see wait_sent).
+        """
+        claimed = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key not in self._sent:
+                    self._sent[key] = threading.Event()
+                    claimed.append(key)
+        return claimed
+
+    def finish_sending(self, keys, success: bool):
+        """Record the outcome of submitting claimed keys; failed ones can be claimed again."""
+        with self._lock:
+            for key in keys:
+                event = self._sent[key] if success else self._sent.pop(key)
+                event.set()
+
+    def wait_sent(self, keys, timeout: float = 60.0) -> bool:
+        """Whether all these courses are stored by the API, waiting for those other threads are submitting."""
+        for key in dict.fromkeys(keys):
+            with self._lock:
+                event = self._sent.get(key)
+            if event is None or not event.wait(timeout):
+                return False
+            with self._lock:
+                if key not in self._sent:
+                    return False
+        return True
+
+    def stats(self) -> dict:
+        return {'courses': len(self.courses), 'references': self.references,
+                'shared_ratio': round(1 - len(self.courses) / self.references, 3) if self.references else 0.0}
+
+def compact_results(results: dict) -> dict:
+    """
+    Results in the course-table format: 'courses' maps keys to courses, and each planning entry holds
+    'course_refs' instead of 'planning'. The table comes before all_plannings so the file can be streamed.
+    """
+    courses = {}
+    compact = {key: value for key, value in results.items() if key != 'all_plannings'}
+    all_plannings = {}
+    for user_id, entry in (results.get('all_plannings') or {}).items():
+        if entry.get('planning') is None:
+            all_plannings[user_id] = entry
+            continue
+        refs = []
+        for course in entry['planning']:
+            key = course_key(course)
+            courses.setdefault(key, course)
+            refs.append(key)
+        all_plannings[user_id] = {**{k: v for k, v in entry.items() if k != 'planning'}, 'course_refs': refs}
+    compact['courses'] = courses
+    compact['all_plannings'] = all_plannings
+    return compact
+
+def expand_entry(entry: dict, courses: dict) -> dict:
+    """A planning entry of either format with its full 'planning' (courses copied from the table)."""
+    if 'course_refs' not in entry:
+        return entry
+    expanded = {k: v for k, v in entry.items() if k != 'course_refs'}
+    expanded['planning'] = [dict(courses[key]) for key in entry['course_refs']]
+    return expanded
+
+def expand_results(results: dict) -> dict:
+    """Results of either format with full plannings, as run_full_scrape returns them."""
+    if 'courses' not in results:
+        return results
+    expanded = {key: value for key, value in results.items() if key != 'courses'}
+    expanded['all_plannings'] = {user_id: expand_entry(entry, results['courses'])
+                                 for user_id, entry in results.get('all_plannings', {}).items()}
+    return expanded
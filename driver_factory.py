@@ -0,0 +1,247 @@
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from session_store import ProfileInUseError, prepare_session_dir, restore_cookies
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# URL patterns for resources the parsing never reads (images, fonts, stylesheets).
+# Blocked over CDP when the driver runs in lean mode.
+LEAN_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp",
+    "*.css",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+]
+
+def build_chrome_options(headless, lean=True, profile_dir=None):
+    """
+    Build the Chrome options used by the scraper.
+
+    Args:
+        headless (bool): Run browser in headless mode
+        lean (bool): Use eager page loads and a reduced Chrome feature set
+        profile_dir (str): Persistent Chrome user data directory, if any
+
+    Returns:
+        Options: The configured Chrome options.
+    """
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+
+    if lean:
+        # Return from driver.get() once the DOM is ready, without waiting for sub-resources.
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_argument("--disable-component-update")
+        chrome_options.add_argument("--disable-default-apps")
+        chrome_options.add_argument("--disable-sync")
+        chrome_options.add_argument("--no-first-run")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--disable-features=Translate,MediaRouter,OptimizationHints")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+        })
+    return chrome_options
+
+def apply_lean_network_blocking(driver):
+    """
+    Block unneeded resource types for every request issued by the driver (CDP network blocking).
+
+    Args:
+        driver: The Selenium Chrome WebDriver instance.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URL_PATTERNS})
+
+class SharedChromeService(Service):
+    """
+    A single ChromeDriver process shared by every browser of a DriverFactory.
+
+    webdriver.Chrome starts its service on creation and stops it on quit(): here start()
+    is a no-op once the process runs, and stop() is left to the factory (shutdown()).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            process = getattr(self, 'process', None)
+            if process is not None and process.poll() is None:
+                return
+            super().start()
+            logger.info("Shared ChromeDriver service started at %s", self.service_url)
+
+    def stop(self):
+        # Called by every driver.quit(); the shared process outlives individual browsers.
+        pass
+
+    def shutdown(self):
+        """Stop the shared ChromeDriver process."""
+        if getattr(self, 'process', None) is not None:
+            super().stop()
+            self.process = None
+
+class DriverFactory:
+    def __init__(self, headless=False, lean=True, session_dir=None, pool_size=0):
+        """
+        Launch Chrome browsers through one shared ChromeDriver service, keeping pre-launched ones ready.
+
+        Args:
+            headless (bool): Run browsers in headless mode
+            lean (bool): Block images/fonts/CSS and use eager page loads
+            session_dir (str): Directory persisting the authenticated browser session, if any
+            pool_size (int): Number of idle pre-launched browsers to keep ready
+        """
+        self.headless = headless
+        self.lean = lean
+        self.session_dir = session_dir or None
+        self.pool_size = pool_size
+        self.service = SharedChromeService()
+
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._free_slots = []
+        self._next_slot = 0
+        self._slots = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(pool_size, 1), thread_name_prefix='driver-launch')
+        self._acquirer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='driver-acquire')
+        self._closed = False
+        atexit.register(self.close)
+
+    def _take_slot(self):
+        """Reserve a Chrome profile slot: two browsers cannot share one user data directory."""
+        with self._lock:
+            if self._free_slots:
+                return self._free_slots.pop(0)
+            slot = self._next_slot
+            self._next_slot += 1
+            return slot
+
+    def _launch(self):
+        """Launch one configured browser (blocking)."""
+        slot = self._take_slot()
+        try:
+            profile_dir = None
+            while self.session_dir and profile_dir is None:
+                try:
+                    profile_dir = prepare_session_dir(self.session_dir, slot)
+                except ProfileInUseError as e:
+                    # Another process (a concurrent test run) owns it: keep the slot reserved, use the next one.
+                    logger.warning("%s, using another profile slot.", e)
+                    slot = self._take_slot()
+            driver = webdriver.Chrome(
+                service=self.service,
+                options=build_chrome_options(self.headless, self.lean, profile_dir)
+            )
+            if self.lean:
+                apply_lean_network_blocking(driver)
+            if self.session_dir:
+                restore_cookies(driver, self.session_dir)
+            # The window size is already fixed by the options in headless mode.
+            if not self.headless:
+                driver.maximize_window()
+        except Exception:
+            with self._lock:
+                self._free_slots.append(slot)
+            raise
+        with self._lock:
+            self._slots[id(driver)] = slot
+        logger.info("WebDriver initialized successfully (lean=%s, profile slot %s)", self.lean, slot)
+        return driver
+
+    def _launch_into_pool(self):
+        try:
+            self._ready.put(self._launch())
+        except Exception as e:
+            # Waiting acquirers notice the pending count dropping and launch synchronously.
+            logger.error("Failed to pre-launch WebDriver: %s", e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def prewarm(self):
+        """Launch browsers in the background until pool_size of them are idle or being launched."""
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.pool_size - self._ready.qsize() - self._pending
+            self._pending += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            self._executor.submit(self._launch_into_pool)
+
+    def acquire(self):
+        """
+        Get a browser: a pre-launched one when available, otherwise a freshly launched one.
+
+        Returns:
+            WebDriver: A ready browser, owned by the caller until release().
+        """
+        while True:
+            try:
+                driver = self._ready.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            with self._lock:
+                in_flight = self._pending
+            if in_flight == 0:
+                driver = self._launch()
+                break
+            # Wait for an in-flight launch rather than starting a second Chrome in parallel.
+            try:
+                driver = self._ready.get(timeout=1)
+                break
+            except queue.Empty:
+                continue
+        self.prewarm()
+        return driver
+
+    def acquire_async(self):
+        """
+        Start acquiring a browser in the background.
+
+        Returns:
+            Future: Resolves to the WebDriver returned by acquire().
+        """
+        return self._acquirer.submit(self.acquire)
+
+    def release(self, driver):
+        """Quit a browser obtained from acquire() and free its profile slot."""
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning("Error while quitting WebDriver: %s", e)
+        with self._lock:
+            slot = self._slots.pop(id(driver), None)
+            if slot is not None:
+                self._free_slots.append(slot)
+
+    def close(self):
+        """Quit idle pre-launched browsers and stop the shared ChromeDriver service."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._acquirer.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        while not self._ready.empty():
+            self.release(self._ready.get_nowait())
+        self.service.shutdown()
@@ -0,0 +1,341 @@
+import gzip
+import hmac
+import itertools
+import json
+import logging
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Add current directory to path to import our scraper.
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from driver_factory import DriverFactory
+from logging_setup import setup_logging_from_config
+from scraper import TransatPassScraper
+from browser_supervisor import UserDeadlineExceeded
+from serialization import set_backend
+from steps.step7c_calendar_feed import calendar_path, calendar_token, HASH_PROPERTY
+
+logger = logging.getLogger(__name__)
+
+# Priorities of the refresh queue (lower runs first).
+PRIORITY_ON_DEMAND = 0
+PRIORITY_BACKGROUND = 10
+
+# Users list is re-fetched from the API at most this often (seconds).
+USERS_CACHE_SECONDS = 300
+
+def _json_default(obj):
+    return obj.isoformat() if hasattr(obj, 'isoformat') else str(obj)
+
+class RefreshWorker(threading.Thread):
+    def __init__(self):
+        """
+        Single-user planning refreshes on a warm, already logged-in browser.
+
+        Jobs are taken from a priority queue one at a time (one browser), and run the same
+        steps 3 to 8 as the nightly batch through TransatPassScraper.process_user.
+        """
+        super().__init__(name='refresh-worker', daemon=True)
+        self.jobs = {}
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._scraper = None
+        self._client = None
+        self._account = None
+        self._users = {}
+        self._users_fetched_at = 0
+
+    def submit(self, user_id: str, priority: int = PRIORITY_ON_DEMAND) -> dict:
+        """Enqueue a refresh, reusing the pending job if the user is already queued."""
+        with self._lock:
+            for job in self.jobs.values():
+                if job['user_id'] == user_id and job['status'] == 'queued':
+                    return job
+            job = {
+                'id': uuid.uuid4().hex,
+                'user_id': user_id,
+                'status': 'queued',
+                'queued_at': time.time(),
+                'done': threading.Event(),
+            }
+            self.jobs[job['id']] = job
+        self._queue.put((priority, next(self._sequence), job['id']))
+        return job
+
+    def _ensure_ready(self):
+        """Authenticate to the API and log the browser in, once; later jobs reuse both."""
+        if self._client is None:
+            client, _, api_error = self._scraper.step0_prepare_api(fetch_users=False)
+            if api_error:
+                raise Exception(api_error)
+            self._client = client
+        if self._account is None:
+            # The first PASS account (PASS_ACCOUNTS_FILE, PASS_ACCOUNTS or PASS_USERNAME/PASS_PASSWORD).
+            self._account = Config.pass_accounts()[0]
+        if not self._scraper.logged_in:
+            login_error = self._scraper.ensure_logged_in(*self._account)
+            if login_error:
+                raise Exception(login_error)
+
+    def _find_user(self, user_id: str) -> dict:
+        if time.time() - self._users_fetched_at > USERS_CACHE_SECONDS or user_id not in self._users:
+            self._users = {str(u.get('id')): u for u in self._client.get_all_users()}
+            self._users_fetched_at = time.time()
+        user = self._users.get(user_id)
+        if user is None:
+            raise LookupError(f"Unknown user id {user_id}")
+        return user
+
+    def _refresh_user(self, user_id: str) -> dict:
+        user = self._find_user(user_id)
+        entry = self._scraper.process_user_supervised(user, self._client, *self._account)
+        if self._scraper.submit_failed:
+            raise Exception("Step 8: not all courses were sent to the API")
+        return entry
+
+    def _run_job(self, job):
+        self._ensure_ready()
+        try:
+            return self._refresh_user(job['user_id'])
+        except (LookupError, UserDeadlineExceeded):
+            # Unknown user, or the browser was killed (it is restarted before the next job).
+            raise
+        except Exception as e:
+            if self._scraper.submit_started:
+                # Step 8 may already have posted some of the courses: a retry would post them again.
+                raise
+            # The PASS session or the API token may have expired since the last job: log in again and retry once.
+            logger.warning("Refresh of user %s failed (%s), logging in again and retrying.", job['user_id'], e)
+            self._scraper.logged_in = False
+            self._client = None
+            self._ensure_ready()
+            return self._refresh_user(job['user_id'])
+
+    def run(self):
+        # A separate profile from the nightly batch: two Chrome instances cannot share one.
+        session_dir = os.path.join(Config.SESSION_DIR, 'refresh') if Config.SESSION_DIR else None
+        factory = DriverFactory(headless=Config.HEADLESS, lean=Config.LEAN_DRIVER,
+                                session_dir=session_dir, pool_size=Config.DRIVER_POOL_SIZE)
+        self._scraper = TransatPassScraper(timeout=Config.TIMEOUT, session_dir=session_dir, driver_factory=factory)
+        # Warm up right away so the first request does not pay for the browser launch and login.
+        try:
+            self._ensure_ready()
+        except Exception as e:
+            logger.error("Could not warm up the refresh browser: %s", e)
+
+        while True:
+            _, _, job_id = self._queue.get()
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            started = time.monotonic()
+            try:
+                job['result'] = self._run_job(job)
+                job['status'] = 'done'
+            except LookupError as e:
+                job['status'] = 'not_found'
+                job['error'] = str(e)
+            except Exception as e:
+                logger.error("Refresh of user %s failed: %s", job['user_id'], e, exc_info=True)
+                job['status'] = 'failed'
+                job['error'] = str(e)
+            job['duration_seconds'] = round(time.monotonic() - started, 2)
+            job['done'].set()
+            self._forget_old_jobs()
+
+    def _forget_old_jobs(self, max_age=3600):
+        with self._lock:
+            now = time.time()
+            for job_id in [j for j, job in self.jobs.items() if job['done'].is_set() and now - job['queued_at'] > max_age]:
+                del self.jobs[job_id]
+
+class CalendarFeeds:
+    def __init__(self, calendar_dir, secret):
+        """
+        The calendar files written by step 7c, kept in memory with their ETag and gzipped body.
+        A poll costs a stat() of the file; it is read and compressed again only when it changed.
+
+        Args:
+            calendar_dir (str): Directory of the feeds written by step 7c.
+            secret (str): Secret the feed tokens are derived from (Config.CALENDAR_SECRET).
+        """
+        self.calendar_dir = calendar_dir
+        self.secret = secret
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, token: str):
+        """
+        Returns:
+            tuple: (ETag, body, gzipped body) of the user's feed, or None if there is none or the token is not the user's.
+        """
+        if not self.secret or not hmac.compare_digest(token.encode('ascii'),
+                                                      calendar_token(self.secret, user_id).encode('ascii')):
+            return None
+        path = calendar_path(self.calendar_dir, user_id)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        # The planning hash step 7c records in the feed identifies its content.
+        match = re.search(rf'^{HASH_PROPERTY}:(\w+)'.encode('ascii'), body, re.MULTILINE)
+        etag = f'"{match.group(1).decode("ascii") if match else version[0]}"'
+        feed = (etag, body, gzip.compress(body, compresslevel=6, mtime=0))
+        with self._lock:
+            self._cache[user_id] = (version, feed)
+        return feed
+
+def job_view(job) -> dict:
+    """Public representation of a refresh job."""
+    return {k: v for k, v in job.items() if k != 'done'}
+
+class HealthHandler(BaseHTTPRequestHandler):
+    refresh_worker = None
+    calendar_feeds = None
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _refresh_authorized(self) -> bool:
+        """Check the shared secret of the refresh endpoints, answering 403 or 401 if it is not right."""
+        if not Config.REFRESH_TOKEN:
+            self._send_json(403, {'error': 'Refresh is disabled: REFRESH_TOKEN is not set'})
+            return False
+        if self.refresh_worker is None:
+            self._send_json(403, {'error': 'Refresh is disabled: PASS credentials are not set'})
+            return False
+        scheme, _, token = self.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'),
+                                                                 Config.REFRESH_TOKEN.encode('utf-8')):
+            self._send_json(401, {'error': 'Unauthorized'}, headers={'WWW-Authenticate': 'Bearer'})
+            return False
+        return True
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'healthy', 'service': 'scraper'})
+        elif path.startswith('/calendar/'):
+            self._send_calendar(path[len('/calendar/'):])
+        elif path.startswith('/refresh/jobs/'):
+            if not self._refresh_authorized():
+                return
+            job = self.refresh_worker.jobs.get(path.rsplit('/', 1)[-1])
+            if job is None:
+                self._send_json(404, {'error': 'Unknown job'})
+            else:
+                self._send_json(200, job_view(job))
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def _send_calendar(self, name):
+        """GET /calendar/<user_id>/<token>.ics: the user's iCalendar feed, 304 if unchanged, gzipped if accepted."""
+        match = re.fullmatch(r'([A-Za-z0-9_-]+)/([0-9a-f]{32})\.ics', name)
+        feed = self.calendar_feeds.get(match.group(1), match.group(2)) if match and self.calendar_feeds else None
+        if feed is None:
+            self._send_json(404, {'error': 'Unknown calendar'})
+            return
+        etag, body, gzipped = feed
+        headers = {'ETag': etag, 'Cache-Control': 'max-age=300', 'Vary': 'Accept-Encoding'}
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+            status, body = 304, b''
+        else:
+            status = 200
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzipped
+                headers['Content-Encoding'] = 'gzip'
+            headers['Content-Type'] = 'text/calendar; charset=utf-8'
+            headers['Content-Length'] = str(len(body))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """POST /refresh/<user_id>[?wait=seconds]: refresh one user's planning now."""
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'refresh' or not parts[1]:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if not self._refresh_authorized():
+            return
+        try:
+            wait = float(parse_qs(url.query).get('wait', [Config.REFRESH_WAIT_SECONDS])[0])
+            if math.isnan(wait):
+                raise ValueError(wait)
+        except ValueError:
+            self._send_json(400, {'error': 'wait must be a number of seconds'})
+            return
+        wait = min(max(wait, 0.0), Config.REFRESH_WAIT_SECONDS)
+        job = self.refresh_worker.submit(parts[1])
+        # Answer with the result when it is ready in time, otherwise point at the job to poll.
+        if job['done'].wait(timeout=wait):
+            status = {'done': 200, 'not_found': 404}.get(job['status'], 502)
+            self._send_json(status, job_view(job))
+        else:
+            self._send_json(202, job_view(job), headers={'Location': f"/refresh/jobs/{job['id']}"})
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+def main():
+    setup_logging_from_config()
+    set_backend(Config.JSON_BACKEND)
+    # /health and the calendar feeds are served whatever the PASS configuration; only refresh needs a browser.
+    if not Config.REFRESH_TOKEN:
+        logger.warning("REFRESH_TOKEN is not set: the refresh endpoints answer 403.")
+    else:
+        try:
+            Config.require_pass_credentials()
+        except ValueError as e:
+            logger.error("Refresh disabled, the refresh endpoints answer 403: %s", e)
+        else:
+            worker = RefreshWorker()
+            worker.start()
+            HealthHandler.refresh_worker = worker
+    if Config.CALENDAR_FEEDS:
+        if not Config.CALENDAR_SECRET:
+            logger.warning("CALENDAR_SECRET is not set: no calendar feed is served.")
+        HealthHandler.calendar_feeds = CalendarFeeds(Config.CALENDAR_DIR or os.path.join(Config.OUTPUT_DIR, 'calendars'),
+                                                     Config.CALENDAR_SECRET)
+
+    server = ThreadingHTTPServer(('', Config.HEALTH_CHECK_PORT), HealthHandler)
+    print(f'Health check available at http://localhost:{Config.HEALTH_CHECK_PORT}/health')
+    print(f'On-demand refresh available at POST http://localhost:{Config.HEALTH_CHECK_PORT}/refresh/<user_id>')
+    print(f'Calendar feeds available at http://localhost:{Config.HEALTH_CHECK_PORT}/calendar/<user_id>/<token>.ics')
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Fields of the structured log context (who/what the scraper is working on, with which PASS account).
+CONTEXT_FIELDS = ('user', 'step', 'week', 'account')
+
+_log_context = contextvars.ContextVar('log_context', default={})
+# Copy of each thread's current log context, readable from other threads (the profiler's labels).
+_thread_contexts = {}
+_listener = None
+_setup_lock = threading.Lock()
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields (user, step, week, account) to every record logged inside the block, on this thread."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    _publish_thread_context()
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+        _publish_thread_context()
+
+def update_log_context(**fields):
+    """Change fields of the current log context; the enclosing log_context() restores them on exit."""
+    _log_context.set({**_log_context.get(), **fields})
+    _publish_thread_context()
+
+def current_log_context() -> dict:
+    return _log_context.get()
+
+def _publish_thread_context():
+    context = _log_context.get()
+    if context:
+        _thread_contexts[threading.get_ident()] = context
+    else:
+        _thread_contexts.pop(threading.get_ident(), None)
+
+def thread_log_contexts() -> dict:
+    """Current log context of every thread inside a log_context() block, by thread id."""
+    return dict(_thread_contexts)
+
+class ContextFilter(logging.Filter):
+    """Copy the current log context onto the record (runs on the logging thread, before queueing)."""
+    def filter(self, record):
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, context.get(field))
+        return True
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, max_per_window=20, window_seconds=60, max_keys=1000):
+        """
+        Drop repetitions of the same message template beyond max_per_window per window.
+
+        Records are keyed on (logger, template) before formatting, so lazily formatted
+        messages ("Scraped %s courses") count as one message whatever their arguments.
+        Windows are kept oldest first: expired ones are dropped on each call, and at most
+        max_keys templates are tracked (f-string messages make a template per value).
+        The suppressed count of a dropped window is kept until its template is logged again.
+        """
+        super().__init__()
+        self.max_per_window = max_per_window
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> (window start, count, suppressed), by window start
+        self._counts = OrderedDict()
+        # key -> messages suppressed in windows dropped since, reported on the next record of the key
+        self._suppressed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _keep_suppressed(self, key, suppressed):
+        if suppressed:
+            self._suppressed[key] = self._suppressed.pop(key, 0) + suppressed
+            while len(self._suppressed) > self.max_keys:
+                self._suppressed.popitem(last=False)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is not None and now - entry[0] > self.window_seconds:
+                del self._counts[key]
+                self._keep_suppressed(key, entry[2])
+                entry = None
+            # Drop the expired windows (oldest first), and the oldest ones beyond max_keys for a new key.
+            while self._counts:
+                oldest_start = next(iter(self._counts.values()))[0]
+                if now - oldest_start <= self.window_seconds and (entry is not None or len(self._counts) < self.max_keys):
+                    break
+                old_key, (_, _, old_suppressed) = self._counts.popitem(last=False)
+                self._keep_suppressed(old_key, old_suppressed)
+            if entry is None:
+                suppressed_before = self._suppressed.pop(key, 0)
+                if suppressed_before:
+                    record.msg = f"{record.msg} [{suppressed_before} similar messages suppressed]"
+            window_start, count, suppressed = entry or (now, 0, 0)
+            count += 1
+            allowed = count <= self.max_per_window
+            self._counts[key] = (window_start, count, suppressed + (0 if allowed else 1))
+        return allowed
+
+class RedactingFilter(logging.Filter):
+    # Generic secret shapes, on top of the configured secret values.
+    PATTERNS = [
+        (re.compile(r'(Bearer\s+)[A-Za-z0-9\-_\.=]+'), r'\1***'),
+        (re.compile(r'(?i)("?(?:password|passwd|token)"?\s*[:=]\s*"?)[^",\s}]+'), r'\1***'),
+    ]
+
+    def __init__(self, secrets=()):
+        """Replace secret values (passwords, tokens) in the final message with ***."""
+        super().__init__()
+        self.secrets = [s for s in secrets if s and len(s) >= 4]
+
+    def redact(self, text: str) -> str:
+        for secret in self.secrets:
+            text = text.replace(secret, '***')
+        for pattern, replacement in self.PATTERNS:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def filter(self, record):
+        # Runs on the listener thread; the message was merged with its arguments when queued.
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = self.redact(record.exc_text)
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the structured context fields."""
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ContextTextFormatter(logging.Formatter):
+    """The usual text format, prefixed with the context fields that are set."""
+    def format(self, record):
+        context = ' '.join(f"{f}={getattr(record, f)}" for f in CONTEXT_FIELDS if getattr(record, f, None) is not None)
+        record.context = f"[{context}] " if context else ''
+        return super().format(record)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that defers everything but the message merge to the listener thread.
+
+    msg and args are merged on the calling thread, as the stock QueueHandler.prepare() does:
+    a bad format call is reported by handleError() right there, and arguments changed after
+    the call are logged as they were. Tracebacks, redaction and formatting are left to the
+    listener thread.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class SafeQueueListener(logging.handlers.QueueListener):
+    """QueueListener that reports handler errors (filters included) through handleError and keeps running."""
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if self.respect_handler_level and record.levelno < handler.level:
+                continue
+            try:
+                handler.handle(record)
+            except Exception:
+                handler.handleError(record)
+
+def parse_module_levels(spec: str) -> dict:
+    """Parse "module=LEVEL,other.module=LEVEL" into {module: level}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = getattr(logging, level.strip().upper())
+    return levels
+
+def setup_logging(level='INFO', log_file=None, json_format=False, module_levels='', secrets=(),
+                  rate_limit_per_minute=20):
+    """
+    Configure non-blocking logging: callers only enqueue records, a QueueListener thread
+    formats, redacts and writes them to stdout (and log_file). Safe to call more than once:
+    only the first call configures the handlers.
+
+    Args:
+        level (str): Root log level
+        log_file (str): Optional file to write to, next to stdout
+        json_format (bool): Write one JSON object per record instead of text lines
+        module_levels (str): Per-module levels, "steps.step7_optimize_planning=WARNING,selenium=WARNING"
+        secrets (iterable): Values to redact from every message (passwords, tokens)
+        rate_limit_per_minute (int): Repetitions of one INFO/DEBUG message template allowed per minute
+    """
+    global _listener
+    with _setup_lock:
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, str(level).upper()))
+        for name, module_level in parse_module_levels(module_levels).items():
+            logging.getLogger(name).setLevel(module_level)
+        if _listener is not None:
+            return
+
+        if json_format:
+            formatter = JsonFormatter()
+        else:
+            formatter = ContextTextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(context)s%(message)s')
+        redactor = RedactingFilter(secrets)
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            handler.addFilter(redactor)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        queue_handler.addFilter(RateLimitFilter(max_per_window=rate_limit_per_minute, window_seconds=60))
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = SafeQueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def setup_logging_from_config(log_file=None):
+    """setup_logging() with the settings of Config (secrets to redact included)."""
+    from config import Config
+    try:
+        account_passwords = [password for _, password in Config.pass_accounts()]
+    except ValueError:
+        # Unreadable PASS_ACCOUNTS_FILE: modes logging in to PASS report it, the others (replay, drain) do not need it.
+        account_passwords = []
+    setup_logging(
+        level=Config.LOG_LEVEL,
+        log_file=log_file,
+        json_format=Config.LOG_JSON,
+        module_levels=Config.LOG_MODULE_LEVELS,
+        secrets=(Config.PASS_PASSWORD, Config.TRANSAT_API_PASSWORD, *account_passwords),
+        rate_limit_per_minute=Config.LOG_RATE_LIMIT_PER_MINUTE
+    )
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+import requests
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    user_email TEXT,
+    payload_json TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at, id);
+"""
+# Columns added after the first version of the table, for outboxes created by earlier runs.
+MIGRATIONS = {
+    'claimed_by': "ALTER TABLE outbox ADD COLUMN claimed_by TEXT",
+    'claimed_until': "ALTER TABLE outbox ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0",
+}
+
+def _json_default(obj):
+    """The API expects start_time and end_time as ISO 8601 strings."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+def idempotency_key(payload: dict) -> str:
+    """Stable key of a course payload: the same course queued twice is delivered once."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class Outbox:
+    def __init__(self, path: str, max_attempts: int = 8, retry_backoff: float = 5.0, max_backoff: float = 600.0,
+                 claim_lease: float = 300.0):
+        """
+        Disk-backed queue of course payloads waiting to be delivered to the Transat API (SQLite).
+
+        Step 8 enqueues payloads and returns right away; an OutboxDrainer delivers them. Drainers
+        claim the payloads they post ('sending', for claim_lease seconds), so several drainers on
+        one outbox (sharded workers sharing OUTPUT_DIR) never post the same payload at the same
+        time; the claim of a drainer that died expires and the payload is claimed again. A payload
+        failing with a transient error (connection, timeout, 408/429/5xx) is retried later with an
+        exponential, jittered backoff; other errors, or max_attempts failures, mark it dead.
+        Delivered payloads are removed.
+
+        Args:
+            path (str): SQLite database file, in OUTPUT_DIR by default.
+            max_attempts (int): Delivery attempts before a payload is given up on.
+            retry_backoff (float): Delay in seconds before the first retry, doubled at each attempt.
+            max_backoff (float): Longest delay between two attempts.
+            claim_lease (float): Seconds a drainer has to deliver the payloads it claimed.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.claim_lease = claim_lease
+        # Payloads newly queued through this instance (this run).
+        self.queued = 0
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _connect(self):
+        # Same pattern as the work queue: one short-lived connection per operation.
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, user_email: str, payloads: list) -> int:
+        """
+        Queue course payloads in one transaction. Payloads already pending are not queued twice;
+        payloads left dead by an earlier run are queued again, with a fresh set of attempts.
+
+        Returns:
+            int: Number of payloads newly queued.
+        """
+        now = time.time()
+        rows = [(idempotency_key(p), user_email, json.dumps(p, ensure_ascii=False, default=_json_default), now)
+                for p in payloads]
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO outbox (idempotency_key, user_email, payload_json, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(idempotency_key) DO UPDATE SET status = 'pending', attempts = 0, next_attempt_at = 0, "
+                "last_error = NULL, user_email = excluded.user_email WHERE outbox.status = 'dead'",
+                rows
+            )
+            queued = conn.total_changes - before
+            conn.execute("COMMIT")
+        with self._lock:
+            self.queued += queued
+        return queued
+
+    def claim(self, limit: int, claimer: str) -> list:
+        """
+        Claim the next payloads due for delivery, oldest first, in one transaction: pending payloads
+        whose retry time has come, and payloads whose claim expired (their drainer died).
+
+        Args:
+            limit (int): Payloads claimed at most.
+            claimer (str): Id of the drainer claiming them.
+
+        Returns:
+            list: (id, idempotency key, payload) tuples.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, idempotency_key, payload_json FROM outbox "
+                "WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_until < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_until = ? WHERE id = ?",
+                [(claimer, now + self.claim_lease, row_id) for row_id, _, _ in rows]
+            )
+            conn.execute("COMMIT")
+        return [(row_id, key, json.loads(payload)) for row_id, key, payload in rows]
+
+    def record(self, delivered: list, failed: list, claimer: str):
+        """
+        Record the outcome of a batch in one transaction. Failures are only recorded on payloads
+        still claimed by claimer: another drainer may have claimed them since the claim expired.
+
+        Args:
+            delivered (list): Ids of delivered payloads.
+            failed (list): (id, error message, retryable) of failed payloads.
+            claimer (str): Id of the drainer that claimed the batch.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in delivered])
+            for row_id, error, retryable in failed:
+                row = conn.execute("SELECT attempts FROM outbox WHERE id = ? AND claimed_by = ?",
+                                   (row_id, claimer)).fetchone()
+                if row is None:
+                    # Claimed (or delivered) by another drainer after our claim expired.
+                    continue
+                attempts = row[0] + 1
+                delay = min(self.max_backoff, self.retry_backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                status = 'pending' if retryable and attempts < self.max_attempts else 'dead'
+                conn.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                    "claimed_by = NULL, claimed_until = 0 WHERE id = ? AND claimed_by = ?",
+                    (status, attempts, now + delay, error, row_id, claimer)
+                )
+            conn.execute("COMMIT")
+
+    def stats(self) -> dict:
+        """
+        Number of payloads per status (pending, sending, dead), users with payloads not delivered yet,
+        and when the next pending payload is due.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+            next_due = conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            users = conn.execute("SELECT COUNT(DISTINCT user_email) FROM outbox").fetchone()[0]
+        counts = {'pending': 0, 'sending': 0, 'dead': 0}
+        counts.update(dict(rows))
+        counts['users_not_delivered'] = users
+        counts['next_attempt_in_seconds'] = round(max(0.0, next_due - time.time()), 1) if next_due is not None else None
+        return counts
+
+    def requeue_dead(self) -> int:
+        """Give dead payloads a fresh set of attempts (after fixing whatever rejected them)."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0 WHERE status = 'dead'")
+        return cursor.rowcount
+
+def _status_code(error: Exception):
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code
+    return None
+
+def _is_retryable(error: Exception) -> bool:
+    status_code = _status_code(error)
+    if status_code is not None:
+        # 401: the token expired during the run, the drainer authenticates again.
+        return status_code in (401, 408, 429) or status_code >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+class OutboxDrainer:
+    def __init__(self, outbox: Outbox, api_client, batch_size: int = 50, concurrency: int = 4, idle_interval: float = 2.0):
+        """
+        Delivers the outbox to the API in the background: batches of due payloads are posted
+        concurrently over keep-alive sessions (one per thread of a pool kept for the drainer's
+        lifetime), with the payload's idempotency key in an
+        Idempotency-Key header, and their outcomes recorded in one transaction.
+
+        Args:
+            outbox (Outbox): The outbox to drain.
+            api_client (ApiClient): An authenticated API client.
+            batch_size (int): Payloads claimed per batch.
+            concurrency (int): Payloads posted at the same time.
+            idle_interval (float): Seconds between two polls of an empty (or not yet due) outbox.
+        """
+        self.outbox = outbox
+        self.api_client = api_client
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.idle_interval = idle_interval
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.claimer = uuid.uuid4().hex
+        self._queued_before = outbox.queued
+        self._executor = None
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _deliver(self, item):
+        row_id, key, payload = item
+        try:
+            self.api_client.post_course(payload, idempotency_key=key, session=self._session())
+            return row_id, None
+        except Exception as e:
+            if _status_code(e) == 409:
+                # The API already has this course (a retry of a delivery whose response was lost).
+                return row_id, None
+            return row_id, e
+
+    def drain_once(self) -> int:
+        """
+        Deliver one batch of due payloads.
+
+        Returns:
+            int: Number of payloads attempted (0 when nothing is due).
+        """
+        batch = self.outbox.claim(self.batch_size, self.claimer)
+        if not batch:
+            return 0
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+        outcomes = list(self._executor.map(self._deliver, batch))
+        delivered = [row_id for row_id, error in outcomes if error is None]
+        failed = [(row_id, str(error), _is_retryable(error)) for row_id, error in outcomes if error is not None]
+        self.outbox.record(delivered, failed, self.claimer)
+        self.delivered += len(delivered)
+        self.failed_attempts += len(failed)
+        if failed:
+            logger.warning("Outbox batch: %s delivered, %s failed (last error: %s).",
+                           len(delivered), len(failed), failed[-1][1])
+        if any(_status_code(error) == 401 for _, error in outcomes):
+            try:
+                self.api_client.reauthenticate()
+            except Exception as e:
+                logger.error("Outbox drainer could not authenticate again: %s", e)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                attempted = self.drain_once()
+            except Exception as e:
+                logger.error("Outbox drainer error: %s", e, exc_info=True)
+                attempted = 0
+            if not attempted:
+                self._stop.wait(self.idle_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='outbox-drainer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain_timeout: float = 0.0):
+        """
+        Stop the background delivery, after trying to empty the outbox for up to drain_timeout seconds.
+        Whatever is left stays on disk for the next run (or the drain mode).
+        """
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline:
+            stats = self.outbox.stats()
+            if not stats['sending'] and (not stats['pending'] or stats['next_attempt_in_seconds'] > deadline - time.monotonic()):
+                break
+            time.sleep(min(self.idle_interval, max(0.0, deadline - time.monotonic())))
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def summary(self) -> dict:
+        """Payloads queued by this run and delivered by this drainer, counted apart, and what the outbox holds."""
+        return {'queued': self.outbox.queued - self._queued_before, 'delivered': self.delivered, 'failed_attempts': self.failed_attempts,
+                **self.outbox.stats()}
@@ -0,0 +1,147 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from logging_setup import thread_log_contexts
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads parked with nothing to do (executor and listener threads, server loops).
+IDLE_LEAVES = {
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('handlers.py', 'dequeue'),
+    ('selectors.py', 'select'),
+    ('socketserver.py', 'serve_forever'),
+    ('thread.py', '_worker'),
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f"{module}.{code.co_name}"
+
+def _category(stack: list) -> str:
+    """Where a sample spends its time: waiting on Chrome, on the Transat API, or in Python itself."""
+    for label in stack:
+        if label.startswith('selenium.'):
+            return 'chrome'
+    for label in stack:
+        if label.startswith(('api_client.', 'requests.')):
+            return 'api'
+    return 'python'
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        """
+        Wall-clock sampling profiler over every thread of the process.
+
+        A background thread snapshots all Python stacks every interval seconds. Each sample is
+        labelled with the step and user its thread is working on (the thread's log context),
+        so time spent in Chrome, in parsing or in the API can be attributed to steps and users.
+
+        Args:
+            interval (float): Seconds between two samples
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.monotonic() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            contexts = thread_log_contexts()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                context = contexts.get(thread_id, {})
+                labels = (f"step:{context.get('step') or '-'}", f"user:{context.get('user') or '-'}")
+                self.stacks[labels + tuple(stack)] += 1
+                self.samples += 1
+
+    def write_collapsed(self, path: str):
+        """One 'step:..;user:..;frame;frame count' line per stack (flamegraph.pl, speedscope, inferno)."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def report(self, top=30) -> str:
+        """Time per step, user and category, and the top-N functions by self and cumulative samples."""
+        by_step, by_user, by_category = Counter(), Counter(), Counter()
+        self_samples, cumulative_samples = Counter(), Counter()
+        for (step, user, *frames), count in self.stacks.items():
+            by_step[step[len('step:'):]] += count
+            by_user[user[len('user:'):]] += count
+            by_category[_category(frames)] += count
+            if frames:
+                self_samples[frames[-1]] += count
+            for label in set(frames):
+                cumulative_samples[label] += count
+
+        seconds = lambda count: count * self.interval
+        lines = [f"Wall time: {self.duration:.1f}s, {self.samples} samples every {self.interval * 1000:.0f} ms "
+                 f"(thread-seconds: {seconds(self.samples):.1f}s)", ""]
+        for title, counter, limit in (("Time by category", by_category, None), ("Time by step", by_step, None),
+                                      (f"Time by user (top {top})", by_user, top)):
+            lines.append(title)
+            for key, count in counter.most_common(limit):
+                lines.append(f"  {seconds(count):9.2f}s  {100 * count / max(self.samples, 1):5.1f}%  {key}")
+            lines.append("")
+        for title, counter in ((f"Top {top} functions by self time", self_samples),
+                               (f"Top {top} functions by cumulative time", cumulative_samples)):
+            lines.append(title)
+            for label, count in counter.most_common(top):
+                lines.append(f"  {seconds(count):9.2f}s  {100 * count / max(self.samples, 1):5.1f}%  {label}")
+            lines.append("")
+        return "\n".join(lines)
+
+@contextmanager
+def profiling(output_dir: str, interval=0.005, top=30):
+    """
+    Sample the process for the duration of the block, then write profile_<timestamp>.collapsed
+    and profile_<timestamp>.txt (top-N report) into output_dir, next to the results.
+    """
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        profiler.write_collapsed(f"{base}.collapsed")
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(profiler.report(top))
+        logger.info("Profile written to %s.collapsed and %s.txt (%s samples).", base, base, profiler.samples)
+
+def maybe_profiling(enabled: bool, output_dir: str, interval=0.005, top=30):
+    """profiling() if enabled, otherwise a block that does nothing."""
+    return profiling(output_dir, interval, top) if enabled else nullcontext()
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, min_limit=1, max_limit=4, target_latency=8.0, initial_limit=None,
+                 decrease_factor=0.5, latency_smoothing=0.2):
+        """
+        AIMD concurrency limit for requests sent to PASS.
+
+        Every completed request feeds its latency (or its failure) back into the limiter:
+        fast successes raise the limit by roughly one per limit-sized window (additive increase),
+        errors, timeouts or latencies above target halve it (multiplicative decrease).
+        The limit always stays within [min_limit, max_limit].
+
+        Args:
+            min_limit (int): Lowest number of in-flight requests allowed
+            max_limit (int): Highest number of in-flight requests allowed
+            target_latency (float): Latency in seconds above which PASS is considered overloaded
+            initial_limit (float): Starting limit, defaults to min_limit
+            decrease_factor (float): Factor applied to the limit on a congestion signal
+            latency_smoothing (float): Weight of the newest sample in the latency moving average
+        """
+        if min_limit < 1 or max_limit < min_limit:
+            raise ValueError(f"Invalid concurrency bounds: min={min_limit}, max={max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.latency_smoothing = latency_smoothing
+
+        self._limit = float(initial_limit if initial_limit is not None else min_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # Completions left before another decrease is allowed, so one burst of slow
+        # responses (all sent under the old limit) only counts as one congestion signal.
+        self._decrease_cooldown = 0
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency_ewma = None
+
+    @property
+    def limit(self) -> int:
+        """Current number of in-flight requests allowed."""
+        return int(self._limit)
+
+    def acquire(self):
+        """Block until a request slot is available under the current limit."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """Take a request slot if one is available right now, without blocking."""
+        with self._condition:
+            if self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency=None, error=False, timeout=False):
+        """
+        Free a request slot and adjust the limit.
+
+        Args:
+            latency (float): Duration of the request in seconds (None if it failed)
+            error (bool): The request failed
+            timeout (bool): The request failed by timing out
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self.requests += 1
+            if error or timeout:
+                self.errors += 1
+            if timeout:
+                self.timeouts += 1
+            if latency is not None:
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma += self.latency_smoothing * (latency - self.latency_ewma)
+
+            congested = error or timeout or (latency is not None and latency > self.target_latency)
+            previous = self.limit
+            if congested:
+                if self._decrease_cooldown <= 0:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._decrease_cooldown = max(self._in_flight, 1)
+                else:
+                    self._decrease_cooldown -= 1
+            else:
+                self._decrease_cooldown -= 1
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+            if self.limit != previous:
+                logger.info("PASS concurrency limit changed from %s to %s (latency EWMA: %.2fs, errors: %s/%s).",
+                            previous, self.limit, self.latency_ewma or 0, self.errors, self.requests)
+            self._condition.notify_all()
+
+    def set_max_limit(self, max_limit: int):
+        """
+        Change the highest limit (at least min_limit), e.g. to this process's share of PASS_MAX_CONCURRENCY
+        when sharded workers scrape the same PASS. A current limit above it drops to it.
+        """
+        with self._condition:
+            max_limit = max(self.min_limit, int(max_limit))
+            if max_limit == self.max_limit:
+                return
+            logger.info("PASS concurrency ceiling changed from %s to %s.", self.max_limit, max_limit)
+            self.max_limit = max_limit
+            self._limit = min(self._limit, float(max_limit))
+            self._condition.notify_all()
+
+    @contextmanager
+    def track(self):
+        """Hold a request slot for the duration of the block and report its outcome."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except TimeoutException:
+            self.release(timeout=True)
+            raise
+        except Exception:
+            self.release(error=True)
+            raise
+        self.release(latency=time.monotonic() - start)
+
+    def metrics(self) -> dict:
+        """Snapshot of the limiter state, for run metadata and monitoring."""
+        with self._condition:
+            return {
+                'concurrency_limit': self.limit,
+                'in_flight': self._in_flight,
+                'requests': self.requests,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'latency_ewma_seconds': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            }
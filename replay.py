@@ -0,0 +1,209 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from course_store import expand_entry
+from steps.step7_optimize_planning import step7_optimize_planning
+from steps.step7c_calendar_feed import step7c_write_calendar
+from steps.step8_submit_to_api import step8_submit_to_api
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Steps 7 and 8 replayed from a results file written by save_results, without a browser:
+# to deliver a run again after an API outage, or to try a change of step 7 on real plannings.
+
+class _JsonStream:
+    """Chunked reader decoding consecutive JSON values with raw_decode, keeping only the current value in memory."""
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """Skip whitespace and return (without consuming) the next character, '' at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char: str):
+        if self.next_char() != char:
+            raise ValueError(f"Malformed results file: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+def iter_plannings(results_file: str, chunk_size: int = 1 << 20):
+    """
+    Stream the per-user entries of a results file, one at a time. Files in the course-table
+    format (see course_store.compact_results) get their plannings expanded from the table.
+
+    Yields:
+        tuple: (user id as a string, planning entry as saved: url, scraped_at, planning, ...)
+    """
+    with open(results_file, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f, chunk_size)
+        courses = {}
+        # Walk the top-level keys: other values are decoded and dropped, the course table
+        # (written before all_plannings) is kept, and all_plannings is streamed entry by entry.
+        stream.expect('{')
+        while stream.next_char() != '}':
+            if stream.next_char() == ',':
+                stream.pos += 1
+            key = stream.decode()
+            stream.expect(':')
+            if key == 'courses':
+                courses = stream.decode()
+            elif key == 'all_plannings':
+                stream.expect('{')
+                while stream.next_char() != '}':
+                    if stream.next_char() == ',':
+                        stream.pos += 1
+                    user_id = stream.decode()
+                    stream.expect(':')
+                    yield user_id, expand_entry(stream.decode(), courses)
+                return
+            else:
+                stream.decode()
+        raise ValueError(f"No all_plannings in {results_file}")
+
+def restore_datetimes(planning: list) -> list:
+    """Courses as step 6 builds them: start_time and end_time back to datetime objects."""
+    for course in planning:
+        for key in ('start_time', 'end_time'):
+            if isinstance(course.get(key), str):
+                course[key] = datetime.fromisoformat(course[key])
+    return planning
+
+class PlanningReplay:
+    def __init__(self, api_client=None, outbox=None, concurrency=4, user_ids=None, calendar_dir=None, course_store=None):
+        """
+        Run step 7 and step 8 again on the plannings of a results file.
+
+        Reading, datetime rebuilding and step 7 happen in the calling thread while step 8 runs in
+        `concurrency` threads, with a bounded number of users in flight so the file is never loaded whole.
+
+        Args:
+            api_client (ApiClient): Authenticated client for step 8, None for a dry run (step 7 only).
+            outbox (Outbox): Passed to step 8 (courses queued there instead of posted directly).
+            concurrency (int): Users submitted at the same time.
+            user_ids (set): Only replay these users (ids as strings).
+            calendar_dir (str): If set, the calendar feeds (step 7c) are updated there after step 7.
+            course_store (CourseStore): Passed to step 8 (shared-course endpoints).
+        """
+        self.api_client = api_client
+        self.outbox = outbox
+        self.concurrency = max(1, concurrency)
+        self.user_ids = user_ids
+        self.calendar_dir = calendar_dir
+        self.course_store = course_store
+        self._emails = None
+        self._emails_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.stats = {'users': 0, 'submitted': 0, 'failed': 0, 'failures': [], 'courses_in': 0, 'courses_out': 0,
+                      'read_seconds': 0.0, 'step7_seconds': 0.0, 'step8_seconds': 0.0}
+
+    def _email(self, user_id, entry):
+        # Results written before the email was saved with each planning: look it up in the user list.
+        if entry.get('email'):
+            return entry['email']
+        with self._emails_lock:
+            if self._emails is None:
+                self._emails = {str(u.get('id')): u.get('email', '').strip() for u in self.api_client.iter_users()}
+        return self._emails.get(str(user_id))
+
+    def _submit(self, user_id, entry, planning):
+        started = time.perf_counter()
+        try:
+            email = self._email(user_id, entry)
+            if not email:
+                raise Exception("Unknown user email")
+            ok = step8_submit_to_api(planning, email, self.api_client, outbox=self.outbox, course_store=self.course_store)
+            error = None if ok else "Not all courses were sent to API"
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            self.stats['step8_seconds'] += time.perf_counter() - started
+            if error:
+                self.stats['failed'] += 1
+                self.stats['failures'].append({'user_id': user_id, 'error': error})
+            else:
+                self.stats['submitted'] += 1
+
+    def run(self, results_file: str) -> dict:
+        """
+        Returns:
+            dict: Counts, cumulative seconds per stage, wall time and throughput.
+        """
+        started = time.perf_counter()
+        in_flight = deque()
+        entries = iter_plannings(results_file)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay') as executor:
+            while True:
+                read_started = time.perf_counter()
+                item = next(entries, None)
+                if item is None:
+                    break
+                user_id, entry = item
+                if self.user_ids and user_id not in self.user_ids:
+                    continue
+                planning = restore_datetimes(entry.get('planning') or [])
+                self.stats['read_seconds'] += time.perf_counter() - read_started
+
+                self.stats['users'] += 1
+                self.stats['courses_in'] += len(planning)
+                step7_started = time.perf_counter()
+                planning = step7_optimize_planning(planning) if planning else planning
+                self.stats['step7_seconds'] += time.perf_counter() - step7_started
+                self.stats['courses_out'] += len(planning)
+                if self.calendar_dir:
+                    step7c_write_calendar(planning, user_id, self.calendar_dir, entry.get('incomplete_weeks'))
+                if self.api_client is None or not planning:
+                    continue
+
+                # Bounded pipeline: wait for the oldest submission when enough users are in flight.
+                if len(in_flight) >= 2 * self.concurrency:
+                    in_flight.popleft().result()
+                in_flight.append(executor.submit(self._submit, user_id, entry, planning))
+            for future in in_flight:
+                future.result()
+
+        stats = dict(self.stats)
+        stats['wall_seconds'] = time.perf_counter() - started
+        stats['users_per_second'] = stats['users'] / stats['wall_seconds'] if stats['wall_seconds'] else 0.0
+        stats['courses_per_second'] = stats['courses_in'] / stats['wall_seconds'] if stats['wall_seconds'] else 0.0
+        for key in ('read_seconds', 'step7_seconds', 'step8_seconds', 'wall_seconds', 'users_per_second', 'courses_per_second'):
+            stats[key] = round(stats[key], 3)
+        return stats
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Cost of a user never scraped before, and of the PASS search (steps 3 to 5) when no
+# history tells better, in seconds.
+DEFAULT_WEEK_SECONDS = 6.0
+DEFAULT_SEARCH_SECONDS = 20.0
+# Longest wait before a user failing every time gets its priority back, in seconds.
+MAX_FAILURE_BACKOFF = 7 * 24 * 3600
+
+class UserHistory:
+    def __init__(self, path: str, smoothing: float = 0.3, failure_backoff: float = 6 * 3600):
+        """
+        Per-user record of past scrapes, kept in a JSON file between runs: when the user was last
+        scraped successfully and last attempted, their failures in a row, the moving average of
+        their seconds per agenda week, and the weeks that could not be read last time. Run-wide
+        averages (seconds per week, PASS search) cover users without history.
+
+        Args:
+            path (str): JSON file, in OUTPUT_DIR by default.
+            smoothing (float): Weight of the newest sample in the moving averages.
+            failure_backoff (float): Seconds a user is scheduled last after a failed attempt, doubled
+                with each failure in a row (up to a week).
+        """
+        self.path = path
+        self.smoothing = smoothing
+        self.failure_backoff = failure_backoff
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.users = {}
+        self.model = {'week_seconds': None, 'search_seconds': None}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.users = data.get('users', {})
+            self.model.update(data.get('model', {}))
+        except (OSError, ValueError):
+            pass
+
+    def _ewma(self, previous, sample):
+        return sample if previous is None else (1 - self.smoothing) * previous + self.smoothing * sample
+
+    def record(self, user_id, seconds: float, weeks: int, searched: bool, success: bool, incomplete_weeks: int = 0):
+        """
+        Record one scrape of a user.
+
+        Args:
+            seconds (float): Duration of process_user.
+            weeks (int): Agenda weeks it had to read.
+            searched (bool): The PASS search ran (no cached pass_id).
+            success (bool): The user was scraped; failures only update the cost.
+            incomplete_weeks (int): Weeks that could not be read.
+        """
+        with self._lock:
+            search_seconds = self.search_seconds if searched else 0.0
+            week_seconds = max(0.1, seconds - search_seconds) / max(1, weeks)
+            entry = self.users.setdefault(str(user_id), {})
+            entry['week_seconds'] = self._ewma(entry.get('week_seconds'), week_seconds)
+            entry['incomplete_weeks'] = incomplete_weeks
+            entry['last_attempt'] = time.time()
+            if success:
+                entry['last_success'] = entry['last_attempt']
+                entry['failures'] = 0
+            else:
+                entry['failures'] = entry.get('failures', 0) + 1
+            self.model['week_seconds'] = self._ewma(self.model['week_seconds'], week_seconds)
+            if searched:
+                # What the search added on top of reading the weeks at the usual pace.
+                usual_weeks = weeks * (self.model['week_seconds'] or DEFAULT_WEEK_SECONDS)
+                self.model['search_seconds'] = self._ewma(self.model['search_seconds'], max(0.0, seconds - usual_weeks))
+
+    @property
+    def search_seconds(self) -> float:
+        return self.model['search_seconds'] if self.model['search_seconds'] is not None else DEFAULT_SEARCH_SECONDS
+
+    def last_success(self, user_id):
+        return self.users.get(str(user_id), {}).get('last_success')
+
+    def in_failure_backoff(self, user_id, now: float) -> bool:
+        """Whether the user failed last time, more recently than its backoff (failure_backoff, doubled per failure in a row)."""
+        entry = self.users.get(str(user_id), {})
+        failures = entry.get('failures', 0)
+        if not failures or not entry.get('last_attempt'):
+            return False
+        backoff = min(self.failure_backoff * 2 ** (failures - 1), MAX_FAILURE_BACKOFF)
+        return now - entry['last_attempt'] < backoff
+
+    def estimate(self, user: dict, weeks: int) -> float:
+        """Expected seconds to scrape this user: PASS search if no pass_id is cached, plus its weeks at its past pace."""
+        entry = self.users.get(str(user.get('id')), {})
+        week_seconds = entry.get('week_seconds') or self.model['week_seconds'] or DEFAULT_WEEK_SECONDS
+        # Weeks that failed last time are likely to be retried.
+        seconds = week_seconds * (weeks + entry.get('incomplete_weeks', 0))
+        if not user.get('pass_id'):
+            seconds += self.search_seconds
+        return seconds
+
+    def save(self):
+        """Write the history atomically (temporary file, then rename): a crash leaves the previous or the new file."""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with self._lock:
+                data = json.dumps({'users': self.users, 'model': self.model})
+            # One writer of the temporary file at a time (the accounts of a run save from their threads).
+            with self._save_lock:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not write the user history %s: %s", self.path, e)
+
+class RunScheduler:
+    def __init__(self, history: UserHistory, deadline_seconds: float, weeks: int, now=None, save_every: int = 10):
+        """
+        Order the users of a run by staleness per second of expected cost, and stop starting
+        users whose expected cost no longer fits before the deadline. Deferred users keep their
+        staleness and come first in the next run. Users in their failure backoff (they failed
+        recently, see UserHistory.in_failure_backoff) come after all others, so a user failing
+        every time, never scraped hence infinitely stale, does not take the head of every run.
+
+        Estimates are calibrated during the run: if PASS is slower than the history says, the
+        ratio of actual to estimated seconds of the users done so far scales the next estimates.
+
+        Args:
+            history (UserHistory): Past scrapes.
+            deadline_seconds (float): Time budget of the run from its start (0 for no deadline).
+            weeks (int): Agenda weeks read per user.
+            save_every (int): Save the history every this many finished users (and at the end of the run).
+        """
+        self.history = history
+        self.save_every = save_every
+        self.finished_users = 0
+        self.deadline_seconds = deadline_seconds
+        self.weeks = weeks
+        self.started = time.monotonic()
+        self.now = now if now is not None else time.time()
+        self.estimated_total = 0.0
+        self.actual_total = 0.0
+        self.deferred = []
+
+    def priority(self, user: dict) -> float:
+        last_success = self.history.last_success(user.get('id'))
+        # Never scraped users first (cheapest first among them), then the stalest per unit of cost.
+        staleness = self.now - last_success if last_success else float('inf')
+        return staleness / self.history.estimate(user, self.weeks)
+
+    def order(self, users: list) -> list:
+        return sorted(users, key=lambda u: (self.history.in_failure_backoff(u.get('id'), self.now),
+                                            -self.priority(u), self.history.estimate(u, self.weeks)))
+
+    @property
+    def calibration(self) -> float:
+        """Ratio of actual to estimated seconds so far in this run (1 until a few users are done)."""
+        if self.estimated_total < 60:
+            return 1.0
+        return self.actual_total / self.estimated_total
+
+    def remaining(self) -> float:
+        return self.deadline_seconds - (time.monotonic() - self.started)
+
+    def admit(self, user: dict) -> bool:
+        """Whether the user is expected to finish before the deadline; if not, it is deferred."""
+        if not self.deadline_seconds:
+            return True
+        expected = self.history.estimate(user, self.weeks) * self.calibration
+        if expected <= self.remaining():
+            return True
+        last_success = self.history.last_success(user.get('id'))
+        self.deferred.append({
+            'user_id': user.get('id'),
+            'name': f"{user.get('first_name', '').strip()} {user.get('last_name', '').strip()}",
+            'estimated_seconds': round(expected, 1),
+            'last_success': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(last_success)) if last_success else None
+        })
+        return False
+
+    def finished(self, user: dict, seconds: float, success: bool, incomplete_weeks: int = 0):
+        """Record a processed user in the history and in the run's calibration, saving the history every save_every users."""
+        self.estimated_total += self.history.estimate(user, self.weeks)
+        self.actual_total += seconds
+        self.history.record(user.get('id'), seconds, self.weeks, searched=not user.get('pass_id'),
+                            success=success, incomplete_weeks=incomplete_weeks)
+        self.finished_users += 1
+        if self.save_every and self.finished_users % self.save_every == 0:
+            self.history.save()
+
+    def summary(self) -> dict:
+        return {
+            'deadline_seconds': self.deadline_seconds,
+            'elapsed_seconds': round(time.monotonic() - self.started, 1),
+            'calibration': round(self.calibration, 2),
+            'deferred': len(self.deferred)
+        }
@@ -1,6 +1,9 @@
+import argparse
 import json
 import os
+import socket
 import sys
+import time
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -10,6 +13,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from scraper import TransatPassScraper
 from config import Config
+from logging_setup import setup_logging_from_config, log_context, update_log_context
+from driver_factory import DriverFactory
+from api_client import ApiClient
+from work_queue import WorkQueue
+from outbox import Outbox, OutboxDrainer
+from profiler import maybe_profiling
+from replay import PlanningReplay
+from course_store import CourseStore, compact_results
+from serialization import dump_file, set_backend
+from steps.week_parser import parse_recorded_week, dedupe_courses
+from steps.step7_optimize_planning import step7_optimize_planning
+from steps.step7b_occupancy_index import step7b_build_occupancy_index
+from steps.week_fixtures import load_user_fixtures
 
 def setup_logging():
     """Setup logging configuration"""
@@ -18,26 +34,10 @@ def setup_logging():
     
     log_file = log_dir / f"scraper_{datetime.now().strftime('%Y%m%d')}.log"
     
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    setup_logging_from_config(log_file=log_file)
     
     return logging.getLogger(__name__)
 
-def json_datetime_serializer(obj):
-    """
-    Custom JSON serializer for objects not serializable by default json code.
-    Specifically handles datetime objects.
-    """
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
-
 def save_results(data, output_dir):
     """Save scraping results to file"""
     output_path = Path(output_dir)
@@ -48,56 +48,312 @@ def save_results(data, output_dir):
     
     file_path = output_path / filename
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        # Use a custom serializer to handle datetime objects.
-        json.dump(data, f, indent=2, ensure_ascii=False, default=json_datetime_serializer)
+    # Datetimes are written as ISO 8601 strings; compact unless RESULTS_PRETTY is set.
+    dump_file(data, file_path, pretty=Config.RESULTS_PRETTY)
     
     return str(file_path)
 
-def run_scraper():
-    """Main function to run the scraper"""
+def create_outbox():
+    """The disk outbox step 8 queues courses in, or None if OUTBOX_ENABLED is off"""
+    if not Config.OUTBOX_ENABLED:
+        return None
+    os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+    return Outbox(
+        Config.OUTBOX_PATH or os.path.join(Config.OUTPUT_DIR, 'outbox.sqlite'),
+        max_attempts=Config.OUTBOX_MAX_ATTEMPTS,
+        retry_backoff=Config.OUTBOX_RETRY_BACKOFF
+    )
+
+def create_scraper(record_dir=None):
+    """Create the driver factory and a scraper using it (the browser launches in the background)"""
+    driver_factory = DriverFactory(
+        headless=Config.HEADLESS,
+        lean=Config.LEAN_DRIVER,
+        session_dir=Config.SESSION_DIR,
+        pool_size=Config.DRIVER_POOL_SIZE
+    )
+    driver_factory.prewarm()
+    scraper = TransatPassScraper(
+        headless=Config.HEADLESS,
+        timeout=Config.TIMEOUT,
+        lean=Config.LEAN_DRIVER,
+        session_dir=Config.SESSION_DIR,
+        driver_factory=driver_factory,
+        record_dir=record_dir,
+        outbox=create_outbox()
+    )
+    return driver_factory, scraper
+
+def save_occupancy_index(result, logger):
+    """Step 7b: index room and teacher occupancy across every user of the run, next to the results"""
+    try:
+        index = step7b_build_occupancy_index(result['all_plannings'])
+        index_file = os.path.join(Config.OUTPUT_DIR, 'occupancy_index.json.gz')
+        index.save(index_file)
+        logger.info("Occupancy index saved to: %s", index_file)
+        return index_file
+    except Exception as e:
+        logger.error("Could not build the occupancy index: %s", e, exc_info=True)
+        return None
+
+def finish_run(result, logger, build_index=True):
+    """Add metadata, save the results and exit with an error status if the run failed"""
+    # A user list cut short (API error, every PASS account retired) fails the run too.
+    errors = [result[key] for key in ('error', 'users_error', 'accounts_error') if key in result]
+    # Add metadata
+    result['scrape_metadata'] = {
+        'timestamp': datetime.now().isoformat(),
+        'success': not errors
+    }
+    # Only a run over every user gives a complete picture of room and teacher occupancy.
+    if build_index and not errors and Config.OCCUPANCY_INDEX and result.get('all_plannings'):
+        result['scrape_metadata']['occupancy_index'] = save_occupancy_index(result, logger)
+    
+    # Save results (courses shared between users stored once, see course_store.py)
+    output_file = save_results(compact_results(result) if Config.RESULTS_COURSE_TABLE else result, Config.OUTPUT_DIR)
+    logger.info("Results saved to: %s", output_file)
+
+    if errors:
+        logger.error("Scraping failed: %s", '; '.join(errors))
+        sys.exit(1)
+    else:
+        logger.info("Scraping completed successfully")
+
+def run_scraper(user_ids=None, record_dir=None):
+    """Main function to run the scraper (for all users, or only user_ids)"""
     logger = setup_logging()
     logger.info("Starting scheduled scraper run")
     
     try:
         # Validate configuration
-        if not Config.PASS_USERNAME or not Config.PASS_PASSWORD:
-            raise ValueError("Username and password must be provided")
+        Config.require_pass_credentials()
         
         # Initialize scraper
-        scraper = TransatPassScraper(
-            headless=Config.HEADLESS,
-            timeout=Config.TIMEOUT
-        )
+        driver_factory, scraper = create_scraper(record_dir)
     
-        # Run scraping
+        # Run scraping (users spread over the PASS accounts of PASS_ACCOUNTS, if several)
+        (pass_username, pass_password), *other_accounts = Config.pass_accounts()
         result = scraper.run_full_scrape(
-            pass_username=Config.PASS_USERNAME,
-            pass_password=Config.PASS_PASSWORD
+            pass_username=pass_username,
+            pass_password=pass_password,
+            user_ids=user_ids,
+            accounts=other_accounts
         )
         
-        # Add metadata
-        result['scrape_metadata'] = {
-            'timestamp': datetime.now().isoformat(),
-            'success': 'error' not in result
-        }
-        
-        # Save results
-        output_file = save_results(result, Config.OUTPUT_DIR)
-        logger.info(f"Results saved to: {output_file}")
-        
         # Close scraper
         scraper.close()
-        
-        if 'error' in result:
-            logger.error(f"Scraping failed: {result['error']}")
-            sys.exit(1)
-        else:
-            logger.info("Scraping completed successfully")
+        driver_factory.close()
+
+        finish_run(result, logger, build_index=user_ids is None)
             
     except Exception as e:
-        logger.error(f"Scraper run failed: {e}", exc_info=True)
+        logger.error("Scraper run failed: %s", e, exc_info=True)
+        sys.exit(1)
+
+def run_fixtures(fixtures_dir, user_ids=None, repeat=1):
+    """Replay weeks recorded with --record-fixtures through parsing and step 7, without browser or API"""
+    logger = setup_logging()
+    fixtures = load_user_fixtures(fixtures_dir, user_ids)
+    if not fixtures:
+        logger.error("No recorded weeks found in %s.", fixtures_dir)
+        sys.exit(1)
+    logger.info("Replaying %s recorded weeks of %s users, %s time(s).",
+                sum(len(weeks) for weeks in fixtures.values()), len(fixtures), repeat)
+
+    result = {'processed': 0, 'success': 0, 'failed': 0, 'failures': [], 'all_plannings': {}}
+    for _ in range(repeat):
+        for user_id, weeks in fixtures.items():
+            with log_context(user=user_id, step='step6'):
+                courses = []
+                incomplete_weeks = []
+                for monday_str, raw_week in weeks.items():
+                    week_courses = parse_recorded_week(raw_week)
+                    if week_courses is None:
+                        incomplete_weeks.append(monday_str)
+                    else:
+                        courses.extend(week_courses)
+                planning = dedupe_courses(courses)
+                update_log_context(step='step7')
+                result['all_plannings'][user_id] = {
+                    'planning': step7_optimize_planning(planning) if planning else planning,
+                    'incomplete_weeks': incomplete_weeks
+                }
+    result['processed'] = result['success'] = len(result['all_plannings'])
+    result['fixtures'] = {'dir': fixtures_dir, 'repeat': repeat}
+    finish_run(result, logger, build_index=user_ids is None)
+
+def run_drain(requeue_dead=False):
+    """Deliver the courses left in the outbox by previous runs, without scraping"""
+    logger = setup_logging()
+    outbox = create_outbox()
+    if outbox is None:
+        logger.error("The outbox is disabled (OUTBOX_ENABLED=false), nothing to drain.")
+        sys.exit(1)
+    if requeue_dead:
+        logger.info("Requeued %s dead courses.", outbox.requeue_dead())
+    logger.info("Draining the outbox: %s", outbox.stats())
+
+    try:
+        client = ApiClient()
+        client.authenticate(Config.TRANSAT_API_EMAIL, Config.TRANSAT_API_PASSWORD)
+        drainer = OutboxDrainer(outbox, client, batch_size=Config.OUTBOX_BATCH_SIZE,
+                                concurrency=Config.OUTBOX_CONCURRENCY).start()
+        drainer.stop(drain_timeout=Config.OUTBOX_DRAIN_TIMEOUT)
+    except Exception as e:
+        logger.error("Outbox drain failed: %s", e, exc_info=True)
+        sys.exit(1)
+
+    summary = drainer.summary()
+    logger.info("Outbox drain finished: %s", summary)
+    if summary['pending'] or summary['sending'] or summary['dead']:
+        sys.exit(1)
+
+def run_replay(results_file, user_ids=None, dry_run=False, concurrency=4):
+    """Run steps 7 and 8 again on the plannings of a results file, without browser or PASS credentials"""
+    logger = setup_logging()
+    logger.info("Replaying %s%s", results_file, ' (dry run, step 7 only)' if dry_run else '')
+
+    try:
+        client, outbox, drainer = None, None, None
+        if not dry_run:
+            client = ApiClient()
+            client.authenticate(Config.TRANSAT_API_EMAIL, Config.TRANSAT_API_PASSWORD)
+            outbox = create_outbox()
+            if outbox is not None:
+                drainer = OutboxDrainer(outbox, client, batch_size=Config.OUTBOX_BATCH_SIZE,
+                                        concurrency=Config.OUTBOX_CONCURRENCY).start()
+
+        calendar_dir = None
+        if Config.CALENDAR_FEEDS and not dry_run:
+            calendar_dir = Config.CALENDAR_DIR or os.path.join(Config.OUTPUT_DIR, 'calendars')
+        course_store = CourseStore() if Config.API_SHARED_COURSES and not dry_run else None
+        stats = PlanningReplay(client, outbox, concurrency, user_ids, calendar_dir, course_store).run(results_file)
+        if drainer is not None:
+            delivery_started = time.perf_counter()
+            drainer.stop(drain_timeout=Config.OUTBOX_DRAIN_TIMEOUT)
+            stats['outbox'] = drainer.summary()
+            stats['outbox']['delivery_seconds'] = round(time.perf_counter() - delivery_started, 3)
+    except Exception as e:
+        logger.error("Replay failed: %s", e, exc_info=True)
+        sys.exit(1)
+
+    logger.info("Replayed %s users: %s courses in, %s after step 7, "
+                "%s users submitted, %s failed in %ss (%.1f users/s, %.0f courses/s)",
+                stats['users'], stats['courses_in'], stats['courses_out'], stats['submitted'], stats['failed'],
+                stats['wall_seconds'], stats['users_per_second'], stats['courses_per_second'])
+    print(json.dumps(stats, indent=2, ensure_ascii=False))
+    if stats['failed'] or stats.get('outbox', {}).get('pending') or stats.get('outbox', {}).get('sending'):
+        sys.exit(1)
+
+def run_coordinator(queue_path, run_id=None, poll_interval=30):
+    """Split the users of a run into the shared work queue, wait for the workers and merge their results"""
+    logger = setup_logging()
+    run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    logger.info("Starting coordinator for run %s (queue: %s)", run_id, queue_path)
+
+    try:
+        client = ApiClient()
+        client.authenticate(Config.TRANSAT_API_EMAIL, Config.TRANSAT_API_PASSWORD)
+        all_users = client.get_all_users()
+        logger.info("Retrieved %s users from the API.", len(all_users))
+
+        work_queue = WorkQueue(queue_path, lease_seconds=Config.WORK_QUEUE_LEASE_SECONDS)
+        work_queue.enqueue(run_id, all_users)
+
+        while not work_queue.is_finished(run_id):
+            logger.info("Run %s progress: %s", run_id, work_queue.progress(run_id))
+            time.sleep(poll_interval)
+
+        result = work_queue.merged_results(run_id)
+        result['run_id'] = run_id
+        logger.info("Run %s finished: %s succeeded, %s failed.", run_id, result['success'], result['failed'])
+        finish_run(result, logger)
+
+    except Exception as e:
+        logger.error("Coordinator run failed: %s", e, exc_info=True)
         sys.exit(1)
 
+def run_worker(queue_path, run_id=None, worker_id=None):
+    """Claim users from the shared work queue and scrape them until the run is finished"""
+    logger = setup_logging()
+    started_at = time.time()
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    try:
+        Config.require_pass_credentials()
+        work_queue = WorkQueue(queue_path, lease_seconds=Config.WORK_QUEUE_LEASE_SECONDS)
+        # Without --run-id, wait for a run enqueued after this worker started: the latest run of the
+        # queue may be a finished (or abandoned) earlier one. A restarted worker needs --run-id.
+        while run_id is None:
+            run_id = work_queue.latest_run_id(created_after=started_at)
+            if run_id is None:
+                logger.info("No new run in the work queue yet, waiting for the coordinator...")
+                time.sleep(10)
+
+        # Workers log in with the first PASS account; give each worker container its own to spread the load.
+        pass_username, pass_password = Config.pass_accounts()[0]
+        driver_factory, scraper = create_scraper()
+        summary = scraper.run_queue_worker(
+            work_queue, run_id, worker_id,
+            pass_username=pass_username,
+            pass_password=pass_password
+        )
+        scraper.close()
+        driver_factory.close()
+
+        if 'error' in summary:
+            logger.error("Worker %s failed: %s", worker_id, summary['error'])
+            sys.exit(1)
+
+    except Exception as e:
+        logger.error("Worker run failed: %s", e, exc_info=True)
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Transat PASS planning scraper")
+    parser.add_argument('mode', nargs='?', default='run', choices=['run', 'coordinator', 'worker', 'fixtures', 'drain', 'replay'],
+                        help="run: single-node scrape (default); coordinator/worker: sharded run over a shared work queue; "
+                             "fixtures: offline replay of recorded weeks; drain: deliver the courses left in the outbox; "
+                             "replay: run steps 7 and 8 again on a results file")
+    parser.add_argument('results_file', nargs='?', help="Replay mode: scraper_results_*.json file to replay")
+    parser.add_argument('--queue', default=None, help="Work queue SQLite file, on a volume shared by all containers")
+    parser.add_argument('--run-id', default=None, help="Run to coordinate or join (worker default: the first run enqueued after the worker started)")
+    parser.add_argument('--worker-id', default=None, help="Worker identifier (default: hostname-pid)")
+    parser.add_argument('--user', action='append', default=None,
+                        help="Only process this user id (run, fixtures and replay modes, repeatable)")
+    parser.add_argument('--record-fixtures', default=None, metavar='DIR',
+                        help="Run mode: also save every week read from PASS into DIR, for offline replays")
+    parser.add_argument('--fixtures-dir', default=os.path.join(Config.OUTPUT_DIR, 'fixtures'),
+                        help="Fixtures mode: recorded weeks to replay")
+    parser.add_argument('--repeat', type=int, default=1, help="Fixtures mode: replay the weeks this many times")
+    parser.add_argument('--requeue-dead', action='store_true',
+                        help="Drain mode: retry the courses the API rejected or that ran out of attempts")
+    parser.add_argument('--dry-run', action='store_true', help="Replay mode: run step 7 only, send nothing to the API")
+    parser.add_argument('--concurrency', type=int, default=4, help="Replay mode: users submitted at the same time")
+    parser.add_argument('--profile', action='store_true',
+                        help="Sample the run and write a collapsed-stack file and a top-N report next to the results")
+    parser.add_argument('--profile-interval', type=float, default=5, help="Milliseconds between profile samples")
+    parser.add_argument('--profile-top', type=int, default=30, help="Functions and users listed in the profile report")
+    args = parser.parse_args()
+    set_backend(Config.JSON_BACKEND)
+
+    queue_path = args.queue or Config.WORK_QUEUE_PATH or os.path.join(Config.OUTPUT_DIR, 'work_queue.sqlite')
+    user_ids = set(args.user) if args.user else None
+    with maybe_profiling(args.profile, Config.OUTPUT_DIR, args.profile_interval / 1000, args.profile_top):
+        if args.mode == 'coordinator':
+            run_coordinator(queue_path, args.run_id)
+        elif args.mode == 'worker':
+            run_worker(queue_path, args.run_id, args.worker_id)
+        elif args.mode == 'replay':
+            if not args.results_file:
+                parser.error("replay mode needs a results file")
+            run_replay(args.results_file, user_ids, args.dry_run, args.concurrency)
+        elif args.mode == 'drain':
+            run_drain(args.requeue_dead)
+        elif args.mode == 'fixtures':
+            run_fixtures(args.fixtures_dir, user_ids, args.repeat)
+        else:
+            run_scraper(user_ids, args.record_fixtures)
+
 if __name__ == "__main__":
-    run_scraper()
\ No newline at end of file
+    main()
@@ -1,62 +1,135 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.common.keys import Keys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import itertools
+import threading
 import time
 import logging
 import os
 import requests
-import re
 from config import Config
 from api_client import ApiClient
 from datetime import datetime
-from steps.step6_scrape_planning import step6_scrape_planning
+from steps.step5_match_result import (
+    SCORE_FULL_NAME, SCORE_LABELS, describe_candidates, extract_search_results, profile_url, rank_search_results
+)
+from steps.step6_scrape_planning import step6_scrape_planning, _get_mondays_to_scrape
 from steps.step7_optimize_planning import step7_optimize_planning
+from steps.step7c_calendar_feed import step7c_write_calendar
 from steps.step8_submit_to_api import step8_submit_to_api
+from session_store import save_cookies
+from driver_factory import DriverFactory
+from logging_setup import setup_logging_from_config, log_context, update_log_context
+from rate_control import AdaptiveConcurrencyLimiter
+from outbox import OutboxDrainer
+from run_budget import UserHistory, RunScheduler
+from browser_supervisor import BrowserSupervisor
+from account_pool import AccountPool, PassAccount
+from course_store import CourseStore
+from webdriver_stats import WebDriverCommandStats, instrument_driver, merge_summaries, parse_budgets, round_trip_budget
 
 class TransatPassScraper:
-    def __init__(self, headless=False, timeout=10):
+    def __init__(self, headless=False, timeout=10, lean=True, driver=None, session_dir=None, driver_factory=None, limiter=None,
+                 record_dir=None, outbox=None):
         """
         Initialize the scraper
         
         Args:
             headless (bool): Run browser in headless mode
             timeout (int): Default timeout for waiting elements
+            lean (bool): Block images/fonts/CSS and use eager page loads
+            driver: An already configured WebDriver to use instead of launching one
+            session_dir (str): Directory persisting the authenticated browser session across runs
+            driver_factory (DriverFactory): Factory providing (pre-launched) browsers, shared between scrapers
+            limiter (AdaptiveConcurrencyLimiter): Concurrency/rate control toward PASS, shared between scrapers
+            record_dir (str): If set, the weeks read in step 6 are saved there (one directory per user) as fixtures
+            outbox (Outbox): If set, step 8 queues the courses there and full runs deliver them in the background
         """
         self.timeout = timeout
-        self.driver = None
+        self.record_dir = record_dir
+        self.outbox = outbox
+        # WebDriver commands sent by this scraper, by step, and the per-user budgets they are checked against.
+        self.webdriver_stats = WebDriverCommandStats()
+        self.round_trip_budgets = parse_budgets(Config.WEBDRIVER_BUDGETS)
+        # Whether step 8 started for the current user: after a failure past that point, some of
+        # their courses may have been posted already, so the user must not be retried.
+        self.submit_started = False
+        # Whether step 8 reported courses it could not send (or queue) for the current user.
+        self.submit_failed = False
+        # Courses shared between users (same promo/group), stored once for the run.
+        self.course_store = CourseStore()
+        self._parse_pool = None
+        self.session_dir = session_dir or None
+        self.logged_in = False
         self.setup_logging()
-        self.setup_driver(headless)
+        self._driver = driver
+        self._driver_future = None
+        self._owns_factory = False
+        self.driver_factory = driver_factory
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(
+            min_limit=Config.PASS_MIN_CONCURRENCY,
+            max_limit=Config.PASS_MAX_CONCURRENCY,
+            target_latency=Config.PASS_TARGET_LATENCY
+        )
+        # Browser recycling and per-user deadline over long runs (restarts need the driver factory).
+        self.supervisor = BrowserSupervisor(
+            max_users=Config.BROWSER_RECYCLE_USERS,
+            max_rss_mb=Config.BROWSER_MAX_RSS_MB,
+            user_deadline=Config.USER_DEADLINE_SECONDS
+        )
+        if self._driver is None:
+            self.setup_driver(headless, lean)
 
     def setup_logging(self):
-        """Setup logging configuration"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        """Setup logging configuration (a no-op if the entry point already configured it)"""
+        setup_logging_from_config()
         self.logger = logging.getLogger(__name__)
 
-    def setup_driver(self, headless):
-        """Setup Chrome WebDriver with options"""
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        
-        try:
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.maximize_window()
-            self.logger.info("WebDriver initialized successfully")
-        except Exception as e:
-            self.logger.error(f"Failed to initialize WebDriver: {e}")
-            raise
+    def setup_driver(self, headless, lean=True):
+        """
+        Start acquiring a Chrome WebDriver in the background.
+
+        The browser launch overlaps with whatever runs next (API authentication, user list
+        fetch); the first access to self.driver waits for it.
+        """
+        if self.driver_factory is None:
+            self.driver_factory = DriverFactory(headless=headless, lean=lean, session_dir=self.session_dir)
+            self._owns_factory = True
+        self._driver_future = self.driver_factory.acquire_async()
+
+    @property
+    def driver(self):
+        """The WebDriver, waiting for the background launch to finish if needed."""
+        if self._driver is None and self._driver_future is not None:
+            future, self._driver_future = self._driver_future, None
+            try:
+                self._driver = future.result()
+            except Exception as e:
+                self.logger.error("Failed to initialize WebDriver: %s", e)
+                raise
+        if self._driver is not None and getattr(self._driver, '_command_stats', None) is not self.webdriver_stats:
+            instrument_driver(self._driver, self.webdriver_stats)
+        return self._driver
+
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
+        self._driver_future = None
     
+    @property
+    def parse_pool(self):
+        """Worker processes parsing week snapshots in step 6 (None: parse in this thread), started on first use."""
+        if self._parse_pool is None and Config.WEEK_PARSER == 'html' and Config.PARSE_WORKERS > 0:
+            # Spawned, not forked: this process already runs threads (logging, driver launch, prefetches).
+            # Each worker re-imports the main module (run_scraper.py, hence Selenium) once, at startup.
+            self._parse_pool = ProcessPoolExecutor(max_workers=Config.PARSE_WORKERS,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return self._parse_pool
+
     def wait_and_click(self, locator_type, locator_value):
         """
         Wait for element and click it
@@ -70,10 +143,10 @@ class TransatPassScraper:
                 EC.element_to_be_clickable((locator_type, locator_value))
             )
             element.click()
-            self.logger.info(f"Clicked element: {locator_value}")
+            self.logger.info("Clicked element: %s", locator_value)
             return True
         except TimeoutException:
-            self.logger.error(f"Timeout waiting for clickable element: {locator_value}")
+            self.logger.error("Timeout waiting for clickable element: %s", locator_value)
             return False
     
     def wait_and_send_keys(self, locator_type, locator_value, text):
@@ -91,10 +164,10 @@ class TransatPassScraper:
             )
             element.clear()
             element.send_keys(text)
-            self.logger.info(f"Sent text to element: {locator_value}")
+            self.logger.info("Sent text to element: %s", locator_value)
             return True
         except TimeoutException:
-            self.logger.error(f"Timeout waiting for element: {locator_value}")
+            self.logger.error("Timeout waiting for element: %s", locator_value)
             return False
         
     def step1_select_auth_mode(self):
@@ -105,7 +178,7 @@ class TransatPassScraper:
             self.logger.info("Step 1: Navigating to login page and selecting auth mode")
             
             # Navigate to the initial page
-            self.driver.get("https://pass.imt-atlantique.fr/OpDotNet/Noyau/Login.aspx?")
+            self.driver.get(f"{Config.PASS_BASE_URL}/OpDotNet/Noyau/Login.aspx?")
             self.logger.info("Navigated to login page")
             
             # Wait for page to load
@@ -121,7 +194,7 @@ class TransatPassScraper:
                 return False
                 
         except Exception as e:
-            self.logger.error(f"Error in step 1: {e}")
+            self.logger.error("Error in step 1: %s", e)
             return False
     
     def step2_login(self, username, password):
@@ -133,16 +206,16 @@ class TransatPassScraper:
             password (str): Password for login
         """
         try:
-            self.logger.info(f"Step 2: Entering login credentials (username: {username}, password: {password})")
-            self.logger.info(f"Current URL before login: {self.driver.current_url}")
+            self.logger.info("Step 2: Entering login credentials (username: %s)", username)
+            self.logger.info("Current URL before login: %s", self.driver.current_url)
             
             # Wait for login form to appear
             time.sleep(3)
             
             # Check that we are on the correct CAS login URL
             current_url = self.driver.current_url
-            if "https://cas.imt-atlantique.fr/cas/login?" not in current_url:
-                self.logger.error(f"Not on CAS login page, current URL: {current_url}")
+            if f"{Config.CAS_BASE_URL}/cas/login?" not in current_url:
+                self.logger.error("Not on CAS login page, current URL: %s", current_url)
                 return False
             
             # Fill username
@@ -150,10 +223,10 @@ class TransatPassScraper:
                 username_input = self.driver.find_element(By.XPATH, '//*[@id="username"]')
                 username_input.clear()
                 username_input.send_keys(username)
-                self.logger.info(f"Filled username field with: {username}")
-                self.logger.info(f"Current URL after filling username: {self.driver.current_url}")
+                self.logger.info("Filled username field with: %s", username)
+                self.logger.info("Current URL after filling username: %s", self.driver.current_url)
             except Exception as e:
-                self.logger.error(f"Could not find or fill username field: {e}. Current URL: {self.driver.current_url}")
+                self.logger.error("Could not find or fill username field: %s. Current URL: %s", e, self.driver.current_url)
                 return False
             
             # Fill password
@@ -161,23 +234,23 @@ class TransatPassScraper:
                 password_input = self.driver.find_element(By.XPATH, '//*[@id="password"]')
                 password_input.clear()
                 password_input.send_keys(password)
-                self.logger.info(f"Filled password field with: {password}")
-                self.logger.info(f"Current URL after filling password: {self.driver.current_url}")
+                self.logger.info("Filled password field.")
+                self.logger.info("Current URL after filling password: %s", self.driver.current_url)
                 # Try sending ENTER key to password field
                 password_input.send_keys(Keys.RETURN)
                 self.logger.info("Submitted login form by sending ENTER to password field.")
             except Exception as e:
-                self.logger.error(f"Could not find or fill password field: {e}. Current URL: {self.driver.current_url}")
+                self.logger.error("Could not find or fill password field: %s. Current URL: %s", e, self.driver.current_url)
                 return False
             
             time.sleep(2)
-            self.logger.info(f"Current URL after submitting login: {self.driver.current_url}")
+            self.logger.info("Current URL after submitting login: %s", self.driver.current_url)
             
             # Check for error message
             try:
                 msg_elem = self.driver.find_element(By.XPATH, '//*[@id="msg"]')
                 if msg_elem.is_displayed() and msg_elem.text.strip():
-                    self.logger.error(f"Login error message displayed: {msg_elem.text.strip()}. Current URL: {self.driver.current_url}")
+                    self.logger.error("Login error message displayed: %s. Current URL: %s", msg_elem.text.strip(), self.driver.current_url)
                     return False
             except NoSuchElementException:
                 self.logger.info("No login error message element found after submit (NoSuchElementException).")
@@ -187,35 +260,35 @@ class TransatPassScraper:
             # Wait for URL to change from CAS login page
             for i in range(20):  # up to 10 seconds
                 new_url = self.driver.current_url
-                if "cas.imt-atlantique.fr/cas/login" not in new_url:
-                    self.logger.info(f"Left CAS login page, new URL: {new_url}")
+                if f"{Config.CAS_BASE_URL}/cas/login" not in new_url:
+                    self.logger.info("Left CAS login page, new URL: %s", new_url)
                     break
                 time.sleep(0.5)
             else:
-                self.logger.warning(f"ENTER key did not submit form, trying to click submit button. Current URL: {self.driver.current_url}")
+                self.logger.warning("ENTER key did not submit form, trying to click submit button. Current URL: %s", self.driver.current_url)
                 try:
                     submit_btn = self.driver.find_element(By.XPATH, '//*[@id="fm1"]//input[@type="submit" and @name="submit"]')
                     submit_btn.click()
                     self.logger.info("Clicked submit button as fallback.")
                     time.sleep(2)
-                    self.logger.info(f"Current URL after clicking submit: {self.driver.current_url}")
+                    self.logger.info("Current URL after clicking submit: %s", self.driver.current_url)
                 except Exception as e2:
-                    self.logger.error(f"Could not find or click submit button: {e2}. Current URL: {self.driver.current_url}")
+                    self.logger.error("Could not find or click submit button: %s. Current URL: %s", e2, self.driver.current_url)
                     return False
                 
                 # Wait again for redirect
                 for i in range(20):
                     new_url = self.driver.current_url
-                    if "cas.imt-atlantique.fr/cas/login" not in new_url:
-                        self.logger.info(f"Left CAS login page after clicking submit, new URL: {new_url}")
+                    if f"{Config.CAS_BASE_URL}/cas/login" not in new_url:
+                        self.logger.info("Left CAS login page after clicking submit, new URL: %s", new_url)
                         break
                     time.sleep(0.5)
                 else:
-                    self.logger.error(f"Still on CAS login page after all attempts. Current URL: {self.driver.current_url}")
+                    self.logger.error("Still on CAS login page after all attempts. Current URL: %s", self.driver.current_url)
                     try:
                         msg_elem = self.driver.find_element(By.XPATH, '//*[@id="msg"]')
                         if msg_elem.is_displayed() and msg_elem.text.strip():
-                            self.logger.error(f"Login error message displayed: {msg_elem.text.strip()}. Current URL: {self.driver.current_url}")
+                            self.logger.error("Login error message displayed: %s. Current URL: %s", msg_elem.text.strip(), self.driver.current_url)
                     except NoSuchElementException:
                         self.logger.info("No login error message element found after all attempts (NoSuchElementException).")
                     except Exception:
@@ -224,7 +297,7 @@ class TransatPassScraper:
             
             return True
         except Exception as e:
-            self.logger.error(f"Error in step 2: {e}. Current URL: {self.driver.current_url if self.driver else 'driver not initialized'}")
+            self.logger.error("Error in step 2: %s. Current URL: %s", e, self.driver.current_url if self.driver else 'driver not initialized')
             return False
     
     def step2b_handle_saml_post_sso(self):
@@ -242,33 +315,133 @@ class TransatPassScraper:
                     time.sleep(2)
                     return True
                 except Exception as e:
-                    self.logger.error(f"Could not find or click SAML2 SSO button: {e}")
+                    self.logger.error("Could not find or click SAML2 SSO button: %s", e)
                     return False
             else:
                 self.logger.info("No SAML2 POST SSO step needed")
                 return True
         except Exception as e:
-            self.logger.error(f"Error in step2b_handle_saml_post_sso: {e}")
+            self.logger.error("Error in step2b_handle_saml_post_sso: %s", e)
+            return False
+
+    def is_pass_session_valid(self):
+        """
+        Probe whether the browser already holds a valid PASS session.
+
+        Returns:
+            bool: True if PASS serves Default.aspx without redirecting to the login flow
+        """
+        try:
+            self.driver.get(f"{Config.PASS_BASE_URL}/OpDotNet/Noyau/Default.aspx?")
+            # An expired session is redirected to Login.aspx or CAS, give redirects a moment.
+            for i in range(4):
+                current_url = self.driver.current_url
+                if "Login.aspx" in current_url or Config.CAS_BASE_URL in current_url:
+                    self.logger.info("PASS session is not valid, redirected to: %s", current_url)
+                    return False
+                time.sleep(0.5)
+            if f"{Config.PASS_BASE_URL}/OpDotNet/Noyau/Default.aspx" in self.driver.current_url:
+                self.logger.info("PASS session is still valid.")
+                return True
+            self.logger.info("PASS session probe ended on unexpected URL: %s", self.driver.current_url)
+            return False
+        except Exception as e:
+            self.logger.warning("Could not probe PASS session: %s", e)
             return False
 
+    def ensure_logged_in(self, username, password):
+        """
+        Reuse the persisted PASS session when it is still valid, otherwise run the CAS/SAML login (steps 1 to 2b).
+
+        Args:
+            username (str): Username for login
+            password (str): Password for login
+
+        Returns:
+            str: An error message, or None once the browser is logged in
+        """
+        with log_context(step='login'):
+            if self.session_dir and self.is_pass_session_valid():
+                self.logger.info("Reusing persisted PASS session, skipping CAS login.")
+                self.logged_in = True
+                return None
+
+            # Step 1: Select authentication mode.
+            if not self.step1_select_auth_mode():
+                return 'Failed at step 1: Auth mode selection'
+
+            # Step 2: Login.
+            if not self.step2_login(username, password):
+                return 'Failed at step 2: Login'
+
+            # Step 2b: Handle SAML POST SSO if present
+            if not self.step2b_handle_saml_post_sso():
+                return 'Failed at step 2b: SAML POST SSO'
+
+            self.logged_in = True
+            self.persist_session()
+            return None
+
+    def restart_browser(self, username, password, persist=True):
+        """
+        Replace the browser with a fresh one from the driver factory and log it in again.
+
+        Args:
+            persist (bool): Save the session of the old browser first (not for a killed one).
+
+        Returns:
+            str: An error message, or None once the new browser is logged in
+        """
+        if self.driver_factory is None:
+            return "No driver factory to launch a new browser"
+        old_driver = self._driver
+        if old_driver is not None:
+            if persist:
+                self.persist_session()
+            self.driver_factory.release(old_driver)
+        self._driver = None
+        self.logged_in = False
+        self._driver_future = self.driver_factory.acquire_async()
+        return self.ensure_logged_in(username, password)
+
+    def process_user_supervised(self, user, client, pass_username, pass_password):
+        """
+        process_user under the browser supervisor: the browser is restarted first if it is due
+        (users served, memory, killed by the deadline), and killed if the user exceeds the deadline.
+        """
+        self.submit_started = False
+        self.submit_failed = False
+        self.supervisor.before_user(self, pass_username, pass_password)
+        with self.supervisor.watch(self, user.get('id')):
+            return self.process_user(user, client)
+
+    def persist_session(self):
+        """Save the browser cookies to the session directory, if session persistence is enabled."""
+        if not self.session_dir or not self.driver:
+            return
+        try:
+            save_cookies(self.driver, self.session_dir)
+        except Exception as e:
+            self.logger.warning("Could not persist browser session: %s", e)
+
     def step3_navigate_to_search(self):
         """
         Step 3: Navigate to Annuaire/Annuaires search page, go inside MANavigationBase frame, then MARecherche frame, and download its content.
         """
         try:
             self.logger.info("Step 3: Navigating directly to Annuaire/Annuaires search page")
-            self.driver.get("https://pass.imt-atlantique.fr/OpDotNet/Noyau/Default.aspx?")
+            self.driver.get(f"{Config.PASS_BASE_URL}/OpDotNet/Noyau/Default.aspx?")
             time.sleep(4)
             
             # Wait for the page to load after login and for the correct URL
             for i in range(20):  # up to ~10 seconds
                 current_url = self.driver.current_url
-                if "https://pass.imt-atlantique.fr/OpDotNet/Noyau/Default.aspx?" in current_url:
+                if f"{Config.PASS_BASE_URL}/OpDotNet/Noyau/Default.aspx?" in current_url:
                     break
                 time.sleep(0.5)
             else:
                 current_url = self.driver.current_url
-                self.logger.error(f"Did not reach Default.aspx page after login. Last URL: {current_url}")
+                self.logger.error("Did not reach Default.aspx page after login. Last URL: %s", current_url)
                 return False
             
             # Use JS to set window.parent.content.location to Annuaire Accueil
@@ -295,9 +468,9 @@ class TransatPassScraper:
                         navigation_base_path = os.path.join('data', f'MANavigationBase_debug_{ts}.html')
                         with open(navigation_base_path, 'w', encoding='utf-8') as f:
                             f.write(navigation_base_html)
-                        self.logger.info(f"Saved HTML of MANavigationBase frame to: {navigation_base_path}")
+                        self.logger.info("Saved HTML of MANavigationBase frame to: %s", navigation_base_path)
                     except Exception as e:
-                        self.logger.error(f"Could not save HTML of MANavigationBase frame: {e}")
+                        self.logger.error("Could not save HTML of MANavigationBase frame: %s", e)
                     # Retry switching to MARecherche frame
                     for attempt in range(5):
                         try:
@@ -313,24 +486,24 @@ class TransatPassScraper:
                                 html_path = os.path.join('data', f'MARecherche_debug_{ts}.html')
                                 with open(html_path, 'w', encoding='utf-8') as f:
                                     f.write(html)
-                                self.logger.info(f"Saved HTML of MARecherche frame to: {html_path}")
+                                self.logger.info("Saved HTML of MARecherche frame to: %s", html_path)
                                 return True
                             except Exception as e:
-                                self.logger.error(f"Could not retrieve HTML of MARecherche frame: {e}")
+                                self.logger.error("Could not retrieve HTML of MARecherche frame: %s", e)
                                 return False
                         except Exception as e:
-                            self.logger.warning(f"Attempt {attempt + 1}: Could not switch to MARecherche frame: {e}")
+                            self.logger.warning("Attempt %s: Could not switch to MARecherche frame: %s", attempt + 1, e)
                             time.sleep(1)  # Wait before retrying
                     self.logger.error("Failed to switch to MARecherche frame after multiple attempts")
                     return False
                 except Exception as e:
-                    self.logger.error(f"Could not switch to MANavigationBase frame: {e}")
+                    self.logger.error("Could not switch to MANavigationBase frame: %s", e)
                     return False
             except Exception as e:
-                self.logger.error(f"Error switching frames in step 3: {e}. Current URL: {self.driver.current_url if self.driver else 'driver not initialized'}")
+                self.logger.error("Error switching frames in step 3: %s. Current URL: %s", e, self.driver.current_url if self.driver else 'driver not initialized')
                 return False
         except Exception as e:
-            self.logger.error(f"Error in step 3 (outer): {e}. Current URL: {self.driver.current_url if self.driver else 'driver not initialized'}")
+            self.logger.error("Error in step 3 (outer): %s. Current URL: %s", e, self.driver.current_url if self.driver else 'driver not initialized')
             return False
 
     def step4_search_person(self, first_name, last_name):
@@ -355,9 +528,9 @@ class TransatPassScraper:
                 )
                 search_input.clear()
                 search_input.send_keys(full_name)
-                self.logger.info(f"Filled search field with: {full_name}")
+                self.logger.info("Filled search field with: %s", full_name)
             except Exception as e:
-                self.logger.error(f"Could not find or fill search field: {e}. Current URL: {self.driver.current_url}")
+                self.logger.error("Could not find or fill search field: %s. Current URL: %s", e, self.driver.current_url)
                 return False
 
             # Click the search button
@@ -368,22 +541,29 @@ class TransatPassScraper:
                 search_button.click()
                 self.logger.info("Clicked search button")
             except Exception as e:
-                self.logger.error(f"Could not find or click search button: {e}. Current URL: {self.driver.current_url}")
+                self.logger.error("Could not find or click search button: %s. Current URL: %s", e, self.driver.current_url)
                 return False
 
             time.sleep(2)  # Wait for results to load
             return True
         except Exception as e:
-            self.logger.error(f"Error in step 4: {e}. Current URL: {self.driver.current_url if self.driver else 'driver not initialized'}")
+            self.logger.error("Error in step 4: %s. Current URL: %s", e, self.driver.current_url if self.driver else 'driver not initialized')
             return False
     
-    def step5_get_result_link(self, first_name, last_name, user_id):
+    def step5_get_result_link(self, first_name, last_name, user_id, email=None):
         """
         Step 5: Get specific link from search results (Annuaire) and cache user's pass ID in the database.
 
+        The results are read from one snapshot of the MAContenu frame and ranked: the user's email,
+        then their full name, then a partial name match. Only an email or full-name match is cached;
+        a partial match is used for this run only, and an ambiguous one (several results with the
+        best score, e.g. homonyms) is reported instead of used.
+
         Args:
             first_name (str): First name of the user
             last_name (str): Last name of the user
+            user_id: ID of the user in the API
+            email (str): Email of the user, if known
 
         Returns:
             str: URL of the result link or None if not found
@@ -403,63 +583,44 @@ class TransatPassScraper:
                 )
                 self.driver.switch_to.frame(contenu_frame)
                 self.logger.info("Switched to MAContenu frame")
+                contenu_html = self.driver.execute_script("return document.documentElement.outerHTML;")
+            except Exception as e:
+                self.logger.error("Could not switch to MAContenu frame: %s", e)
+                return None
 
-                # Save the HTML content of MAContenu frame for debugging
-                try:
-                    contenu_html = self.driver.execute_script("return document.documentElement.outerHTML;")
-                    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    contenu_path = os.path.join('data', f'MAContenu_debug_{ts}.html')
-                    with open(contenu_path, 'w', encoding='utf-8') as f:
-                        f.write(contenu_html)
-                    self.logger.info(f"Saved HTML of MAContenu frame to: {contenu_path}")
-                except Exception as e:
-                    self.logger.error(f"Could not save HTML of MAContenu frame: {e}")
-
-                # Try to find the user id by scanning all <a> with ouvrirDossierObjet in onclick
-                try:
-                    links = self.driver.find_elements(By.XPATH, "//a[contains(@onclick, 'ouvrirDossierObjet(')]")
-                    for link in links:
-                        onclick_attr = link.get_attribute('onclick')
-                        match = re.search(r"ouvrirDossierObjet\((\d+),", onclick_attr)
-                        if not match:
-                            continue
-                        # Check for a sibling mailto link with the right email
-                        parent_td = link.find_element(By.XPATH, './ancestor::td[1]')
-                        try:
-                            sibling_email_link = parent_td.find_element(By.XPATH, "following-sibling::td//a[starts-with(@href, 'mailto:')]")
-                            email_text = sibling_email_link.text.strip().lower()
-                            
-                            if first_name.lower() in email_text or last_name.lower() in email_text:
-                                object_id = match.group(1)
-                                profile_url = f"https://pass.imt-atlantique.fr/OpDotNet/eplug/Annuaire/Navigation/Dossier/Dossier.aspx?IdObjet={object_id}&IdTypeObjet=25&IdAnn=&IdProfil=&AccesPerso=false&Wizard="
-                                self.logger.info(f"Found profile URL: {profile_url}")
-
-                                # Step 5b: Cache user's pass ID in the database
-                                self.step5b_cache_pass_id(int(user_id), int(object_id))
-
-                                return profile_url
-                        except Exception:
-                            # If no email, fallback to check if the link text matches first or last name
-                            link_text = link.text.strip().lower()
-                            if first_name.lower() in link_text or last_name.lower() in link_text:
-                                object_id = match.group(1)
-                                profile_url = f"https://pass.imt-atlantique.fr/OpDotNet/eplug/Annuaire/Navigation/Dossier/Dossier.aspx?IdObjet={object_id}&IdTypeObjet=25&IdAnn=&IdProfil=&AccesPerso=false&Wizard="
-                                self.logger.info(f"Found profile URL (fallback): {profile_url}")
-
-                                # Step 5b: Cache user's pass ID in the database
-                                self.step5b_cache_pass_id(int(user_id), int(object_id))
-
-                                return profile_url
-                    self.logger.error(f"No user link found for {first_name} {last_name} in MAContenu.")
-                    return None
-                except Exception as e:
-                    self.logger.error(f"Error finding user link: {e}")
-                    return None
+            # Save the HTML content of MAContenu frame for debugging
+            try:
+                ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+                contenu_path = os.path.join('data', f'MAContenu_debug_{ts}.html')
+                with open(contenu_path, 'w', encoding='utf-8') as f:
+                    f.write(contenu_html)
+                self.logger.info("Saved HTML of MAContenu frame to: %s", contenu_path)
             except Exception as e:
-                self.logger.error(f"Could not switch to MAContenu frame: {e}")
+                self.logger.error("Could not save HTML of MAContenu frame: %s", e)
+
+            candidates = extract_search_results(contenu_html)
+            ranking = rank_search_results(candidates, first_name, last_name, email)
+            if ranking['ambiguous']:
+                self.logger.warning("Ambiguous search results for %s %s, not using any: %s",
+                                    first_name, last_name, describe_candidates(ranking['candidates']))
                 return None
+            match = ranking['match']
+            if match is None:
+                self.logger.error("No user link found for %s %s in MAContenu (%s results).",
+                                  first_name, last_name, len(candidates))
+                return None
+
+            result_url = profile_url(match['pass_id'], Config.PASS_BASE_URL)
+            self.logger.info("Found profile URL (%s match among %s results): %s", SCORE_LABELS[match['score']], len(candidates), result_url)
+            if match['score'] >= SCORE_FULL_NAME:
+                # Step 5b: Cache user's pass ID in the database
+                self.step5b_cache_pass_id(int(user_id), match['pass_id'])
+            else:
+                self.logger.warning("Only a partial match for %s %s: %s. Pass ID not cached.",
+                                    first_name, last_name, describe_candidates([match]))
+            return result_url
         except Exception as e:
-            self.logger.error(f"Error in step 5: {e}")
+            self.logger.error("Error in step 5: %s", e)
             return None
 
     def step5b_cache_pass_id(self, user_id: int, pass_id: int):
@@ -479,69 +640,266 @@ class TransatPassScraper:
                 password = Config.TRANSAT_API_PASSWORD
                 api_client.authenticate(email, password)
             except requests.exceptions.ConnectionError as e:
-                self.logger.error(f"API connection error: {e}. Is the API server running at {api_client.base_api_url}?")
+                self.logger.error("API connection error: %s. Is the API server running at %s?", e, api_client.base_api_url)
                 return {'error': f'API connection error: {e}. Is the API server running at {api_client.base_api_url}?'}
             except Exception as e:
-                self.logger.error(f"API authentication failed: {e}")
+                self.logger.error("API authentication failed: %s", e)
                 return {'error': f'API authentication failed: {e}'}
 
         # Attempt to patch pass ID.
         try:
             api_client.patch_user_pass_id(user_id, pass_id)
-            self.logger.info(f"Successfully cached pass ID {pass_id} in the database.")
+            self.logger.info("Successfully cached pass ID %s in the database.", pass_id)
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Failed to cache pass ID {pass_id}: {e}")
+            self.logger.error("Failed to cache pass ID %s: %s", pass_id, e)
         except Exception as e:
-            self.logger.error(f"Unexpected error in step5b_cache_pass_id: {e}")
+            self.logger.error("Unexpected error in step5b_cache_pass_id: %s", e)
 
-    def run_full_scrape(self, pass_username, pass_password):
+    def step0_prepare_api(self, fetch_users=True):
+        """
+        Step 0: Authenticate to the API and start fetching the users to scrape.
+
+        Args:
+            fetch_users (bool): Also fetch the user list (workers of a sharded run get users from the queue)
+
+        Returns:
+            tuple: (ApiClient, iterator over the users, error message or None)
+        """
+        client = ApiClient()
+        try:
+            client.authenticate(Config.TRANSAT_API_EMAIL, Config.TRANSAT_API_PASSWORD)
+            self.logger.info("Successfully authenticated with the API.")
+        except requests.exceptions.ConnectionError as e:
+            self.logger.error("API connection error: %s. Is the API server running at %s?", e, client.base_api_url)
+            return client, None, f'API connection error: {e}. Is the API server running at {client.base_api_url}?'
+        except Exception as e:
+            self.logger.error("API authentication failed: %s", e)
+            return client, None, f'API authentication failed: {e}'
+
+        if not fetch_users:
+            return client, None, None
+
+        # Stream the users from the API: fetch the first page now so errors surface here,
+        # later pages are fetched while the first users are processed.
+        try:
+            users = client.iter_users()
+            first_user = next(users, None)
+        except Exception as e:
+            self.logger.error("Failed to get users from API: %s", e)
+            return client, None, f"Failed to get users from API: {e}"
+        self.logger.info("Retrieved the first page of users from the API.")
+        return client, itertools.chain([first_user] if first_user is not None else [], users), None
+
+    def process_user(self, user, client):
+        """
+        Run steps 3 to 8 for one user: find their profile (unless the pass_id is cached),
+        scrape, optimize and submit their planning.
+
+        Args:
+            user (dict): The user as returned by the API.
+            client (ApiClient): An authenticated instance of the ApiClient.
+
+        Returns:
+            dict: The user's planning entry (url, scraped_at, planning, incomplete_weeks).
+
+        Raises:
+            Exception: If any step fails for this user.
+        """
+        with log_context(user=user.get('id'), step='step3'), \
+                round_trip_budget(self.webdriver_stats, self.round_trip_budgets, strict=False):
+            user_id = user.get('id')
+            first_name = user.get('first_name', '').strip()
+            last_name = user.get('last_name', '').strip()
+            email = user.get('email', '').strip()
+            cached_pass_id = user.get('pass_id')
+
+            self.logger.info("--- Processing user #%s: %s %s ---", user_id, first_name, last_name)
+
+            result_url = None
+            # Check if pass_id is cached.
+            if cached_pass_id:
+                self.logger.info("User has a cached pass_id: %s. Skipping search.", cached_pass_id)
+                result_url = profile_url(cached_pass_id, Config.PASS_BASE_URL)
+            else:
+                self.logger.info("User has no pass_id. Searching for user...")
+            
+                # Step 3: Navigate to search page.
+                if not self.step3_navigate_to_search():
+                    raise Exception('Failed at step 3: Navigation')
+            
+                # Step 4: Search for person.
+                update_log_context(step='step4')
+                if not self.step4_search_person(first_name, last_name):
+                    raise Exception(f'Failed at step 4: Search for {first_name} {last_name}')
+            
+                # Step 5: Get result link (and cache pass_id)
+                update_log_context(step='step5')
+                result_url = self.step5_get_result_link(first_name, last_name, user_id, email)
+                if not result_url:
+                    raise Exception(f'Failed at step 5: No result link found for {first_name} {last_name}')
+
+            # Step 6: Scrape data.
+            update_log_context(step='step6')
+            scraped_data = step6_scrape_planning(
+                driver=self.driver,
+                profile_url=result_url,
+                limiter=self.limiter,
+                max_attempts=Config.WEEK_MAX_ATTEMPTS,
+                retry_backoff=Config.WEEK_RETRY_BACKOFF,
+                tabs=Config.AGENDA_TABS,
+                record_dir=os.path.join(self.record_dir, str(user_id)) if self.record_dir else None,
+                parser=Config.WEEK_PARSER,
+                parse_pool=self.parse_pool
+            )
+            if 'error' in scraped_data:
+                raise Exception(f"Failed at step 6: Scraping data. Error: {scraped_data['error']}")
+
+            # Step 7: Optimize scraped data by merging consecutive courses.
+            update_log_context(step='step7')
+            if 'planning' in scraped_data and scraped_data['planning']:
+                self.logger.info("Step 7: Optimizing planning for user %s.", user_id)
+                optimized_planning = step7_optimize_planning(scraped_data['planning'])
+                scraped_data['planning'] = optimized_planning
+            else:
+                self.logger.info("Step 7: No planning data to optimize for user %s.", user_id)
+
+            # Step 7c: Calendar feed of the user, rewritten only when their planning changed.
+            if Config.CALENDAR_FEEDS:
+                update_log_context(step='step7c')
+                try:
+                    step7c_write_calendar(scraped_data.get('planning') or [], user_id,
+                                          Config.CALENDAR_DIR or os.path.join(Config.OUTPUT_DIR, 'calendars'),
+                                          scraped_data.get('incomplete_weeks'))
+                except OSError as e:
+                    self.logger.warning("Step 7c: Could not write the calendar of user %s: %s", user_id, e)
+
+            # Step 8: Send courses to API
+            update_log_context(step='step8')
+            self.submit_started = True
+            if 'planning' in scraped_data and scraped_data['planning']:
+                if not step8_submit_to_api(scraped_data['planning'], email, client, outbox=self.outbox,
+                                           course_store=self.course_store if Config.API_SHARED_COURSES else None):
+                    self.submit_failed = True
+                    self.logger.warning("Not all courses were sent to API for user %s.", user_id)
+                else:
+                   self.logger.info("Step 8: Successfully sent all courses for user %s to API.", user_id)
+            else:
+                self.logger.info("No planning data found for user %s to send to API.", user_id)
+
+            self.logger.info("--- Successfully processed user #%s ---", user_id)
+            return {
+                'url': result_url,
+                'email': email,
+                'scraped_at': scraped_data['scraped_at'],
+                'planning': scraped_data['planning'],
+                'incomplete_weeks': scraped_data.get('incomplete_weeks', [])
+            }
+
+    def start_outbox_drainer(self, client):
+        """Deliver the courses queued by step 8 in the background while scraping goes on (if the outbox is used)."""
+        if self.outbox is None:
+            return None
+        return OutboxDrainer(self.outbox, client, batch_size=Config.OUTBOX_BATCH_SIZE,
+                             concurrency=Config.OUTBOX_CONCURRENCY).start()
+
+    def stop_outbox_drainer(self, drainer):
+        """
+        Give the drainer OUTBOX_DRAIN_TIMEOUT seconds to empty the outbox; what is left stays queued on disk.
+
+        A user counts as a success once their courses are queued; the summary tells how many courses
+        were queued and delivered, and how many users still have courses waiting in the outbox.
+        """
+        drainer.stop(drain_timeout=Config.OUTBOX_DRAIN_TIMEOUT)
+        summary = drainer.summary()
+        self.logger.info("Outbox: %s courses queued, %s delivered.", summary['queued'], summary['delivered'])
+        if summary['pending'] or summary['sending'] or summary['dead']:
+            self.logger.warning("Outbox not empty after the run: %s pending, "
+                                "%s dead, courses of %s user(s) not delivered.",
+                                summary['pending'] + summary['sending'], summary['dead'], summary['users_not_delivered'])
+        return summary
+
+    def create_run_scheduler(self):
+        """Scheduler of a full run, with the user history of previous runs and the RUN_DEADLINE_MINUTES budget."""
+        history = UserHistory(Config.USER_HISTORY_FILE or os.path.join(Config.OUTPUT_DIR, 'user_history.json'),
+                              failure_backoff=Config.FAILURE_BACKOFF_HOURS * 3600)
+        return RunScheduler(history, Config.RUN_DEADLINE_MINUTES * 60, weeks=len(_get_mondays_to_scrape()),
+                            save_every=Config.USER_HISTORY_SAVE_EVERY)
+
+    def _scheduled_users(self, all_users, user_ids, scheduler, results):
+        """The whole user list (ordering needs every user), stalest per unit of cost first."""
+        users = []
+        try:
+            for user in all_users:
+                if not user_ids or str(user.get('id')) in user_ids:
+                    users.append(user)
+        except requests.exceptions.RequestException as e:
+            # Schedule the users of the pages fetched so far.
+            self.logger.error("Failed to get the next page of users from API: %s", e)
+            results['users_error'] = f"Failed to get users from API: {e}"
+        return scheduler.order(users)
+
+    def spawn_account_scraper(self, index):
+        """
+        A scraper for another PASS account of the pool: its own browser, driver factory and session
+        directory (SESSION_DIR/account-<index>), sharing this scraper's PASS limiter, outbox, course
+        store and parse workers. It counts its WebDriver commands apart: the per-user round-trip
+        budgets diff the counters of one browser, which other accounts would inflate.
+        """
+        session_dir = os.path.join(self.session_dir, f"account-{index}") if self.session_dir else None
+        driver_factory = DriverFactory(headless=Config.HEADLESS, lean=Config.LEAN_DRIVER, session_dir=session_dir)
+        scraper = TransatPassScraper(timeout=self.timeout, session_dir=session_dir, driver_factory=driver_factory,
+                                     limiter=self.limiter, record_dir=self.record_dir, outbox=self.outbox)
+        scraper._owns_factory = True
+        scraper.course_store = self.course_store
+        scraper._parse_pool = self.parse_pool
+        return scraper
+
+    def run_full_scrape(self, pass_username, pass_password, user_ids=None, accounts=None):
         """
         Run the complete scraping flow for all users from the API.
         
         Args:
             pass_username (str): Login username for the PASS account.
             pass_password (str): Login password for the PASS account.
+            user_ids (set): Only scrape these users (ids as strings), e.g. a single user to profile.
+            accounts (list): (username, password) of other PASS accounts scraping in parallel with this
+                one, each in its own browser (Config.PASS_ACCOUNTS, see account_pool.py).
             
         Returns:
             dict: A summary of the scraping process including all plannings.
         """
+        helpers = []
         try:
             self.logger.info("Starting complete scraping flow for all users!")
-            
-            # Step 0: Authenticate to API before starting scraping.
-            TRANSAT_API_EMAIL = Config.TRANSAT_API_EMAIL
-            TRANSAT_API_PASSWORD = Config.TRANSAT_API_PASSWORD
+            pool = AccountPool(
+                [PassAccount(pass_username, pass_password, self)] +
+                [PassAccount(username, password, self.spawn_account_scraper(i))
+                 for i, (username, password) in enumerate(accounts or [], start=1)],
+                max_failures=Config.ACCOUNT_MAX_FAILURES,
+                cooldown=Config.ACCOUNT_COOLDOWN_SECONDS,
+                max_logins=Config.ACCOUNT_MAX_LOGINS
+            )
+            helpers = [account.scraper for account in pool.accounts[1:]]
 
-            client = ApiClient()
-            try:
-                client.authenticate(TRANSAT_API_EMAIL, TRANSAT_API_PASSWORD)
-                self.logger.info("Successfully authenticated with the API.")
-            except requests.exceptions.ConnectionError as e:
-                self.logger.error(f"API connection error: {e}. Is the API server running at {client.base_api_url}?")
-                return {'error': f'API connection error: {e}. Is the API server running at {client.base_api_url}?'}
-            except Exception as e:
-                self.logger.error(f"API authentication failed: {e}")
-                return {'error': f'API authentication failed: {e}'}
-            
-            # Step 1: Select authentication mode.
-            if not self.step1_select_auth_mode():
-                return {'error': 'Failed at step 1: Auth mode selection'}
-            
-            # Step 2: Login.
-            if not self.step2_login(pass_username, pass_password):
-                return {'error': 'Failed at step 2: Login'}
-            
-            # Step 2b: Handle SAML POST SSO if present
-            if not self.step2b_handle_saml_post_sso():
-                return {'error': 'Failed at step 2b: SAML POST SSO'}
+            # Startup phase: the API (authentication + user list) and PASS (browser launch + login
+            # of every account) are independent, run them concurrently.
+            with ThreadPoolExecutor(max_workers=1 + len(pool.accounts), thread_name_prefix='startup') as startup:
+                api_future = startup.submit(self.step0_prepare_api)
+                login_futures = [startup.submit(account.scraper.ensure_logged_in, account.username, account.password)
+                                 for account in pool.accounts]
 
-            # Get all users from the API.
-            try:
-                all_users = client.get_all_users()
-                self.logger.info(f"Retrieved {len(all_users)} users from the API.")
-            except Exception as e:
-                self.logger.error(f"Failed to get users from API: {e}")
-                return {'error': f"Failed to get users from API: {e}"}
+                client, all_users, api_error = api_future.result()
+                # Steps 1 to 2b: Login, unless the persisted session is still valid.
+                login_errors = [future.result() for future in login_futures]
+
+            if api_error:
+                return {'error': api_error}
+            if all(login_errors):
+                return {'error': login_errors[0]}
+            for account, login_error in zip(pool.accounts, login_errors):
+                pool.login_result(account, login_error)
+            drainer = self.start_outbox_drainer(client)
+            scheduler = self.create_run_scheduler()
 
             # Initialize results with a dictionary to hold all plannings, keyed by pass_id.
             results = {
@@ -552,86 +910,166 @@ class TransatPassScraper:
                 'all_plannings': {}
             }
 
-            # Loop through each user.
-            for user in all_users:
-                user_id = user.get('id')
-                first_name = user.get('first_name', '').strip()
-                last_name = user.get('last_name', '').strip()
-                email = user.get('email', '').strip()
-                cached_pass_id = user.get('pass_id')
-                
-                results['processed'] += 1
-                self.logger.info(f"--- Processing user #{user_id}: {first_name} {last_name} ---")
+            # With a deadline, users are scheduled once the whole list is known; otherwise they are
+            # processed as the pages of the user list arrive.
+            if scheduler.deadline_seconds:
+                all_users = self._scheduled_users(all_users, user_ids, scheduler, results)
 
+            def users_to_process():
                 try:
-                    result_url = None
-                    # Check if pass_id is cached.
-                    if cached_pass_id:
-                        self.logger.info(f"User has a cached pass_id: {cached_pass_id}. Skipping search.")
-                        result_url = f"https://pass.imt-atlantique.fr/OpDotNet/eplug/Annuaire/Navigation/Dossier/Dossier.aspx?IdObjet={cached_pass_id}&IdTypeObjet=25&IdAnn=&IdProfil=&AccesPerso=false&Wizard="
-                    else:
-                        self.logger.info("User has no pass_id. Searching for user...")
-                        
-                        # Step 3: Navigate to search page.
-                        if not self.step3_navigate_to_search():
-                            raise Exception('Failed at step 3: Navigation')
-                        
-                        # Step 4: Search for person.
-                        if not self.step4_search_person(first_name, last_name):
-                            raise Exception(f'Failed at step 4: Search for {first_name} {last_name}')
-                        
-                        # Step 5: Get result link (and cache pass_id)
-                        result_url = self.step5_get_result_link(first_name, last_name, user_id)
-                        if not result_url:
-                            raise Exception(f'Failed at step 5: No result link found for {first_name} {last_name}')
-
-                    # Step 6: Scrape data.
-                    scraped_data = step6_scrape_planning(driver=self.driver, profile_url=result_url)
-                    if 'error' in scraped_data:
-                        raise Exception(f"Failed at step 6: Scraping data. Error: {scraped_data['error']}")
-
-                    # Step 7: Optimize scraped data by merging consecutive courses.
-                    if 'planning' in scraped_data and scraped_data['planning']:
-                        self.logger.info(f"Step 7: Optimizing planning for user {user_id}.")
-                        optimized_planning = step7_optimize_planning(scraped_data['planning'])
-                        scraped_data['planning'] = optimized_planning
-                    else:
-                        self.logger.info(f"Step 7: No planning data to optimize for user {user_id}.")
-
-                    # Step 8: Send courses to API
-                    if 'planning' in scraped_data and scraped_data['planning']:
-                        if not step8_submit_to_api(scraped_data['planning'], email, client):
-                            self.logger.warning(f"Not all courses were sent to API for user {user_id}.")
-                        else:
-                           self.logger.info(f"Step 8: Successfully sent all courses for user {user_id} to API.")
-                    else:
-                        self.logger.info(f"No planning data found for user {user_id} to send to API.")
-
-                    # Store final data for reporting
-                    results['all_plannings'][user_id] = {
-                        'url': result_url,
-                        'scraped_at': scraped_data['scraped_at'],
-                        'planning': optimized_planning
-                    }
+                    for user in all_users:
+                        if user_ids and str(user.get('id')) not in user_ids:
+                            continue
+                        # Users not expected to finish before the deadline are left for the next run.
+                        if scheduler.admit(user):
+                            yield user
+                except requests.exceptions.RequestException as e:
+                    # A later page of the user list could not be fetched: keep what was scraped so far.
+                    self.logger.error("Failed to get the next page of users from API: %s", e)
+                    results['users_error'] = f"Failed to get users from API: {e}"
+
+            # Results are recorded from the thread of each account.
+            results_lock = threading.Lock()
+
+            def process(account, user):
+                return account.scraper.process_user_supervised(user, client, account.username, account.password)
+
+            def on_success(user, entry, seconds):
+                # Users of one group share one copy of each of their courses.
+                entry['planning'] = self.course_store.intern(entry['planning'])
+                with results_lock:
+                    results['processed'] += 1
+                    results['all_plannings'][user.get('id')] = entry
                     results['success'] += 1
-                    self.logger.info(f"--- Successfully processed user #{user_id} ---")
+                    scheduler.finished(user, seconds, success=True, incomplete_weeks=len(entry['incomplete_weeks']))
 
-                except Exception as e:
-                    self.logger.error(f"!!! Failed to process user #{user_id}: {first_name} {last_name}. Error: {e} !!!")
+            def on_failure(user, e, seconds):
+                name = f"{user.get('first_name', '').strip()} {user.get('last_name', '').strip()}"
+                self.logger.error("!!! Failed to process user #%s: %s. Error: %s !!!", user.get('id'), name, e)
+                with results_lock:
+                    results['processed'] += 1
                     results['failed'] += 1
-                    results['failures'].append({'user_id': user_id, 'name': f"{first_name} {last_name}", 'error': str(e)})
-                    # Continue to the next user in the loop.
-                    continue
+                    results['failures'].append({'user_id': user.get('id'), 'name': name, 'error': str(e)})
+                    scheduler.finished(user, seconds, success=False)
 
+            # Loop through each user, spread over the PASS accounts.
+            for user in pool.run(users_to_process(), process, on_success, on_failure):
+                on_failure(user, Exception("No PASS account left to process this user"), 0.0)
+            if not pool.exhausted:
+                results['accounts_error'] = "Every PASS account was retired before the end of the user list"
+
+            scheduler.history.save()
+            if scheduler.deferred:
+                self.logger.warning("Deadline of %s minutes: %s user(s) deferred to the next run.",
+                                    Config.RUN_DEADLINE_MINUTES, len(scheduler.deferred))
+            results['deferred'] = scheduler.deferred
+            results['schedule'] = scheduler.summary()
+            if drainer is not None:
+                results['outbox'] = self.stop_outbox_drainer(drainer)
+            results['users_fetch'] = dict(client.users_fetch_stats)
+            results['webdriver'] = merge_summaries(
+                [self.webdriver_stats.summary()] + [helper.webdriver_stats.summary() for helper in helpers])
+            results['browser'] = self.supervisor.summary()
+            if helpers or not pool.exhausted:
+                results['accounts'] = pool.summary()
+            results['course_store'] = self.course_store.stats()
+            results['rate_control'] = self.limiter.metrics()
             self.logger.info("Complete scraping flow for all users finished.")
-            self.logger.info(f"Summary: {results}")
+            self.logger.info("Summary: %s", results)
             return results
         except Exception as e:
-            self.logger.error(f"Error in complete scraping flow: {e}", exc_info=True)
+            self.logger.error("Error in complete scraping flow: %s", e, exc_info=True)
             return {'error': f'Complete flow failed: {str(e)}'}
+        finally:
+            for helper in helpers:
+                # The parse workers belong to this scraper.
+                helper._parse_pool = None
+                helper.close()
     
+    def run_queue_worker(self, work_queue, run_id, worker_id, pass_username, pass_password, poll_interval=10):
+        """
+        Process users claimed from a shared work queue until the run is finished (sharded runs).
+
+        Args:
+            work_queue (WorkQueue): The queue shared with the coordinator and the other workers.
+            run_id (str): The run to work on.
+            worker_id (str): Unique identifier of this worker, recorded on its leases.
+            pass_username (str): Login username for the PASS account.
+            pass_password (str): Login password for the PASS account.
+            poll_interval (int): Seconds to wait before polling again while other workers hold the remaining leases.
+
+        Returns:
+            dict: A summary of the users processed by this worker.
+        """
+        self.logger.info("Worker %s joining run %s.", worker_id, run_id)
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup') as startup:
+            api_future = startup.submit(self.step0_prepare_api, False)
+            login_future = startup.submit(self.ensure_logged_in, pass_username, pass_password)
+            client, _, api_error = api_future.result()
+            login_error = login_future.result()
+        if api_error:
+            return {'error': api_error}
+        if login_error:
+            return {'error': login_error}
+        drainer = self.start_outbox_drainer(client)
+
+        summary = {'worker_id': worker_id, 'run_id': run_id, 'processed': 0, 'success': 0, 'failed': 0}
+        while True:
+            # Workers are separate processes with their own limiter: each takes an equal share of
+            # PASS_MAX_CONCURRENCY, so the run as a whole stays within it.
+            workers = work_queue.register_worker(run_id, worker_id)
+            self.limiter.set_max_limit(Config.PASS_MAX_CONCURRENCY // workers)
+            user = work_queue.claim(run_id, worker_id)
+            if user is None:
+                if work_queue.is_finished(run_id):
+                    break
+                # Remaining users are leased by other workers: wait in case a lease expires.
+                time.sleep(poll_interval)
+                continue
+
+            user_id = user.get('id')
+            summary['processed'] += 1
+            with work_queue.lease_heartbeat(run_id, user_id, worker_id):
+                try:
+                    entry = self.process_user_supervised(user, client, pass_username, pass_password)
+                except Exception as e:
+                    self.logger.error("!!! Failed to process user #%s. Error: %s !!!", user_id, e)
+                    # Step 8 may already have posted some of the courses: another worker would post them again.
+                    work_queue.fail(run_id, user_id, worker_id, str(e), final=self.submit_started)
+                    summary['failed'] += 1
+                    continue
+            if work_queue.complete(run_id, user_id, worker_id, entry):
+                summary['success'] += 1
+            else:
+                self.logger.warning("Lease on user #%s expired before completion, result discarded.", user_id)
+
+        work_queue.unregister_worker(run_id, worker_id)
+        if drainer is not None:
+            summary['outbox'] = self.stop_outbox_drainer(drainer)
+        summary['rate_control'] = self.limiter.metrics()
+        summary['webdriver'] = self.webdriver_stats.summary()
+        summary['browser'] = self.supervisor.summary()
+        self.logger.info("Worker summary: %s", summary)
+        return summary
+
     def close(self):
         """Close the browser"""
-        if self.driver:
-            self.driver.quit()
-            self.logger.info("Browser closed")
\ No newline at end of file
+        if self._driver_future is not None and self.driver_factory is not None:
+            # Never used: wait for the launch so the browser can be released.
+            try:
+                self.driver
+            except Exception:
+                pass
+        if self._driver:
+            self.persist_session()
+            if self.driver_factory is not None:
+                self.driver_factory.release(self._driver)
+            else:
+                self._driver.quit()
+            self._driver = None
+            self.logger.info("Browser closed")
+        if self._owns_factory:
+            self.driver_factory.close()
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
@@ -0,0 +1,90 @@
+import json
+import logging
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# JSON encoding of results files and API request bodies. orjson is used when it is installed
+# (it encodes datetimes natively, in C); the json module is the fallback. Both give the same
+# document: UTF-8, datetimes as ISO 8601 strings, compact unless pretty is asked for.
+
+BACKENDS = ('orjson', 'json')
+# Course fields that are datetimes after step 7.
+DATETIME_FIELDS = ('start_time', 'end_time')
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+def resolve_backend(name: str = 'auto') -> str:
+    """The backend to use for a JSON_BACKEND setting: 'auto' picks orjson if it is installed."""
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r} (expected one of: auto, {', '.join(BACKENDS)})")
+    if name == 'orjson' and orjson is None:
+        logger.warning("JSON_BACKEND=orjson but orjson is not installed, using the json module.")
+        return 'json'
+    return name
+
+# Built once: json.dumps() with any non-default argument builds a new encoder at every call.
+_COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+_PRETTY_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False, default=_default)
+
+_backend = None
+
+def set_backend(name: str) -> str:
+    """Select the default backend (Config.JSON_BACKEND, set by the entry points)."""
+    global _backend
+    _backend = resolve_backend(name)
+    return _backend
+
+def get_backend() -> str:
+    return _backend or set_backend('auto')
+
+def dumps(obj, pretty: bool = False, backend: str = None) -> bytes:
+    """
+    Encode obj as UTF-8 JSON.
+
+    Args:
+        obj: Dicts, lists and scalars; datetimes become ISO 8601 strings, dict keys strings.
+        pretty (bool): Indent by 2 spaces (much slower with the json module, which then encodes in Python).
+        backend (str): 'orjson' or 'json', by default the one of JSON_BACKEND.
+    """
+    if (backend or get_backend()) == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return (_PRETTY_ENCODER if pretty else _COMPACT_ENCODER).encode(obj).encode('utf-8')
+
+def loads(data, backend: str = None):
+    if (backend or get_backend()) == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dump_file(obj, path: str, pretty: bool = False, backend: str = None):
+    """
+    Write obj as JSON to path. The document is encoded in one call, then written: json.dump()
+    would encode it piece by piece in Python.
+    """
+    data = dumps(obj, pretty=pretty, backend=backend)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def json_ready_course(course: dict) -> dict:
+    """The course with its datetimes as ISO 8601 strings (a copy if any had to be converted)."""
+    if not any(isinstance(course.get(field), datetime) for field in DATETIME_FIELDS):
+        return course
+    prepared = dict(course)
+    for field in DATETIME_FIELDS:
+        if isinstance(prepared.get(field), datetime):
+            prepared[field] = prepared[field].isoformat()
+    return prepared
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import socket
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+PROFILE_SUBDIR = 'chrome-profile'
+COOKIES_FILE = 'cookies.json'
+
+# Chrome leaves these behind when it is killed; they make the next launch refuse the profile.
+STALE_LOCK_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+class ProfileInUseError(Exception):
+    """The Chrome profile directory is locked by a browser that is still running."""
+
+def _running_lock_owner(lock_path: str):
+    """
+    PID of the Chrome holding a SingletonLock (a symlink to "<hostname>-<pid>") if it is still running
+    on this host, else None. A lock of another host (a previous container) cannot be checked and is stale.
+    """
+    try:
+        hostname, _, pid = os.readlink(lock_path).rpartition('-')
+        pid = int(pid)
+    except (OSError, ValueError):
+        return None
+    if hostname != socket.gethostname():
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        return pid
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            # The PID may have been reused by another program since Chrome died.
+            return pid if b'chrom' in f.read().lower() else None
+    except OSError:
+        return pid
+
+# Fields accepted by the CDP Network.setCookies command.
+COOKIE_PARAM_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+def prepare_session_dir(session_dir: str, slot: int = 0) -> str:
+    """
+    Create the session directory (owner-only permissions) and clear stale Chrome locks.
+    Locks of a Chrome still running on the profile are left alone: ProfileInUseError is raised instead.
+
+    Args:
+        session_dir (str): Directory holding the persisted browser session.
+        slot (int): Profile slot; concurrent browsers each need their own profile directory.
+
+    Returns:
+        str: Path of the Chrome profile directory inside the session directory.
+    """
+    subdir = PROFILE_SUBDIR if slot == 0 else f"{PROFILE_SUBDIR}-{slot}"
+    profile_dir = os.path.join(session_dir, subdir)
+    os.makedirs(profile_dir, mode=0o700, exist_ok=True)
+    # The session holds live authentication cookies: keep it private even on a shared volume.
+    os.chmod(session_dir, 0o700)
+    os.chmod(profile_dir, 0o700)
+
+    owner = _running_lock_owner(os.path.join(profile_dir, 'SingletonLock'))
+    if owner is not None:
+        raise ProfileInUseError(f"Chrome profile {profile_dir} is in use by running process {owner}")
+    for name in STALE_LOCK_FILES:
+        lock_path = os.path.join(profile_dir, name)
+        if os.path.lexists(lock_path):
+            os.remove(lock_path)
+            logger.info("Removed stale Chrome lock %s left by a previous run.", lock_path)
+    return profile_dir
+
+def save_cookies(driver, session_dir: str) -> int:
+    """
+    Persist every cookie of the browser (PASS, CAS and IdP), session cookies included.
+
+    Chrome drops session-only cookies when it exits, so the profile directory alone
+    is not enough to keep the PASS session alive across runs.
+
+    Returns:
+        int: Number of cookies saved.
+    """
+    cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get('cookies', [])
+    cookies_path = os.path.join(session_dir, COOKIES_FILE)
+    tmp_path = f"{cookies_path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(cookies, f)
+    os.replace(tmp_path, cookies_path)
+    logger.info("Saved %s session cookies to %s.", len(cookies), cookies_path)
+    return len(cookies)
+
+def restore_cookies(driver, session_dir: str) -> int:
+    """
+    Load the cookies saved by save_cookies into the browser.
+
+    Returns:
+        int: Number of cookies restored (0 if there is no saved session).
+    """
+    cookies_path = os.path.join(session_dir, COOKIES_FILE)
+    if not os.path.exists(cookies_path):
+        return 0
+    try:
+        with open(cookies_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not read saved cookies from %s: %s", cookies_path, e)
+        return 0
+
+    cookies = []
+    for cookie in saved:
+        param = {k: cookie[k] for k in COOKIE_PARAM_FIELDS if k in cookie}
+        # Session cookies are reported with expires=-1, which setCookies would treat as already expired.
+        if cookie.get('session') or param.get('expires', 0) < 0:
+            param.pop('expires', None)
+        cookies.append(param)
+
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+    logger.info("Restored %s session cookies from %s.", len(cookies), cookies_path)
+    return len(cookies)
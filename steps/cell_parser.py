@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cell_patterns.json')
+
+MONTH_MAP = {
+    "Janvier": 1, "Février": 2, "Mars": 3, "Avril": 4, "Mai": 5, "Juin": 6,
+    "Juillet": 7, "Août": 8, "Septembre": 9, "Octobre": 10, "Novembre": 11, "Décembre": 12
+}
+
+FIELDS = ('time', 'group', 'room', 'teacher')
+TIME_GROUPS = ('start_h', 'start_m', 'end_h', 'end_m')
+
+# How each rule mode is anchored inside its lookahead branch.
+_MODE_TEMPLATES = {
+    'search': '.*?(?:{pattern})',
+    'match': '(?:{pattern})',
+    'fullmatch': '(?:{pattern})\\Z',
+}
+
+class CellLineClassifier:
+    def __init__(self, rules):
+        """
+        Classify the lines of an agenda course cell with a single compiled regex.
+
+        Each rule becomes one lookahead branch `(?P<_rN>(?=...))` of an alternation anchored
+        at the start of the line: the regex engine tries the branches in rule order, so one
+        match() call per line returns the first matching rule, like the former if/elif chain.
+
+        Args:
+            rules (list): Dicts with 'field', 'mode', 'pattern' and optional 'ignore_case'.
+        """
+        branches = []
+        self._fields = {}
+        for index, rule in enumerate(rules):
+            field, mode = rule['field'], rule.get('mode', 'search')
+            if field not in FIELDS:
+                raise ValueError(f"Unknown cell field '{field}' in rule {index}, expected one of {FIELDS}")
+            if mode not in _MODE_TEMPLATES:
+                raise ValueError(f"Unknown match mode '{mode}' in rule {index}, expected one of {tuple(_MODE_TEMPLATES)}")
+            body = _MODE_TEMPLATES[mode].format(pattern=rule['pattern'])
+            if rule.get('ignore_case'):
+                body = f"(?i:{body})"
+            name = f"_r{index}"
+            branches.append(f"(?P<{name}>(?={body}))")
+            self._fields[name] = field
+        self._regex = re.compile('|'.join(branches))
+        missing = [g for g in TIME_GROUPS if g not in self._regex.groupindex]
+        if 'time' in self._fields.values() and missing:
+            raise ValueError(f"The time rule must define the named groups {missing}")
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_PATTERNS_FILE):
+        """Build a classifier from a JSON rules file (see cell_patterns.json)."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['rules'])
+
+    def parse_cell(self, text: str, title: str, year: int, month: int, day: int):
+        """
+        Tokenize a course cell's text in one pass.
+
+        Args:
+            text (str): The cell's visible text, one item per line.
+            title (str): The course title (bold text), never taken as a teacher.
+            year, month, day (int): The date of the cell's day column.
+
+        Returns:
+            tuple: (start_time, end_time, teachers, room, group); the times are None if no time line was found.
+        """
+        start_time, end_time, teachers, room, group = None, None, [], "", ""
+        match = self._regex.match
+        fields = self._fields
+        for line in text.split('\n'):
+            m = match(line)
+            if m is None:
+                continue
+            field = fields[m.lastgroup]
+            if field == 'time':
+                start_time = datetime(year, month, day, int(m['start_h']), int(m['start_m']))
+                end_time = datetime(year, month, day, int(m['end_h']), int(m['end_m']))
+            elif field == 'group':
+                group = line
+            elif field == 'room':
+                room = line
+            elif line != title:
+                teachers.append(line)
+        return start_time, end_time, teachers, room, group
+
+_default_classifier = None
+
+def get_default_classifier() -> CellLineClassifier:
+    """The classifier built from the bundled cell_patterns.json, compiled once per process."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = CellLineClassifier.from_file()
+    return _default_classifier
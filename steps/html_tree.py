@@ -0,0 +1,106 @@
+from html.parser import HTMLParser
+
+# Element tree of a page snapshot (agenda weeks, directory search results), read without a
+# browser the way the steps read it through WebDriver: rendered text like WebElement.text, and
+# the lenient parsing of PASS's old table markup.
+
+# Elements without content or end tag.
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'wbr'}
+# Elements starting a new line in the rendered text (what WebElement.text returns).
+BLOCK_TAGS = {'br', 'div', 'p', 'tr', 'table', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'center'}
+
+class Element:
+    """A node of a parsed snapshot: tag, attributes, children (elements and text) and parent."""
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    def child_elements(self, tag):
+        return [c for c in self.children if isinstance(c, Element) and c.tag == tag]
+
+    def iter(self, tag):
+        """Descendants with this tag, in document order."""
+        for child in self.children:
+            if isinstance(child, Element):
+                if child.tag == tag:
+                    yield child
+                yield from child.iter(tag)
+
+    def _text_parts(self, parts):
+        for child in self.children:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child.tag in ('script', 'style'):
+                continue
+            else:
+                if child.tag in BLOCK_TAGS:
+                    parts.append('\n')
+                child._text_parts(parts)
+                if child.tag in BLOCK_TAGS and child.tag != 'br':
+                    parts.append('\n')
+
+    @property
+    def text(self) -> str:
+        """Rendered text, like WebElement.text: one line per block, spaces collapsed, blank lines dropped."""
+        parts = []
+        self._text_parts(parts)
+        lines = (' '.join(line.replace('\xa0', ' ').split()) for line in ''.join(parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+class TreeBuilder(HTMLParser):
+    """Lenient HTML to Element tree, closing the unclosed cells and rows of old table markup."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element('#document', {}, None)
+        self.current = self.root
+
+    def _close(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def _open_ancestor(self, tags, stop_tags):
+        node = self.current
+        while node is not self.root and node.tag not in stop_tags:
+            if node.tag in tags:
+                return node
+            node = node.parent
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        # A new cell closes the open cell of the same row, a new row closes the open row.
+        if tag in ('td', 'th'):
+            open_cell = self._open_ancestor(('td', 'th'), ('tr', 'table'))
+            if open_cell is not None:
+                self.current = open_cell.parent
+        elif tag == 'tr':
+            open_row = self._open_ancestor(('tr',), ('table',))
+            if open_row is not None:
+                self.current = open_row.parent
+        element = Element(tag, {name: value or '' for name, value in attrs}, self.current)
+        self.current.children.append(element)
+        if tag not in VOID_TAGS:
+            self.current = element
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Element(tag, {name: value or '' for name, value in attrs}, self.current))
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self._close(tag)
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+def parse_html(html: str) -> Element:
+    """The tree of a snapshot, under a '#document' root element."""
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
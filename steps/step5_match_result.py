@@ -0,0 +1,107 @@
+import logging
+import re
+import unicodedata
+from steps.html_tree import parse_html
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Matching of a user to the results of a PASS directory search (Annuaire, MAContenu frame),
+# from one snapshot of the frame's HTML instead of WebDriver calls per result link.
+
+PASS_BASE_URL = "https://pass.imt-atlantique.fr"
+PROFILE_PATH = "/OpDotNet/eplug/Annuaire/Navigation/Dossier/Dossier.aspx?IdObjet={pass_id}&IdTypeObjet=25&IdAnn=&IdProfil=&AccesPerso=false&Wizard="
+
+# Match scores, best first.
+SCORE_EMAIL = 3
+SCORE_FULL_NAME = 2
+SCORE_PARTIAL = 1
+SCORE_LABELS = {SCORE_EMAIL: 'email', SCORE_FULL_NAME: 'full name', SCORE_PARTIAL: 'partial'}
+
+_OPEN_RECORD = re.compile(r"ouvrirDossierObjet\((\d+),")
+
+def profile_url(pass_id, base_url: str = PASS_BASE_URL) -> str:
+    return base_url + PROFILE_PATH.format(pass_id=pass_id)
+
+def _tokens(text: str) -> list:
+    """Lowercase words of a name or email local part, without accents ('Le Hénaff-Dupont' -> ['le', 'henaff', 'dupont'])."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+def extract_search_results(html: str) -> list:
+    """
+    Read the result rows of a snapshot of the MAContenu frame: each link opening a record
+    (ouvrirDossierObjet) with the mailto link of the following cells of its row, if any.
+
+    Returns:
+        list: [{'pass_id': int, 'name': str, 'email': str or None}, ...] in page order, one per pass_id.
+    """
+    results = {}
+    for link in parse_html(html).iter('a'):
+        match = _OPEN_RECORD.search(link.attrs.get('onclick', ''))
+        if not match:
+            continue
+        # ./ancestor::td[1]/following-sibling::td//a[starts-with(@href, 'mailto:')]
+        cell = link.parent
+        while cell is not None and cell.tag != 'td':
+            cell = cell.parent
+        email = None
+        if cell is not None and cell.parent is not None:
+            siblings = cell.parent.children
+            for sibling in siblings[siblings.index(cell) + 1:]:
+                if getattr(sibling, 'tag', None) != 'td':
+                    continue
+                mailto = next((a for a in sibling.iter('a') if a.attrs.get('href', '').startswith('mailto:')), None)
+                if mailto is not None:
+                    email = (mailto.text or mailto.attrs['href'][len('mailto:'):]).strip().lower()
+                    break
+        pass_id = int(match.group(1))
+        entry = results.setdefault(pass_id, {'pass_id': pass_id, 'name': link.text, 'email': None})
+        entry['email'] = entry['email'] or email
+    return list(results.values())
+
+def score_candidate(candidate: dict, first_name: str, last_name: str, email: str = None) -> int:
+    """
+    How well a search result matches the user: SCORE_EMAIL if its email is the user's, SCORE_FULL_NAME
+    if all the words of the first and last names are in its name or email, SCORE_PARTIAL if those of
+    one of them are, else 0.
+    """
+    candidate_email = (candidate.get('email') or '').strip().lower()
+    if email and candidate_email and candidate_email == email.strip().lower():
+        return SCORE_EMAIL
+    local_part = candidate_email.split('@', 1)[0]
+    words = set(_tokens(candidate.get('name'))) | set(_tokens(local_part))
+    first, last = _tokens(first_name), _tokens(last_name)
+    if first and last and set(first + last) <= words:
+        return SCORE_FULL_NAME
+    compact_local = ''.join(_tokens(local_part))
+    if (first and set(first) <= words) or (last and set(last) <= words) or (last and ''.join(last) in compact_local):
+        return SCORE_PARTIAL
+    return 0
+
+def rank_search_results(candidates: list, first_name: str, last_name: str, email: str = None) -> dict:
+    """
+    Pick the user's record among the search results.
+
+    Returns:
+        dict: {'match': best candidate or None, 'score': its score, 'ambiguous': bool,
+        'candidates': candidates with a score, best first}. 'match' is None when no result
+        matches, or when several results share the best score (ambiguous).
+    """
+    scored = []
+    for candidate in candidates:
+        score = score_candidate(candidate, first_name, last_name, email)
+        if score:
+            scored.append({**candidate, 'score': score})
+    scored.sort(key=lambda c: -c['score'])
+    if not scored:
+        return {'match': None, 'score': 0, 'ambiguous': False, 'candidates': []}
+    best = [c for c in scored if c['score'] == scored[0]['score']]
+    ambiguous = len(best) > 1
+    return {'match': None if ambiguous else best[0], 'score': scored[0]['score'],
+            'ambiguous': ambiguous, 'candidates': scored}
+
+def describe_candidates(candidates: list) -> str:
+    return '; '.join(f"{c['pass_id']} {c['name']} <{c.get('email') or '-'}> ({SCORE_LABELS[c['score']]})"
+                     for c in candidates)
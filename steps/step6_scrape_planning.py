@@ -1,13 +1,18 @@
 import logging
-import re
+from concurrent.futures import Future
 from datetime import date, timedelta
 import time
+import random
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import JavascriptException, TimeoutException, NoSuchElementException, StaleElementReferenceException
 from datetime import datetime
 import os
+from steps.week_parser import parse_week_header, parse_week_cells, parse_week_html, dedupe_courses
+from steps.week_fixtures import save_week_fixture, week_fixture_path
+from logging_setup import update_log_context
+from contextlib import nullcontext
 
 # Set up a logger for this module. It will inherit the root logger's configuration.
 logger = logging.getLogger(__name__)
@@ -30,66 +35,58 @@ def _get_mondays_to_scrape():
         
     return mondays
 
+# Header cell of the agenda ("Agenda de l'étudiant <month> <year>").
+PLANNING_HEADER_XPATH = "//td[@class='AuthentificationMenu' and contains(text(),'Agenda de l')]"
+
+# Marks the displayed week's header, so the navigation knows when NavDat has rendered the next week.
+_JS_MARK_WEEK_HEADER = """
+var header = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (header) { header.__transatStale = true; }
+"""
+_JS_NEW_WEEK_HEADER = """
+var header = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return document.readyState !== 'loading' && !!header && !header.__transatStale && header.textContent.trim().length > 0;
+"""
+
+# Helper to measure a PASS navigation with the limiter, if one is used.
+def _tracked(limiter):
+    return limiter.track() if limiter is not None else nullcontext()
+
 # Helper function to parse a single week's planning page.
-def _scrape_single_week(driver, timeout:int) -> list:
+def _scrape_single_week(driver, timeout:int, record_path:str=None) -> list:
     """
     Scrapes the planning data for the currently displayed week.
     Assumes the driver is already inside the correct iframe.
+
+    Args:
+        record_path (str): If set, the raw week read from the page is saved there as a fixture.
     
     Returns:
-        list: A list of course dictionaries for the week.
+        list: A list of course dictionaries for the week, or None if the week could not be parsed.
     """
-    planning_of_the_week = []
-    
     try:
         # Wait for the main planning table header to be visible.
-        planning_header_xpath = "//td[@class='AuthentificationMenu' and contains(text(),'Agenda de l')]"
         header_element = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.XPATH, planning_header_xpath))
+            EC.presence_of_element_located((By.XPATH, PLANNING_HEADER_XPATH))
         )
-        logger.info("Agenda planning table is visible. Starting to scrape.")
+        logger.debug("Agenda planning table is visible. Starting to scrape.")
         
-        # Extract month and year from the header.
+        # Extract month, year and days from the header.
         header_text = header_element.text
-        month_year_match = re.search(r'([A-Za-zéû]+)\s+(\d{4})$', header_text.strip())
-        if not month_year_match:
-            logger.warning(f"Could not extract month/year from header: '{header_text}'")
-            return []
-            
-        french_month, year = month_year_match.groups()
-        month_map = {
-            "Janvier": 1, "Février": 2, "Mars": 3, "Avril": 4, "Mai": 5, "Juin": 6, 
-            "Juillet": 7, "Août": 8, "Septembre": 9, "Octobre": 10, "Novembre": 11, "Décembre": 12
-        }
-        month = month_map.get(french_month)
-        if not month:
-            logger.warning(f"Unrecognized month: {french_month}")
-            return []
-
-        # Get day headers.
-        header_cells = driver.find_elements(By.XPATH, "//tr[contains(@class,'fondTresClair')]/td[position()>1]")
-        days = []
-        for i, cell in enumerate(header_cells):
-            text = cell.text.strip().replace('\xa0', ' ')
-            match = re.match(r"(\w+)\s+(\d{1,2})", text)
-            if match:
-                day_name, day_num = match.groups()
-                # Handle month changeover (e.g., end of month)
-                try:
-                    full_date = datetime(int(year), month, int(day_num)).strftime("%Y-%m-%d")
-                except ValueError:
-                    logger.warning(f"Date parsing error for day {day_num} in month {month}. Skipping day.")
-                    continue
-                days.append((day_name, full_date))
-            else:
-                days.append((f"Day{i}", None))
+        day_texts = [cell.text for cell in driver.find_elements(By.XPATH, "//tr[contains(@class,'fondTresClair')]/td[position()>1]")]
+        header = parse_week_header(header_text, day_texts)
+        if header is None:
+            return None
+        year, month, days = header
 
-        logger.info(f"Detected days for scraping are {days}.")
+        logger.debug("Detected days for scraping are %s.", days)
         # Traverse planning rows.
         rows_xpath = "//tr[td[@bgcolor='#DDDDDD']]"
         num_rows = len(driver.find_elements(By.XPATH, rows_xpath))
-        logger.info(f"Found {num_rows} rows to process.")
+        logger.debug("Found %s rows to process.", num_rows)
 
+        # Course cells as (day index, title, text), parsed once the whole table is read.
+        course_cells = []
         # Loop using an index (from 0 to num_rows-1).
         for i in range(num_rows):
             try:
@@ -101,7 +98,7 @@ def _scrape_single_week(driver, timeout:int) -> list:
                 cells = row.find_elements(By.XPATH, "./td")
                 if len(cells) < len(days) + 1: continue
 
-                for j, (day_name, date_str) in enumerate(days):
+                for j, (day_name, date_str, day_num) in enumerate(days):
                     if date_str is None: continue
                     
                     course_cell = cells[j + 1]
@@ -114,56 +111,307 @@ def _scrape_single_week(driver, timeout:int) -> list:
                         # Check for the bold tag to confirm it's a course title cell.
                         title_element = course_cell.find_element(By.TAG_NAME, 'b')
                         title = title_element.text.strip().replace(' ', ' ')
-                        
-                        all_text_parts = course_cell.text.split('\n')
-                        start_time_obj, end_time_obj, teachers, room, group = None, None, [], "", ""
-                        
-                        for part in all_text_parts:
-                            time_match = re.search(r'(\d{2})H(\d{2})-(\d{2})H(\d{2})', part)
-                            if time_match:
-                                start_h, start_m, end_h, end_m = time_match.groups()
-                                start_time_obj = datetime.strptime(f"{date_str} {start_h}:{start_m}", "%Y-%m-%d %H:%M")
-                                end_time_obj = datetime.strptime(f"{date_str} {end_h}:{end_m}", "%Y-%m-%d %H:%M")
-
-                            elif re.search(r"\bFISE|FIT|FIL|PROMO|GPE|ANNÉE|LV1|DEMI\b", part, re.IGNORECASE):
-                                group = part
-
-                            elif re.match(r"^[A-Z]{2,}-.*", part) or '(' in part:
-                                room = part
-
-                            elif part != title and re.fullmatch(r"[A-Z'’\s-]+ [A-Z][a-z'’-]+", part, re.IGNORECASE):
-                                teachers.append(part)
-
-                        if title and start_time_obj:
-                            planning_of_the_week.append({
-                                'date': date_str,
-                                'title': title,
-                                'start_time': start_time_obj,
-                                'end_time': end_time_obj,
-                                'teacher': ", ".join(teachers),
-                                'room': room,
-                                'group': group
-                            })
-
+                        course_cells.append((j, title, course_cell.text))
                     except NoSuchElementException:
                         continue # Skip cells that are colored but have no title (e.g., rowspan continuation)
                     except Exception as e:
-                        logger.warning(f"Error parsing course cell on {date_str}: {e}")
+                        logger.warning("Error reading course cell on %s: %s", date_str, e)
 
             # Catch the specific exception. If a row becomes stale even during this
             # short time, we can log it and safely continue to the next index.
             except StaleElementReferenceException:
-                logger.warning(f"Row at index {i} became stale. Skipping.")
+                logger.warning("Row at index %s became stale. Skipping.", i)
                 continue
             except Exception as e:
-                logger.warning(f"Failed to parse row at index {i}: {e}")
+                logger.warning("Failed to parse row at index %s: %s", i, e)
 
-        return planning_of_the_week
+        if record_path:
+            save_week_fixture(record_path, {'header': header_text, 'day_headers': day_texts, 'cells': course_cells})
+        return parse_week_cells(year, month, days, course_cells)
     except Exception as e:
-        logger.error(f"Critical error while scraping a single week: {e}", exc_info=True)
-        return []
+        logger.error("Critical error while scraping a single week: %s", e, exc_info=True)
+        return None
+
+# Helper function to snapshot the displayed week, for parsing away from the browser.
+def _snapshot_week(driver, timeout:int) -> str:
+    """
+    Waits for the week's planning table, then returns the HTML of the 'frm1' iframe in one round-trip.
+    Assumes the driver is already inside the correct iframe.
+    """
+    WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.XPATH, PLANNING_HEADER_XPATH)))
+    return driver.execute_script("return document.documentElement.outerHTML;")
+
+def _completed(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+# Helper function to read the displayed week, with its parsing possibly still running elsewhere.
+def _read_week(driver, timeout:int, parser:str, parse_pool=None, record_path:str=None) -> Future:
+    """
+    Reads the displayed week and returns the future of its courses (None if the week could not be parsed).
+
+    With the 'html' parser, the iframe is snapshotted and parsed in parse_pool (worker processes)
+    when one is given, so the browser can navigate to the next week meanwhile. The 'webdriver'
+    parser reads the cells through WebDriver, in the calling thread.
+    """
+    if parser != 'html':
+        return _completed(_scrape_single_week(driver, timeout, record_path))
+    html = _snapshot_week(driver, timeout)
+    if record_path:
+        save_week_fixture(record_path, {'html': html})
+    if parse_pool is None:
+        return _completed(parse_week_html(html))
+    return parse_pool.submit(parse_week_html, html)
+
+# Helper function to load a given week in the agenda iframe.
+def _navigate_to_week(driver, monday_str: str, nav_arrow_xpath: str, timeout:int, limiter=None):
+    """
+    Points the navigation arrow at the given Monday, clicks it and waits for the week to load.
+    Assumes the driver is already inside the 'frm1' iframe. Raises on failure.
+    """
+    # Find the navigation arrow we will use.
+    arrow_element = WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.XPATH, nav_arrow_xpath))
+    )
+
+    # Use JavaScript to change the 'onclick' attribute to our desired date.
+    js_change_attribute = f"arguments[0].setAttribute('onclick', \"NavDat('{monday_str}');return false;\");"
+    driver.execute_script(js_change_attribute, arrow_element)
+    logger.debug("Set arrow's onclick to navigate to %s.", monday_str)
+
+    # The header text only names the month, often the same for the next week: wait for a new
+    # header element instead, so the limiter measures the click until the new week is rendered.
+    driver.execute_script(_JS_MARK_WEEK_HEADER, PLANNING_HEADER_XPATH)
+    with _tracked(limiter):
+        # Click the now-modified arrow to trigger the navigation.
+        arrow_element.click()
+        logger.debug("Clicked the arrow to load the new week.")
+
+        # Wait for the navigation to complete: the new week's header is rendered.
+        WebDriverWait(driver, timeout, ignored_exceptions=(JavascriptException,)).until(
+            lambda d: d.execute_script(_JS_NEW_WEEK_HEADER, PLANNING_HEADER_XPATH)
+        )
+    # The arrow is present again after the refresh.
+    # This prevents the "NavDat is not defined" or stale element errors.
+    WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.XPATH, nav_arrow_xpath))
+    )
+    logger.debug("New week's content has loaded. Stabilizing page...")
+    # Add a small buffer for JS rendering, then dezoom/scroll to stabilize the view.
+    time.sleep(1)
+    try:
+        logger.debug("De-zooming page and scrolling to ensure full visibility.")
+        driver.execute_script("document.body.style.zoom='100%'")
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(0.5)
+        driver.execute_script("window.scrollTo(0, 0);")
+    except Exception as e:
+        logger.warning("Could not execute dezoom/scroll script: %s", e)
+
+    # Take a screenshot before scraping the week for debugging.
+    try:
+        screenshot_dir = 'data/debug_screenshots'
+        os.makedirs(screenshot_dir, exist_ok=True)
+        screenshot_path = os.path.join(screenshot_dir, f'week_{monday_str}.png')
+        driver.get_screenshot_as_file(screenshot_path)
+        logger.debug("Saved pre-scrape screenshot to %s", screenshot_path)
+    except Exception as e_ss:
+        logger.error("Could not save screenshot for week %s: %s", monday_str, e_ss)
+
+# Helper function to get back into the agenda iframe after a failed week.
+def _reenter_agenda_frame(driver, nav_arrow_xpath: str, timeout:int):
+    """
+    Switches back into the 'frm1' iframe of the already loaded profile page,
+    which is much cheaper than reloading the profile and clicking the 'Agenda' tab again.
+    """
+    driver.switch_to.default_content()
+    WebDriverWait(driver, timeout).until(EC.frame_to_be_available_and_switch_to_it((By.ID, "frm1")))
+    WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.XPATH, nav_arrow_xpath))
+    )
+    logger.info("Re-entered agenda iframe 'frm1'.")
+
+# Helper function to scrape one week, retrying failed navigations and parses.
+def _scrape_week_with_retries(driver, monday_str: str, nav_arrow_xpath: str, timeout:int, limiter=None,
+                              max_attempts:int=3, retry_backoff:float=2.0, record_dir:str=None,
+                              first_attempt:int=1):
+    """
+    Attempts are numbered from first_attempt (2 when the first pass already tried the week) to max_attempts.
+
+    Returns:
+        list: The week's courses, or None if the week is still incomplete after max_attempts.
+    """
+    for attempt in range(first_attempt, max_attempts + 1):
+        if attempt > 1:
+            # Exponential backoff with jitter, so retries do not hammer PASS in lockstep
+            # (the first retry of a week failed by the first pass waits too).
+            time.sleep(retry_backoff * (2 ** (attempt - 2)) * random.uniform(0.5, 1.5))
+        try:
+            _navigate_to_week(driver, monday_str, nav_arrow_xpath, timeout, limiter)
+            week_courses = _scrape_single_week(driver, timeout, week_fixture_path(record_dir, monday_str))
+            if week_courses is not None:
+                return week_courses
+            error = "week could not be parsed"
+        except Exception as nav_error:
+            error = nav_error
+        logger.error("Attempt %s/%s failed for week starting %s: %s", attempt, max_attempts, monday_str, error)
+
+        if attempt == max_attempts:
+            break
+        try:
+            _reenter_agenda_frame(driver, nav_arrow_xpath, timeout)
+        except Exception as e:
+            logger.warning("Could not re-enter agenda iframe before retrying week %s: %s", monday_str, e)
 
-def step6_scrape_planning(driver, profile_url: str, timeout:int=30):
+    logger.error("Giving up on week starting %s after %s attempts.", monday_str, max_attempts)
+    return None
+
+# Marks the current week's arrow, so a tab knows when NavDat has rendered the next week.
+_JS_TRIGGER_WEEK = """
+var arrow = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!arrow) { return false; }
+arrow.setAttribute('onclick', "NavDat('" + arguments[1] + "');return false;");
+arrow.__transatStale = true;
+arrow.click();
+return true;
+"""
+_JS_WEEK_LOADED = """
+var arrow = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return document.readyState !== 'loading' && !!arrow && !arrow.__transatStale;
+"""
+
+# Helper function to open the agenda in a new tab, without waiting for it to load.
+def _open_agenda_tab(driver, agenda_url: str) -> str:
+    driver.switch_to.new_window('tab')
+    driver.execute_script("window.location.href = arguments[0];", agenda_url)
+    return driver.current_window_handle
+
+# Helper function to fetch several weeks at once from extra agenda tabs.
+def _scrape_weeks_in_tabs(driver, mondays: list, tabs:int, nav_arrow_xpath: str, timeout:int, limiter=None,
+                          record_dir:str=None, parser:str='webdriver', parse_pool=None) -> dict:
+    """
+    Opens the agenda (the 'frm1' document) in several tabs of the same authenticated browser,
+    triggers NavDat for a different Monday in each without waiting, then collects each week as
+    its tab finishes loading, so PASS renders the weeks in parallel.
+    Assumes the driver is inside the 'frm1' iframe of the profile page; returns there afterwards.
+
+    A week that fails in its tab only fails itself: the tab is closed and replaced by a fresh one.
+
+    Returns:
+        dict: Monday -> future of the week's courses, or None for weeks that failed (to be retried sequentially).
+    """
+    results = {monday: None for monday in mondays}
+    agenda_url = driver.execute_script("return window.location.href;")
+    main_handle = driver.current_window_handle
+    tab_handles = []
+    # Tab -> (Monday, trigger time) of the weeks loading, each holding a limiter slot.
+    in_flight = {}
+
+    def wait_until_ready(handle) -> bool:
+        driver.switch_to.window(handle)
+        try:
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.XPATH, nav_arrow_xpath)))
+            return True
+        except TimeoutException:
+            logger.warning("Agenda did not load in extra tab %s, not using it.", handle)
+            return False
+
+    def replace_tab(handle):
+        """Close a tab left in an unknown state and open a fresh agenda tab in its place."""
+        tab_handles.remove(handle)
+        try:
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception as e:
+            logger.warning("Could not close agenda tab %s: %s", handle, e)
+        try:
+            new_handle = _open_agenda_tab(driver, agenda_url)
+            tab_handles.append(new_handle)
+            if wait_until_ready(new_handle):
+                ready_tabs.append(new_handle)
+        except Exception as e:
+            logger.warning("Could not open a replacement agenda tab: %s", e)
+
+    ready_tabs = []
+    try:
+        # Open the tabs and start loading the agenda in all of them before waiting on any.
+        for _ in range(min(tabs, len(mondays))):
+            tab_handles.append(_open_agenda_tab(driver, agenda_url))
+        ready_tabs.extend(handle for handle in list(tab_handles) if wait_until_ready(handle))
+        logger.info("%s agenda tabs ready for %s weeks.", len(ready_tabs), len(mondays))
+
+        pending = list(mondays)
+        while (pending and ready_tabs) or in_flight:
+            # Trigger as many weeks as there are free tabs and limiter slots.
+            while pending and ready_tabs:
+                if limiter is not None:
+                    if in_flight and not limiter.try_acquire():
+                        break
+                    if not in_flight:
+                        limiter.acquire()
+                handle, monday_str = ready_tabs.pop(0), pending.pop(0)
+                try:
+                    driver.switch_to.window(handle)
+                    triggered = driver.execute_script(_JS_TRIGGER_WEEK, nav_arrow_xpath, monday_str)
+                    error = None if triggered else "navigation arrow missing"
+                except Exception as e:
+                    error = e
+                if error is not None:
+                    logger.warning("Could not trigger week %s in tab %s, left for retry: %s", monday_str, handle, error)
+                    if limiter is not None:
+                        limiter.release(error=True)
+                    replace_tab(handle)
+                    continue
+                in_flight[handle] = (monday_str, time.monotonic())
+                logger.debug("Triggered week %s in tab %s.", monday_str, handle)
+
+            if not in_flight:
+                break
+            # Collect the oldest triggered week; its slot is released whatever happens.
+            handle = next(iter(in_flight))
+            monday_str, started = in_flight.pop(handle)
+            try:
+                driver.switch_to.window(handle)
+                WebDriverWait(driver, timeout).until(lambda d: d.execute_script(_JS_WEEK_LOADED, nav_arrow_xpath))
+            except TimeoutException:
+                logger.warning("Week %s did not load in tab %s, left for retry.", monday_str, handle)
+                if limiter is not None:
+                    limiter.release(timeout=True)
+                replace_tab(handle)
+                continue
+            except Exception as e:
+                logger.warning("Week %s failed in tab %s, left for retry: %s", monday_str, handle, e)
+                if limiter is not None:
+                    limiter.release(error=True)
+                replace_tab(handle)
+                continue
+            if limiter is not None:
+                limiter.release(latency=time.monotonic() - started)
+            try:
+                results[monday_str] = _read_week(driver, timeout, parser, parse_pool, week_fixture_path(record_dir, monday_str))
+            except Exception as e:
+                logger.warning("Could not read week %s in tab %s, left for retry: %s", monday_str, handle, e)
+            ready_tabs.append(handle)
+    finally:
+        # Weeks still loading (the loop was interrupted) give their limiter slots back.
+        if limiter is not None:
+            for _ in in_flight:
+                limiter.release(error=True)
+        in_flight.clear()
+        for handle in tab_handles:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception as e:
+                logger.warning("Could not close agenda tab %s: %s", handle, e)
+        driver.switch_to.window(main_handle)
+        _reenter_agenda_frame(driver, nav_arrow_xpath, timeout)
+    return results
+
+def step6_scrape_planning(driver, profile_url: str, timeout:int=30, limiter=None,
+                          max_attempts:int=3, retry_backoff:float=2.0, tabs:int=1, record_dir:str=None,
+                          parser:str='webdriver', parse_pool=None):
     """
     Navigates to a user's agenda and scrapes their planning for a 9-week period.
     Modifies the navigation arrow's onclick attribute and then clicks it.
@@ -172,13 +420,21 @@ def step6_scrape_planning(driver, profile_url: str, timeout:int=30):
         driver: The Selenium WebDriver instance.
         profile_url (str): The URL of the user's profile page.
         timeout (int): Timeout for web driver waits.
+        limiter (AdaptiveConcurrencyLimiter): Measures PASS navigations and bounds how many run at once.
+        max_attempts (int): Attempts per week before it is reported as incomplete.
+        retry_backoff (float): Base delay in seconds between attempts (doubled each time, jittered).
+        tabs (int): Agenda tabs fetching weeks in parallel (1 visits the weeks one after another).
+        record_dir (str): If set, every week read is also saved there as a fixture for offline replays.
+        parser (str): 'html' parses a snapshot of each week, 'webdriver' reads each cell through WebDriver.
+        parse_pool (Executor): Worker processes parsing the 'html' snapshots while the browser moves on.
         
     Returns:
         dict: A dictionary containing the scraped data or an error message.
     """
     try:
-        logger.info(f"Step 6: Navigating to user planning page {profile_url}")
-        driver.get(profile_url)
+        logger.info("Step 6: Navigating to user planning page %s", profile_url)
+        with _tracked(limiter):
+            driver.get(profile_url)
         time.sleep(5)
 
         if "Dossier.aspx?IdObjet=" not in driver.current_url:
@@ -211,85 +467,79 @@ def step6_scrape_planning(driver, profile_url: str, timeout:int=30):
         logger.info("Initial agenda loaded. Starting weekly scrape.")
 
         mondays_to_scrape = _get_mondays_to_scrape()
-        logger.info(f"Will scrape {len(mondays_to_scrape)} weeks, starting from Mondays: {mondays_to_scrape}")
+        logger.info("Will scrape %s weeks, starting from Mondays: %s", len(mondays_to_scrape), mondays_to_scrape)
+
+        # Future of each week's courses: the browser navigates to the next week while the previous ones are parsed.
+        parsed_weeks = {}
+        if tabs > 1:
+            try:
+                prefetched = _scrape_weeks_in_tabs(driver, mondays_to_scrape, tabs, nav_arrow_xpath, timeout, limiter,
+                                                   record_dir, parser, parse_pool)
+                parsed_weeks.update({monday: week for monday, week in prefetched.items() if week is not None})
+            except Exception as e:
+                logger.error("Multi-tab week fetching failed, falling back to one week at a time: %s", e)
 
-        all_courses = []
         for i, monday_str in enumerate(mondays_to_scrape):
-            logger.info(f"Scraping week {i+1}/{len(mondays_to_scrape)} (starting {monday_str})...")
+            if monday_str in parsed_weeks:
+                continue
+            update_log_context(week=monday_str)
+            logger.info("Scraping week %s/%s (starting %s)...", i+1, len(mondays_to_scrape), monday_str)
             try:
-                # Find the navigation arrow we will use.
-                arrow_element = WebDriverWait(driver, timeout).until(
-                    EC.presence_of_element_located((By.XPATH, nav_arrow_xpath))
-                )
-
-                # Use JavaScript to change the 'onclick' attribute to our desired date.
-                js_change_attribute = f"arguments[0].setAttribute('onclick', \"NavDat('{monday_str}');return false;\");"
-                driver.execute_script(js_change_attribute, arrow_element)
-                logger.info(f"Set arrow's onclick to navigate to {monday_str}.")
-
-                # Click the now-modified arrow to trigger the navigation.
-                arrow_element.click()
-                logger.info("Clicked the arrow to load the new week.")
-
-                # Wait for the navigation to complete. We wait for the arrow 
-                # to be present again after the refresh.
-                # This prevents the "NavDat is not defined" or stale element errors.
-                WebDriverWait(driver, timeout).until(
-                    EC.presence_of_element_located((By.XPATH, nav_arrow_xpath))
-                )
-                logger.info("New week's content has loaded. Stabilizing page...")
-                # Add a small buffer for JS rendering, then dezoom/scroll to stabilize the view.
-                time.sleep(1)
+                _navigate_to_week(driver, monday_str, nav_arrow_xpath, timeout, limiter)
+                parsed_weeks[monday_str] = _read_week(driver, timeout, parser, parse_pool,
+                                                      week_fixture_path(record_dir, monday_str))
+            except Exception as e:
+                logger.error("Attempt 1/%s failed for week starting %s: %s", max_attempts, monday_str, e)
                 try:
-                    logger.info("De-zooming page and scrolling to ensure full visibility.")
-                    driver.execute_script("document.body.style.zoom='100%'")
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(0.5)
-                    driver.execute_script("window.scrollTo(0, 0);")
-                except Exception as e:
-                    logger.warning(f"Could not execute dezoom/scroll script: {e}")
+                    _reenter_agenda_frame(driver, nav_arrow_xpath, timeout)
+                except Exception as reenter_error:
+                    logger.warning("Could not re-enter agenda iframe: %s", reenter_error)
 
-                # Take a screenshot before scraping the week for debugging.
+        # Join the parsed weeks; weeks that failed are retried one by one, read through WebDriver.
+        all_courses = []
+        weeks = {}
+        for monday_str in mondays_to_scrape:
+            update_log_context(week=monday_str)
+            week_courses = None
+            if monday_str in parsed_weeks:
                 try:
-                    screenshot_dir = 'data/debug_screenshots'
-                    os.makedirs(screenshot_dir, exist_ok=True)
-                    screenshot_path = os.path.join(screenshot_dir, f'week_{monday_str}.png')
-                    driver.get_screenshot_as_file(screenshot_path)
-                    logger.info(f"Saved pre-scrape screenshot to {screenshot_path}")
-                except Exception as e_ss:
-                    logger.error(f"Could not save screenshot for week {monday_str}: {e_ss}")
-
-            except Exception as nav_error:
-                logger.error(f"Failed to navigate to week starting {monday_str}: {nav_error}", exc_info=True)
-                continue 
-
-            week_courses = _scrape_single_week(driver, timeout=timeout)
+                    week_courses = parsed_weeks[monday_str].result()
+                    if week_courses is None:
+                        logger.error("Attempt 1/%s failed for week starting %s: week could not be parsed",
+                                     max_attempts, monday_str)
+                except Exception as e:
+                    logger.error("Attempt 1/%s failed for week starting %s: %s", max_attempts, monday_str, e)
+            if week_courses is None and max_attempts > 1:
+                week_courses = _scrape_week_with_retries(driver, monday_str, nav_arrow_xpath, timeout, limiter,
+                                                         max_attempts, retry_backoff, record_dir, first_attempt=2)
+            # Only complete weeks make it into the planning (and so into step 8).
+            weeks[monday_str] = {'complete': week_courses is not None, 'courses': len(week_courses or [])}
             if week_courses:
                 all_courses.extend(week_courses)
+
+        update_log_context(week=None)
+        incomplete_weeks = [monday for monday, week in weeks.items() if not week['complete']]
+        if incomplete_weeks:
+            logger.warning("%s week(s) could not be scraped completely: %s", len(incomplete_weeks), incomplete_weeks)
         
-        unique_planning = []
-        seen = set()
-        for d in all_courses:
-            course_tuple = (d['date'], d['title'], d['teacher'], d['room'], d['group'], d['start_time'])
-            if course_tuple not in seen:
-                unique_planning.append(d)
-                seen.add(course_tuple)
-        
-        logger.info(f"Found a total of {len(unique_planning)} unique course entries across all weeks.")
+        unique_planning = dedupe_courses(all_courses)
+        logger.info("Found a total of %s unique course entries across all weeks.", len(unique_planning))
         
         return {
             'url': profile_url,
             'scraped_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'planning': unique_planning
+            'planning': unique_planning,
+            'weeks': weeks,
+            'incomplete_weeks': incomplete_weeks
         }
 
     except Exception as e:
-        logger.error(f"CRITICAL ERROR in step 6 (step6_scrape_planning): {e}", exc_info=True)
+        logger.error("CRITICAL ERROR in step 6 (step6_scrape_planning): %s", e, exc_info=True)
         ts = datetime.now().strftime('%Y%m%d_%H%M%S')
         error_screenshot_path = os.path.join('data', f'step6_error_{ts}.png')
         try:
             driver.get_screenshot_as_file(error_screenshot_path)
-            logger.info(f"Saved error screenshot to {error_screenshot_path}")
+            logger.info("Saved error screenshot to %s", error_screenshot_path)
         except Exception as e_ss:
-            logger.error(f"Could not save error screenshot: {e_ss}")
+            logger.error("Could not save error screenshot: %s", e_ss)
         return {'error': str(e)}
\ No newline at end of file
@@ -29,7 +29,7 @@ def step7_optimize_planning(planning_data, max_break_minutes:int=30):
     try:
         sorted_planning = sorted(planning_data, key=lambda x: x['start_time'])
     except (TypeError, KeyError) as e:
-        logger.error(f"Could not sort planning data. Missing or invalid 'start_time'. Error: {e}")
+        logger.error("Could not sort planning data. Missing or invalid 'start_time'. Error: %s", e)
         # Return original data if sorting fails to prevent data loss.
         return planning_data
 
@@ -57,10 +57,10 @@ def step7_optimize_planning(planning_data, max_break_minutes:int=30):
 
         # If same and consecutive, merge them by updating the end_time.
         if is_same_course and is_consecutive:
-            logger.info(
-                f"Merging course '{current_course['title']}' on {current_course['date']}. "
-                f"Extending end time from {current_course['end_time'].strftime('%H:%M')} "
-                f"to {next_course['end_time'].strftime('%H:%M')}."
+            logger.debug(
+                "Merging course '%s' on %s. Extending end time from %s to %s.",
+                current_course['title'], current_course['date'],
+                current_course['end_time'], next_course['end_time']
             )
             # Update the end time of the current block to the end time of the next block.
             current_course['end_time'] = next_course['end_time']
@@ -76,6 +76,6 @@ def step7_optimize_planning(planning_data, max_break_minutes:int=30):
     original_count = len(planning_data)
     final_count = len(merged_planning)
     if final_count < original_count:
-        logger.info(f"Planning optimization complete. Reduced from {original_count} to {final_count} entries.")
+        logger.info("Planning optimization complete. Reduced from %s to %s entries.", original_count, final_count)
 
     return merged_planning
\ No newline at end of file
@@ -0,0 +1,161 @@
+import gzip
+import json
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+def _to_datetime(value):
+    """Course times are datetimes after step 7, ISO strings once loaded back from a results file."""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+class _IntervalList:
+    def __init__(self, intervals):
+        """
+        Intervals of one room or teacher, sorted by start, for logarithmic lookups.
+
+        max_ends[i] is the latest end among the first i+1 intervals: any interval before
+        position i that is still running at t has max_ends[i] > t, which bounds the scans.
+
+        Args:
+            intervals (list): (start, end, title, group) tuples, start/end in minutes since the epoch
+        """
+        self.intervals = sorted(set(intervals))
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        latest = None
+        for interval in self.intervals:
+            latest = interval[1] if latest is None else max(latest, interval[1])
+            self.max_ends.append(latest)
+
+    def at(self, t: int) -> list:
+        """Intervals running at t (start <= t < end)."""
+        found = []
+        i = bisect_right(self.starts, t) - 1
+        while i >= 0 and self.max_ends[i] > t:
+            if self.intervals[i][1] > t:
+                found.append(self.intervals[i])
+            i -= 1
+        return found[::-1]
+
+    def is_free(self, start: int, end: int) -> bool:
+        """No interval overlaps [start, end)."""
+        i = bisect_left(self.starts, end)
+        return i == 0 or self.max_ends[i - 1] <= start
+
+class OccupancyIndex:
+    def __init__(self, rooms: dict, teachers: dict):
+        """
+        Room and teacher occupancy across the plannings of all users.
+
+        Use build_occupancy_index() to create one from scraped plannings, or load() to read an exported one.
+
+        Args:
+            rooms (dict): Room -> list of (start, end, title, group), times in minutes since the epoch
+            teachers (dict): Teacher -> list of (start, end, title, group)
+        """
+        self.rooms = {room: _IntervalList(intervals) for room, intervals in rooms.items()}
+        self.teachers = {teacher: _IntervalList(intervals) for teacher, intervals in teachers.items()}
+
+    @staticmethod
+    def _minutes(moment: datetime) -> int:
+        return int(moment.timestamp() // 60)
+
+    @staticmethod
+    def _course(interval) -> dict:
+        start, end, title, group = interval
+        return {'start_time': datetime.fromtimestamp(start * 60), 'end_time': datetime.fromtimestamp(end * 60),
+                'title': title, 'group': group}
+
+    def in_room(self, room: str, moment: datetime) -> list:
+        """What is in a room at a given time."""
+        intervals = self.rooms.get(room)
+        return [self._course(i) for i in intervals.at(self._minutes(moment))] if intervals else []
+
+    def teacher_at(self, teacher: str, moment: datetime) -> list:
+        """What a teacher is teaching at a given time."""
+        intervals = self.teachers.get(teacher)
+        return [self._course(i) for i in intervals.at(self._minutes(moment))] if intervals else []
+
+    def free_rooms(self, start: datetime, end: datetime, rooms=None) -> list:
+        """
+        Rooms with no course overlapping [start, end).
+
+        Args:
+            rooms (iterable): Candidate rooms, defaults to every room seen in the plannings
+        """
+        start_minutes, end_minutes = self._minutes(start), self._minutes(end)
+        candidates = sorted(self.rooms) if rooms is None else rooms
+        return [room for room in candidates
+                if room not in self.rooms or self.rooms[room].is_free(start_minutes, end_minutes)]
+
+    def save(self, path: str):
+        """
+        Export the index as gzipped JSON. Titles and groups are stored once in a string table,
+        intervals as [start, end, title index, group index] with times in minutes since the epoch.
+        """
+        strings, positions = [], {}
+
+        def ref(text):
+            if text not in positions:
+                positions[text] = len(strings)
+                strings.append(text)
+            return positions[text]
+
+        def pack(index):
+            return {key: [[start, end, ref(title), ref(group)] for start, end, title, group in intervals.intervals]
+                    for key, intervals in index.items()}
+
+        data = {'version': INDEX_FORMAT_VERSION, 'rooms': pack(self.rooms), 'teachers': pack(self.teachers)}
+        data['strings'] = strings
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported occupancy index version: {data.get('version')}")
+        strings = data['strings']
+
+        def unpack(index):
+            return {key: [(start, end, strings[title], strings[group]) for start, end, title, group in intervals]
+                    for key, intervals in index.items()}
+
+        return cls(unpack(data['rooms']), unpack(data['teachers']))
+
+def step7b_build_occupancy_index(all_plannings: dict) -> OccupancyIndex:
+    """
+    Builds the room and teacher occupancy index from the optimized plannings of all users.
+
+    The same course seen in the plannings of several users (same room or teacher, times,
+    title and group) is indexed once.
+
+    Args:
+        all_plannings (dict): User id -> {'planning': [course dictionaries], ...}, as in the run results.
+
+    Returns:
+        OccupancyIndex: The index.
+    """
+    rooms, teachers = {}, {}
+    for entry in all_plannings.values():
+        for course in entry.get('planning') or []:
+            try:
+                start = OccupancyIndex._minutes(_to_datetime(course['start_time']))
+                end = OccupancyIndex._minutes(_to_datetime(course['end_time']))
+            except (KeyError, TypeError, ValueError):
+                continue
+            interval = (start, end, course.get('title') or '', course.get('group') or '')
+            if course.get('room'):
+                rooms.setdefault(course['room'], set()).add(interval)
+            for teacher in filter(None, (t.strip() for t in (course.get('teacher') or '').split(','))):
+                teachers.setdefault(teacher, set()).add(interval)
+
+    index = OccupancyIndex(rooms, teachers)
+    logger.info("Occupancy index built: %s rooms, %s teachers.", len(index.rooms), len(index.teachers))
+    return index
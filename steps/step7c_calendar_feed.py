@@ -0,0 +1,198 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# PASS times are local times in Paris.
+CALENDAR_TIMEZONE = 'Europe/Paris'
+HASH_PROPERTY = 'X-PLANNING-HASH'
+
+VTIMEZONE_PARIS = [
+    'BEGIN:VTIMEZONE',
+    'TZID:Europe/Paris',
+    'BEGIN:DAYLIGHT',
+    'TZOFFSETFROM:+0100',
+    'TZOFFSETTO:+0200',
+    'TZNAME:CEST',
+    'DTSTART:19700329T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU',
+    'END:DAYLIGHT',
+    'BEGIN:STANDARD',
+    'TZOFFSETFROM:+0200',
+    'TZOFFSETTO:+0100',
+    'TZNAME:CET',
+    'DTSTART:19701025T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+]
+
+def _to_datetime(value):
+    """Course times are datetimes after step 7, ISO strings once loaded back from a results file."""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def planning_hash(planning: list) -> str:
+    """Hash of what the calendar shows of a planning, independent of the order of the courses."""
+    events = sorted(
+        (_to_datetime(c['start_time']).isoformat(), _to_datetime(c['end_time']).isoformat(),
+         c.get('title') or '', c.get('room') or '', c.get('teacher') or '', c.get('group') or '')
+        for c in planning
+    )
+    # 128 bits are plenty to detect a change, and keep the property on one (unfolded) line.
+    return hashlib.sha256(json.dumps(events, ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 3.1), without splitting a UTF-8 character."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Back off to the start of a UTF-8 character.
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74  # Continuation lines start with a space.
+    return '\r\n '.join(parts)
+
+def _local_time(value) -> str:
+    return _to_datetime(value).strftime('%Y%m%dT%H%M%S')
+
+def build_ics(planning: list, calendar_name: str, content_hash: str, generated_at: datetime = None,
+              kept_events: list = None) -> str:
+    """
+    iCalendar (RFC 5545) feed of a planning, one VEVENT per course.
+
+    UIDs depend on the course's start, title, group, room and teacher: two courses differing only
+    by their room or teacher stay two events in calendar clients.
+
+    Args:
+        kept_events (list): VEVENTs of a previous feed to keep as they are (lists of their content lines).
+    """
+    stamp = (generated_at or datetime.now(timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Transat//PASS scraper//FR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(calendar_name)}',
+        f'X-WR-TIMEZONE:{CALENDAR_TIMEZONE}',
+        f'{HASH_PROPERTY}:{content_hash}',
+        *VTIMEZONE_PARIS,
+    ]
+    for course in sorted(planning, key=lambda c: _to_datetime(c['start_time'])):
+        start = _local_time(course['start_time'])
+        title = course.get('title') or ''
+        uid = hashlib.sha1(f"{start}|{title}|{course.get('group') or ''}|{course.get('room') or ''}|"
+                           f"{course.get('teacher') or ''}".encode('utf-8')).hexdigest()
+        description = '\n'.join(part for part in (course.get('teacher'), course.get('group')) if part)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{uid}@transat-pass-scraper',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;TZID={CALENDAR_TIMEZONE}:{start}',
+            f'DTEND;TZID={CALENDAR_TIMEZONE}:{_local_time(course["end_time"])}',
+            f'SUMMARY:{_escape(title)}',
+        ]
+        if course.get('room'):
+            lines.append(f'LOCATION:{_escape(course["room"])}')
+        if description:
+            lines.append(f'DESCRIPTION:{_escape(description)}')
+        lines.append('END:VEVENT')
+    for event in kept_events or []:
+        lines += event
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+def calendar_path(calendar_dir: str, user_id) -> str:
+    return os.path.join(calendar_dir, f"{user_id}.ics")
+
+def calendar_token(secret: str, user_id) -> str:
+    """Unguessable token of a user's feed: the feed is served at /calendar/<user_id>/<token>.ics only."""
+    return hmac.new(secret.encode('utf-8'), str(user_id).encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def events_by_week(path: str) -> dict:
+    """
+    The VEVENTs of a calendar file by the Monday of their week.
+
+    Returns:
+        dict: 'YYYYMMDD' of the Monday -> list of events, each the list of its content lines as written
+        (folded lines included). Empty if there is no file.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            lines = f.read().split('\r\n')
+    except OSError:
+        return {}
+    weeks, event, monday = {}, None, None
+    for line in lines:
+        if line == 'BEGIN:VEVENT':
+            event, monday = [line], None
+        elif event is not None:
+            event.append(line)
+            if line.startswith('DTSTART'):
+                day = datetime.strptime(line.split(':', 1)[1][:8], '%Y%m%d')
+                monday = (day - timedelta(days=day.weekday())).strftime('%Y%m%d')
+            elif line == 'END:VEVENT':
+                if monday is not None:
+                    weeks.setdefault(monday, []).append(event)
+                event = None
+    return weeks
+
+def read_calendar_hash(path: str):
+    """The planning hash recorded in a calendar file (in its first lines), or None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for _ in range(12):
+                line = f.readline()
+                if line.startswith(f'{HASH_PROPERTY}:'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+def step7c_write_calendar(planning: list, user_id, calendar_dir: str, incomplete_weeks: list = None) -> bool:
+    """
+    Write the user's calendar feed (calendar_dir/<user_id>.ics) if their planning changed since the
+    last one. The file is replaced atomically, so the health server never serves a partial feed.
+
+    The planning of a partial scrape lacks its incomplete weeks: the events of the previous feed
+    in those weeks are kept, so that subscribed clients do not delete them.
+
+    Args:
+        incomplete_weeks (list): Mondays ('YYYYMMDD') of the weeks that could not be scraped.
+
+    Returns:
+        bool: True if the file was (re)written, False if it was already up to date.
+    """
+    path = calendar_path(calendar_dir, user_id)
+    content_hash = planning_hash(planning or [])
+    kept_events = []
+    if incomplete_weeks:
+        previous = events_by_week(path)
+        kept_events = [event for monday in sorted(incomplete_weeks) for event in previous.get(monday, [])]
+    if kept_events:
+        kept = json.dumps(kept_events, ensure_ascii=False)
+        content_hash = hashlib.sha256(f"{content_hash}|{kept}".encode('utf-8')).hexdigest()[:32]
+        logger.info("Step 7c: Keeping %s event(s) of the incomplete weeks %s of user %s.",
+                    len(kept_events), incomplete_weeks, user_id)
+    if read_calendar_hash(path) == content_hash:
+        logger.info("Step 7c: Calendar of user %s unchanged.", user_id)
+        return False
+    os.makedirs(calendar_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(build_ics(planning or [], "Planning PASS", content_hash, kept_events=kept_events))
+    os.replace(tmp_path, path)
+    logger.info("Step 7c: Calendar of user %s written (%s courses).", user_id, len(planning or []))
+    return True
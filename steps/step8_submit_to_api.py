@@ -1,12 +1,45 @@
 import logging
 import requests
 from api_client import ApiClient
-from datetime import datetime
+from course_store import course_key
+from serialization import json_ready_course
 
 # Set up a logger for this module. It will inherit the root logger's configuration.
 logger = logging.getLogger(__name__)
 
-def step8_submit_to_api(planning, user_email: str, api_client: ApiClient):
+def _course_payload(course, user_email: str) -> dict:
+    # A new dict, so the original course (possibly shared through a CourseStore) is left untouched.
+    # Datetimes stay as they are: the request encoder (serialization.dumps) writes them as ISO 8601.
+    return {**course, "user_email": user_email}
+
+def _submit_shared_courses(planning, user_email: str, api_client: ApiClient, course_store) -> bool:
+    # Each distinct course is sent once per run under its content key, then the user's planning as references.
+    keys = [course_key(course) for course in planning]
+    courses = dict(zip(keys, planning))
+    claimed = course_store.claim_unsent(keys)
+    stored = []
+    try:
+        for key in claimed:
+            api_client.put_shared_course(key, courses[key])
+            stored.append(key)
+    except Exception as e:
+        logger.error("API Error storing shared courses for user %s: %s", user_email, e)
+    finally:
+        course_store.finish_sending(stored, True)
+        course_store.finish_sending([key for key in claimed if key not in stored], False)
+    if not course_store.wait_sent(keys):
+        logger.error("Not all shared courses of user %s could be stored, planning not sent.", user_email)
+        return False
+
+    try:
+        api_client.put_user_course_refs(user_email, keys)
+    except Exception as e:
+        logger.error("API Error sending course references for user %s: %s", user_email, e)
+        return False
+    logger.info("Step 8: Sent %s course references for user %s (%s new shared courses).", len(keys), user_email, len(stored))
+    return True
+
+def step8_submit_to_api(planning, user_email: str, api_client: ApiClient, outbox=None, course_store=None):
     """
     Sends each course in the planning list to the API for a specific user.
 
@@ -14,41 +47,47 @@ def step8_submit_to_api(planning, user_email: str, api_client: ApiClient):
         planning (list): List of final, optimized course dictionaries.
         user_email (str): The email address of the user whose planning it is.
         api_client (ApiClient): An authenticated instance of the ApiClient.
+        outbox (Outbox): If given, the courses are queued there for the outbox drainer instead of sent now.
+        course_store (CourseStore): If given, the courses go through the shared-course endpoints
+            (Config.API_SHARED_COURSES): stored once per run, and referenced by the user's planning.
 
     Returns:
-        bool: True if all courses were sent successfully, False otherwise.
+        bool: True if all courses were sent (or durably queued) successfully, False otherwise.
     """
     if not planning:
-        logger.info(f"No planning data to send to API for user {user_email}.")
+        logger.info("No planning data to send to API for user %s.", user_email)
+        return True
+
+    if course_store is not None:
+        return _submit_shared_courses(planning, user_email, api_client, course_store)
+
+    if outbox is not None:
+        try:
+            # Converted once here: the outbox encodes each payload twice (idempotency key and stored JSON).
+            queued = outbox.enqueue(user_email, [_course_payload(json_ready_course(course), user_email) for course in planning])
+        except Exception as e:
+            logger.error("Could not queue courses for user %s in the outbox: %s", user_email, e)
+            return False
+        logger.info("Step 8: Queued %s courses for user %s (%s already pending).", queued, user_email, len(planning) - queued)
         return True
 
-    logger.info(f"Step 8: Sending {len(planning)} courses to API for user {user_email}.")
+    logger.info("Step 8: Sending %s courses to API for user %s.", len(planning), user_email)
     
     success_count = 0
     failure_count = 0
 
     for course in planning:
-        # Create a copy to avoid modifying the original course object.
-        course_payload = course.copy()
-
-        course_payload["user_email"] = user_email
-
-        # The API expects start_time and end_time as ISO 8601 strings.
-        if isinstance(course_payload.get('start_time'), datetime):
-            course_payload['start_time'] = course_payload['start_time'].isoformat()
-        if isinstance(course_payload.get('end_time'), datetime):
-            course_payload['end_time'] = course_payload['end_time'].isoformat()
-            
+        course_payload = _course_payload(course, user_email)
         try:
             api_client.post_course(course_payload)
             success_count += 1
         except requests.exceptions.RequestException as e:
-            logger.error(f"API Error sending course for user {user_email}: {course_payload} | Error: {e}")
+            logger.error("API Error sending course for user %s: %s | Error: %s", user_email, course_payload, e)
             failure_count += 1
         except Exception as e:
-            logger.error(f"Unexpected error sending course to API: {course_payload} | Error: {e}")
+            logger.error("Unexpected error sending course to API: %s | Error: %s", course_payload, e)
             failure_count += 1
 
-    logger.info(f"Step 8 Finished: Successfully sent {success_count}/{len(planning)} courses for user {user_email}.")
+    logger.info("Step 8 Finished: Successfully sent %s/%s courses for user %s.", success_count, len(planning), user_email)
     
     return failure_count == 0
\ No newline at end of file
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Recorded weeks are stored as <fixtures dir>/<user id>/week_<monday>.json, holding the snapshot step 6
+# parsed ({'html': ...}) or what it read through WebDriver
+# ({'header': ..., 'day_headers': [...], 'cells': [[day index, title, text], ...]}).
+
+def week_fixture_path(record_dir: str, monday_str: str):
+    """Fixture file of a week in a user's record directory, or None when not recording."""
+    return os.path.join(record_dir, f"week_{monday_str}.json") if record_dir else None
+
+def save_week_fixture(path: str, raw_week: dict):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(raw_week, f, ensure_ascii=False)
+    except OSError as e:
+        logger.warning("Could not record week fixture %s: %s", path, e)
+
+def load_user_fixtures(fixtures_dir: str, user_ids=None) -> dict:
+    """
+    Load recorded weeks.
+
+    Args:
+        fixtures_dir (str): Directory holding one sub-directory of weeks per user.
+        user_ids (iterable): Only load these users (all by default).
+
+    Returns:
+        dict: User id -> {Monday: raw week}, in sorted order.
+    """
+    users = {}
+    for user_id in sorted(os.listdir(fixtures_dir)):
+        user_dir = os.path.join(fixtures_dir, user_id)
+        if not os.path.isdir(user_dir) or (user_ids and user_id not in user_ids):
+            continue
+        weeks = {}
+        for name in sorted(os.listdir(user_dir)):
+            if name.startswith('week_') and name.endswith('.json'):
+                with open(os.path.join(user_dir, name), 'r', encoding='utf-8') as f:
+                    weeks[name[len('week_'):-len('.json')]] = json.load(f)
+        users[user_id] = weeks
+    return users
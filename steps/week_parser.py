@@ -0,0 +1,171 @@
+import logging
+import re
+from datetime import date
+from steps.cell_parser import MONTH_MAP, get_default_classifier
+from steps.html_tree import parse_html
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+# Parsing of one agenda week, without a browser: from what step 6 read through WebDriver,
+# or from a snapshot of the agenda iframe's HTML. Nothing here needs a browser, so these
+# functions can run in worker processes (see parse_week_html). The workers are spawned, which
+# re-imports the main module in each of them: under run_scraper.py, Selenium is loaded there too.
+
+def extract_week_from_html(html: str) -> dict:
+    """
+    Read the agenda week of a snapshot of the 'frm1' iframe, as _scrape_single_week reads it through
+    WebDriver (same elements as its XPaths), without the per-cell round-trips.
+
+    Returns:
+        dict: {'header': ..., 'day_headers': [...], 'cells': [(day index, title, text), ...]}, or None
+        if the agenda header is not in the snapshot.
+    """
+    root = parse_html(html)
+
+    # //td[@class='AuthentificationMenu' and contains(text(),'Agenda de l')]
+    header_text = None
+    for td in root.iter('td'):
+        if td.attrs.get('class') == 'AuthentificationMenu' and any(
+                isinstance(c, str) and 'Agenda de l' in c for c in td.children):
+            header_text = td.text
+            break
+    if header_text is None:
+        return None
+
+    # //tr[contains(@class,'fondTresClair')]/td[position()>1]
+    day_texts = []
+    for tr in root.iter('tr'):
+        if 'fondTresClair' in tr.attrs.get('class', ''):
+            day_texts.extend(td.text for td in tr.child_elements('td')[1:])
+
+    header = parse_week_header(header_text, day_texts)
+    if header is None:
+        return {'header': header_text, 'day_headers': day_texts, 'cells': []}
+    _, _, days = header
+
+    # //tr[td[@bgcolor='#DDDDDD']], then the course cells of the days of the week.
+    cells = []
+    for tr in root.iter('tr'):
+        tds = tr.child_elements('td')
+        if not any(td.attrs.get('bgcolor') == '#DDDDDD' for td in tds) or len(tds) < len(days) + 1:
+            continue
+        for j, (_, date_str, _) in enumerate(days):
+            if date_str is None:
+                continue
+            course_cell = tds[j + 1]
+            bgcolor = course_cell.attrs.get('bgcolor')
+            if not bgcolor or bgcolor.lower() == '#ededed':
+                continue
+            # Cells without a bold title are rowspan continuations.
+            title_element = next(course_cell.iter('b'), None)
+            if title_element is None:
+                continue
+            cells.append((j, title_element.text.strip(), course_cell.text))
+    return {'header': header_text, 'day_headers': day_texts, 'cells': cells}
+
+# Helper function to read the header of a week: its month, year and days.
+def parse_week_header(header_text: str, day_texts: list):
+    """
+    Returns:
+        tuple: (year, month, days) with days as (day name, 'YYYY-MM-DD' or None, day of month),
+        or None if the month/year could not be read.
+    """
+    month_year_match = re.search(r'([A-Za-zéû]+)\s+(\d{4})$', header_text.strip())
+    if not month_year_match:
+        logger.warning("Could not extract month/year from header: '%s'", header_text)
+        return None
+
+    french_month, year = month_year_match.groups()
+    year = int(year)
+    month = MONTH_MAP.get(french_month)
+    if not month:
+        logger.warning("Unrecognized month: %s", french_month)
+        return None
+
+    days = []
+    for i, day_text in enumerate(day_texts):
+        text = day_text.strip().replace('\xa0', ' ')
+        match = re.match(r"(\w+)\s+(\d{1,2})", text)
+        if match:
+            day_name, day_num = match.groups()
+            # Handle month changeover (e.g., end of month)
+            try:
+                day_date = date(year, month, int(day_num))
+            except ValueError:
+                logger.warning("Date parsing error for day %s in month %s. Skipping day.", day_num, month)
+                continue
+            days.append((day_name, day_date.strftime("%Y-%m-%d"), day_date.day))
+        else:
+            days.append((f"Day{i}", None, None))
+    return year, month, days
+
+# Helper function to turn the course cells of a week into course dictionaries.
+def parse_week_cells(year: int, month: int, days: list, cells: list) -> list:
+    """
+    Args:
+        cells (list): (day index, title, cell text) of every course cell of the week.
+
+    Returns:
+        list: A list of course dictionaries.
+    """
+    classifier = get_default_classifier()
+    planning_of_the_week = []
+    for j, title, cell_text in cells:
+        _, date_str, day_num = days[j]
+        try:
+            start_time_obj, end_time_obj, teachers, room, group = classifier.parse_cell(
+                cell_text, title, year, month, day_num
+            )
+            if title and start_time_obj:
+                planning_of_the_week.append({
+                    'date': date_str,
+                    'title': title,
+                    'start_time': start_time_obj,
+                    'end_time': end_time_obj,
+                    'teacher': ", ".join(teachers),
+                    'room': room,
+                    'group': group
+                })
+        except Exception as e:
+            logger.warning("Error parsing course cell on %s: %s", date_str, e)
+    return planning_of_the_week
+
+def parse_recorded_week(raw_week: dict) -> list:
+    """
+    Parse a week recorded by step 6 (see steps/week_fixtures.py): an HTML snapshot, or what was read through WebDriver.
+
+    Returns:
+        list: A list of course dictionaries for the week, or None if the week could not be parsed.
+    """
+    if 'html' in raw_week:
+        return parse_week_html(raw_week['html'])
+    header = parse_week_header(raw_week['header'], raw_week['day_headers'])
+    if header is None:
+        return None
+    year, month, days = header
+    return parse_week_cells(year, month, days, raw_week['cells'])
+
+def parse_week_html(html: str) -> list:
+    """
+    Parse a snapshot of the agenda iframe into the week's courses (runs in the parse worker processes).
+
+    Returns:
+        list: A list of course dictionaries for the week, or None if the week could not be parsed.
+    """
+    raw_week = extract_week_from_html(html)
+    if raw_week is None:
+        logger.warning("Agenda header not found in the week snapshot.")
+        return None
+    return parse_recorded_week(raw_week)
+
+def dedupe_courses(courses: list) -> list:
+    """Drop duplicate courses, keeping the first occurrence."""
+    unique_planning = []
+    seen = set()
+    for d in courses:
+        course_tuple = (d['date'], d['title'], d['teacher'], d['room'], d['group'], d['start_time'])
+        if course_tuple not in seen:
+            unique_planning.append(d)
+            seen.add(course_tuple)
+    return unique_planning
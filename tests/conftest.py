@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Config refuses to load with placeholder values: give the tests harmless ones.
+os.environ.setdefault('TRANSAT_API_EMAIL', 'scraper@example.com')
+os.environ.setdefault('TRANSAT_API_PASSWORD', 'test-password')
+os.environ.setdefault('TEMPORARY_USER_EMAIL', 'temporary@example.com')
+os.environ.setdefault('TEMPORARY_USER_ID', '1')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules live at the root of the repository; the mock API and fakes in tools/.
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tools')]
@@ -0,0 +1,24 @@
+from account_pool_check import FakeScraper, run
+
+USERS = 30
+
+def test_single_account_processes_every_user():
+    _, done, failed, left, _ = run([FakeScraper(0.001)], USERS, cooldown=0.05)
+    assert sorted(done) == list(range(USERS))
+    assert not failed and not left
+
+def test_broken_session_fails_users_over():
+    accounts = [FakeScraper(0.001, break_after=5, broken_logins=2), FakeScraper(0.001),
+                FakeScraper(0.001, never_logs_in=True)]
+    pool, done, failed, left, _ = run(accounts, USERS, cooldown=0.05)
+    assert sorted(done) == list(range(USERS))
+    assert not failed and not left
+    assert pool.accounts[-1].success == 0
+    assert pool.accounts[0].failovers >= 1
+
+def test_user_failing_in_step8_is_not_failed_over():
+    accounts = [FakeScraper(0.001, break_after=5, break_in_step8=True), FakeScraper(0.001)]
+    pool, done, failed, left, _ = run(accounts, USERS, cooldown=0.05)
+    assert len(failed) == 1 and failed[0][1].startswith("Failed in step 8")
+    assert sorted(done + [failed[0][0]]) == list(range(USERS)) and not left
+    assert all(account.failovers == 0 for account in pool.accounts)
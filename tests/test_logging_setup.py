@@ -0,0 +1,84 @@
+import logging
+import queue
+
+import pytest
+
+import logging_setup
+from logging_setup import (ContextFilter, DeferredQueueHandler, RateLimitFilter, RedactingFilter,
+                           SafeQueueListener, log_context)
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+def record(msg, *args, level=logging.INFO, name='test'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_prepare_merges_the_arguments_when_queued():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    results = {'success': 1}
+    prepared = handler.prepare(record("Summary: %s", results))
+    results['success'] = 2
+    assert prepared.getMessage() == "Summary: {'success': 1}"
+    assert prepared.args is None
+
+def test_bad_format_call_does_not_stop_the_listener(monkeypatch):
+    errors = []
+    monkeypatch.setattr(logging.Handler, 'handleError', lambda self, rec: errors.append(rec))
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    output = ListHandler()
+    listener = SafeQueueListener(log_queue, output)
+    listener.start()
+    try:
+        queue_handler.handle(record("bad %s %s", 1))
+        # A filter raising on the listener thread is reported, the next records still go through.
+        log_queue.put(record("%d", 'not a number'))
+        queue_handler.handle(record("still %s", 'logging'))
+    finally:
+        listener.stop()
+    assert output.messages == ["still logging"]
+    assert len(errors) == 2
+
+def test_rate_limit_reports_suppressed_messages_after_other_keys(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(logging_setup.time, 'monotonic', lambda: now[0])
+    rate_limit = RateLimitFilter(max_per_window=2, window_seconds=60)
+    allowed = [rate_limit.filter(record("Scraped %s courses", i)) for i in range(5)]
+    assert allowed == [True, True, False, False, False]
+
+    now[0] = 120.0
+    assert rate_limit.filter(record("Another message"))
+    repeated = record("Scraped %s courses", 99)
+    assert rate_limit.filter(repeated)
+    assert repeated.msg.endswith("[3 similar messages suppressed]")
+
+def test_rate_limit_lets_warnings_through():
+    rate_limit = RateLimitFilter(max_per_window=1)
+    assert all(rate_limit.filter(record("PASS slow", level=logging.WARNING)) for _ in range(3))
+
+def test_redacting_filter_hides_secrets():
+    redactor = RedactingFilter(secrets=['hunter22'])
+    rec = record("login with %s, Authorization: Bearer abc.def", 'hunter22')
+    redactor.filter(rec)
+    assert rec.msg == "login with ***, Authorization: Bearer ***"
+
+def test_context_filter_copies_the_account():
+    rec = record("hello")
+    with log_context(user=3, account='pass-account'):
+        ContextFilter().filter(rec)
+    assert (rec.user, rec.account, rec.week) == (3, 'pass-account', None)
+
+def test_setup_from_config_survives_an_unreadable_accounts_file(monkeypatch, tmp_path):
+    from config import Config
+    monkeypatch.setattr(Config, 'PASS_ACCOUNTS_FILE', str(tmp_path / 'missing.txt'))
+    with pytest.raises(ValueError):
+        Config.pass_accounts()
+    calls = []
+    monkeypatch.setattr(logging_setup, 'setup_logging', lambda **kwargs: calls.append(kwargs))
+    logging_setup.setup_logging_from_config()
+    assert len(calls) == 1
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from api_client import ApiClient
+from mock_api import MockApi
+from outbox import Outbox, OutboxDrainer
+from outbox_check import make_courses
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / 'outbox.sqlite'), retry_backoff=0.05)
+
+@pytest.fixture
+def api():
+    api = MockApi().start()
+    yield api
+    api.stop()
+
+@pytest.fixture
+def client(api, tmp_path):
+    client = ApiClient(base_api_url=api.url, users_cache_file=str(tmp_path / 'users_cache.json'))
+    client.authenticate('scraper@example.com', 'secret')
+    return client
+
+def drain(outbox, client):
+    drainer = OutboxDrainer(outbox, client, concurrency=2, idle_interval=0.05).start()
+    drainer.stop(drain_timeout=30)
+    return drainer.summary()
+
+def fail_one(outbox, claimer='drainer', retryable=False):
+    [(row_id, _, _)] = outbox.claim(1, claimer)
+    outbox.record([], [(row_id, 'rejected', retryable)], claimer)
+    return row_id
+
+def test_enqueue_keeps_one_copy_of_a_pending_course(outbox):
+    courses = make_courses({'email': 'a@imt-atlantique.net'}, 3)
+    assert outbox.enqueue('a@imt-atlantique.net', courses) == 3
+    assert outbox.enqueue('a@imt-atlantique.net', courses) == 0
+    assert outbox.stats()['pending'] == 3
+
+def test_dead_course_is_queued_again_by_the_next_run(outbox):
+    course = make_courses({'email': 'a@imt-atlantique.net'}, 1)
+    outbox.enqueue('a@imt-atlantique.net', course)
+    fail_one(outbox)
+    assert outbox.stats()['dead'] == 1
+
+    assert outbox.enqueue('a@imt-atlantique.net', course) == 1
+    stats = outbox.stats()
+    assert stats['dead'] == 0 and stats['pending'] == 1
+
+def test_record_ignores_a_row_claimed_by_another_drainer(outbox):
+    outbox.enqueue('a@imt-atlantique.net', make_courses({'email': 'a@imt-atlantique.net'}, 1))
+    [(row_id, _, _)] = outbox.claim(1, 'current')
+    outbox.record([], [(row_id, 'late failure', False)], 'expired')
+    assert outbox.stats()['sending'] == 1
+
+def test_drainer_delivers_every_course_once(outbox, client, api):
+    for user in ('a', 'b'):
+        outbox.enqueue(f"{user}@imt-atlantique.net", make_courses({'email': f"{user}@imt-atlantique.net"}, 10))
+    summary = drain(outbox, client)
+    assert summary['delivered'] == 20 and summary['pending'] == 0
+    assert len(api.courses) == 20
+
+def test_transient_failures_are_retried(outbox, client, api):
+    outbox.enqueue('a@imt-atlantique.net', make_courses({'email': 'a@imt-atlantique.net'}, 10))
+    api.fail_courses = 5
+    summary = drain(outbox, client)
+    assert summary['pending'] == 0 and summary['dead'] == 0
+    assert len(api.courses) == 10
+
+def test_expired_token_is_renewed(outbox, client, api):
+    outbox.enqueue('a@imt-atlantique.net', make_courses({'email': 'a@imt-atlantique.net'}, 3))
+    client.token = 'expired'
+    summary = drain(outbox, client)
+    assert summary['delivered'] == 3
+    assert api.count('POST', '/api/auth/login') == 2
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from mock_api import make_users
+from work_queue import WorkQueue
+
+@pytest.fixture
+def work_queue(tmp_path):
+    return WorkQueue(str(tmp_path / 'queue.sqlite'), max_attempts=3)
+
+def test_each_user_is_claimed_once_and_merged(work_queue):
+    users = make_users(5)
+    work_queue.enqueue('run', users)
+    claimed = []
+    while (user := work_queue.claim('run', 'worker')) is not None:
+        claimed.append(user['id'])
+        assert work_queue.complete('run', user['id'], 'worker', {'planning': [], 'url': 'u'})
+    assert sorted(claimed) == [user['id'] for user in users]
+    assert work_queue.is_finished('run')
+    assert work_queue.merged_results('run')['success'] == 5
+
+def test_failed_user_goes_back_to_pending(work_queue):
+    work_queue.enqueue('run', make_users(1))
+    user = work_queue.claim('run', 'worker')
+    work_queue.fail('run', user['id'], 'worker', 'step 6 failed')
+    assert work_queue.claim('run', 'other') == user
+
+def test_final_failure_is_not_claimed_again(work_queue):
+    work_queue.enqueue('run', make_users(1))
+    user = work_queue.claim('run', 'worker')
+    work_queue.fail('run', user['id'], 'worker', 'failed during step 8', final=True)
+    assert work_queue.claim('run', 'other') is None
+    assert work_queue.progress('run')['failed'] == 1
+
+def test_complete_after_lost_lease_is_rejected(work_queue):
+    work_queue.enqueue('run', make_users(1))
+    user = work_queue.claim('run', 'worker')
+    work_queue.fail('run', user['id'], 'worker', 'error')
+    assert not work_queue.complete('run', user['id'], 'worker', {'planning': []})
+
+def test_user_whose_leases_keep_expiring_is_failed(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=0, max_attempts=2)
+    work_queue.enqueue('poison', make_users(1))
+    claims = 0
+    while work_queue.claim('poison', 'doomed') is not None:
+        claims += 1
+        time.sleep(0.01)
+    assert claims == 2
+    assert work_queue.progress('poison')['failed'] == 1
@@ -0,0 +1,126 @@
+"""
+Simulated run of the PASS account pool (account_pool.py), without browsers.
+
+Each account is a fake scraper taking --user-seconds per user. One account's session breaks
+after a few users and it cannot log in again for a while; another account never logs in.
+Checks that every user is processed exactly once, that users in progress on the broken
+account are failed over (unless step 8 had started), and compares the run time with a single account.
+
+Usage:
+    python tools/account_pool_check.py [--users 60] [--accounts 3] [--user-seconds 0.02]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from account_pool import AccountPool, PassAccount, RETIRED
+
+class FakeSupervisor:
+    def summary(self):
+        return {}
+
+class FakeScraper:
+    def __init__(self, user_seconds, break_after=None, broken_logins=0, never_logs_in=False, break_in_step8=False):
+        """
+        A scraper whose session breaks after break_after users, then fails broken_logins logins.
+        With break_in_step8, the user during which the session breaks fails in step 8.
+        """
+        self.user_seconds = user_seconds
+        self.break_after = break_after
+        self.logins_to_fail_after_break = broken_logins
+        self.broken_logins = 0
+        self.never_logs_in = never_logs_in
+        self.supervisor = FakeSupervisor()
+        self.session_valid = True
+        self.processed = 0
+        self.break_in_step8 = break_in_step8
+        self.submit_started = False
+
+    def process(self, user):
+        self.submit_started = False
+        time.sleep(self.user_seconds)
+        if not self.session_valid:
+            raise Exception("Failed at step 3: Navigation (redirected to CAS)")
+        self.processed += 1
+        if self.break_after is not None and self.processed == self.break_after:
+            self.session_valid = False
+            self.broken_logins = self.logins_to_fail_after_break
+            if self.break_in_step8:
+                self.submit_started = True
+                raise Exception("Failed in step 8: session expired")
+        return {'planning': [], 'incomplete_weeks': []}
+
+    def is_pass_session_valid(self):
+        return self.session_valid
+
+    def ensure_logged_in(self, username, password):
+        if self.never_logs_in:
+            return 'Failed at step 2: Login'
+        if self.broken_logins:
+            self.broken_logins -= 1
+            return 'Failed at step 2: Login'
+        self.session_valid = True
+        return None
+
+    restart_browser = ensure_logged_in
+
+def run(accounts, users, cooldown):
+    pool = AccountPool([PassAccount(f"account{i}", 'secret', scraper) for i, scraper in enumerate(accounts)],
+                       max_failures=3, cooldown=cooldown, max_logins=3)
+    for account in pool.accounts:
+        pool.login_result(account, account.scraper.ensure_logged_in(account.username, account.password))
+    done, failed, lock = [], [], threading.Lock()
+
+    def on_success(user, entry, seconds):
+        with lock:
+            done.append(user['id'])
+
+    def on_failure(user, error, seconds):
+        with lock:
+            failed.append((user['id'], str(error)))
+
+    started = time.monotonic()
+    left = pool.run(({'id': i} for i in range(users)), lambda account, user: account.scraper.process(user),
+                    on_success, on_failure)
+    return pool, done, failed, left, time.monotonic() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated run of the PASS account pool.")
+    parser.add_argument('--users', type=int, default=60)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--user-seconds', type=float, default=0.02)
+    args = parser.parse_args()
+
+    _, done, failed, left, single_seconds = run([FakeScraper(args.user_seconds)], args.users, cooldown=0.1)
+    assert sorted(done) == list(range(args.users)) and not failed and not left
+    print(f"1 account: {args.users} users in {single_seconds:.2f}s")
+
+    # Account 0 breaks after 5 users and needs 2 cooldowns to log in again; the last account never logs in.
+    accounts = [FakeScraper(args.user_seconds, break_after=5, broken_logins=2)]
+    accounts += [FakeScraper(args.user_seconds) for _ in range(args.accounts - 2)]
+    accounts += [FakeScraper(args.user_seconds, never_logs_in=True)]
+    pool, done, failed, left, seconds = run(accounts, args.users, cooldown=0.05)
+    assert sorted(done) == list(range(args.users)), f"Users processed: {sorted(done)}"
+    assert not failed and not left, (failed, left)
+    assert pool.accounts[-1].state == RETIRED
+    for summary in pool.summary():
+        print(f"  {summary['username']}: {summary['state']}, {summary['success']} users, "
+              f"{summary['session_breaks']} session break(s), {summary['failovers']} failover(s)")
+    print(f"{args.accounts} accounts (one breaking, one never logged in): {args.users} users in {seconds:.2f}s, "
+          f"each exactly once ({single_seconds / seconds:.1f}x faster)")
+
+    # A user failing once step 8 started is reported failed, not processed again by another account.
+    accounts = [FakeScraper(args.user_seconds, break_after=5, break_in_step8=True),
+                FakeScraper(args.user_seconds)]
+    pool, done, failed, left, _ = run(accounts, args.users, cooldown=0.05)
+    assert len(failed) == 1 and failed[0][1].startswith("Failed in step 8"), failed
+    assert sorted(done + [failed[0][0]]) == list(range(args.users)) and not left, (done, failed, left)
+    assert sum(summary['failovers'] for summary in pool.summary()) == 0
+    print(f"Session broken in step 8: user #{failed[0][0]} failed, not failed over.")
+
+if __name__ == "__main__":
+    main()
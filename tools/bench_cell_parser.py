@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of the course cell parsing: the former per-line regex chain against the
+compiled single-pass classifier of steps/cell_parser.py.
+
+Checks that both produce identical results on the corpus, then times them.
+
+Usage:
+    python tools/bench_cell_parser.py [--corpus tools/fixtures/cell_texts.json] [--rounds 2000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.cell_parser import CellLineClassifier
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'cell_texts.json')
+DATE_STR, YEAR, MONTH, DAY = "2025-03-10", 2025, 3, 10
+
+def legacy_parse_cell(text, title, date_str):
+    """The parsing loop of _scrape_single_week before the compiled classifier."""
+    all_text_parts = text.split('\n')
+    start_time_obj, end_time_obj, teachers, room, group = None, None, [], "", ""
+    for part in all_text_parts:
+        time_match = re.search(r'(\d{2})H(\d{2})-(\d{2})H(\d{2})', part)
+        if time_match:
+            start_h, start_m, end_h, end_m = time_match.groups()
+            start_time_obj = datetime.strptime(f"{date_str} {start_h}:{start_m}", "%Y-%m-%d %H:%M")
+            end_time_obj = datetime.strptime(f"{date_str} {end_h}:{end_m}", "%Y-%m-%d %H:%M")
+        elif re.search(r"\bFISE|FIT|FIL|PROMO|GPE|ANNÉE|LV1|DEMI\b", part, re.IGNORECASE):
+            group = part
+        elif re.match(r"^[A-Z]{2,}-.*", part) or '(' in part:
+            room = part
+        elif part != title and re.fullmatch(r"[A-Z'’\s-]+ [A-Z][a-z'’-]+", part, re.IGNORECASE):
+            teachers.append(part)
+    return start_time_obj, end_time_obj, teachers, room, group
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark course cell parsing.")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="JSON file with a 'cells' list of {title, text}")
+    parser.add_argument('--rounds', type=int, default=2000, help="Passes over the corpus per measurement")
+    args = parser.parse_args()
+
+    with open(args.corpus, 'r', encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    classifier = CellLineClassifier.from_file()
+
+    for cell in cells:
+        legacy = legacy_parse_cell(cell['text'], cell['title'], DATE_STR)
+        compiled = classifier.parse_cell(cell['text'], cell['title'], YEAR, MONTH, DAY)
+        if legacy != compiled:
+            raise SystemExit(f"Mismatch on cell {cell['title']!r}:\n  legacy:   {legacy}\n  compiled: {compiled}")
+
+    def run_legacy():
+        for cell in cells:
+            legacy_parse_cell(cell['text'], cell['title'], DATE_STR)
+
+    def run_compiled():
+        for cell in cells:
+            classifier.parse_cell(cell['text'], cell['title'], YEAR, MONTH, DAY)
+
+    total_cells = len(cells) * args.rounds
+    for name, func in (('legacy', run_legacy), ('compiled', run_compiled)):
+        seconds = min(timeit.repeat(func, number=args.rounds, repeat=3))
+        print(f"{name:<9} {seconds * 1e6 / total_cells:8.2f} µs/cell  ({total_cells} cells in {seconds:.3f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Page load benchmark: compares the full and the lean Chrome profiles.
+
+Logs in to PASS once per profile, then loads each target page several times and
+reports the wall time of driver.get() and the bytes downloaded (summed from the
+CDP Network.loadingFinished events of every frame, iframes included).
+
+Usage:
+    python tools/bench_page_load.py --pass-id 12345 [--repeat 3] [--url URL ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from config import Config
+from scraper import TransatPassScraper
+from driver_factory import build_chrome_options, apply_lean_network_blocking
+
+DEFAULT_URL = "https://pass.imt-atlantique.fr/OpDotNet/Noyau/Default.aspx?"
+PROFILE_URL = "https://pass.imt-atlantique.fr/OpDotNet/eplug/Annuaire/Navigation/Dossier/Dossier.aspx?IdObjet={pass_id}&IdTypeObjet=25&IdAnn=&IdProfil=&AccesPerso=false&Wizard="
+
+def _launch(lean, headless):
+    """Launch a driver with performance logging so network events can be read back."""
+    options = build_chrome_options(headless, lean)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    driver = webdriver.Chrome(options=options)
+    if lean:
+        apply_lean_network_blocking(driver)
+    return driver
+
+def _downloaded_bytes(driver):
+    """Sum the encoded bytes of every request finished since the last call."""
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message.get("method") == "Network.loadingFinished":
+            total += message["params"].get("encodedDataLength", 0)
+    return total
+
+def bench_profile(lean, urls, repeat, headless):
+    """Log in with the given profile and measure every URL `repeat` times."""
+    driver = _launch(lean, headless)
+    scraper = TransatPassScraper(timeout=Config.TIMEOUT, driver=driver)
+    try:
+        if not (scraper.step1_select_auth_mode()
+                and scraper.step2_login(Config.PASS_USERNAME, Config.PASS_PASSWORD)
+                and scraper.step2b_handle_saml_post_sso()):
+            raise RuntimeError("Login to PASS failed, cannot benchmark authenticated pages.")
+
+        measurements = {}
+        for url in urls:
+            timings, sizes = [], []
+            for _ in range(repeat):
+                _downloaded_bytes(driver)  # Drain events from previous loads.
+                start = time.perf_counter()
+                driver.get(url)
+                timings.append(time.perf_counter() - start)
+                sizes.append(_downloaded_bytes(driver))
+            measurements[url] = {
+                'median_seconds': statistics.median(timings),
+                'median_bytes': statistics.median(sizes),
+            }
+        return measurements
+    finally:
+        scraper.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs lean Chrome page loads against PASS.")
+    parser.add_argument('--pass-id', type=int, help="PASS object id of a profile page (Dossier.aspx) to load")
+    parser.add_argument('--url', action='append', default=[], help="Additional URL to load (repeatable)")
+    parser.add_argument('--repeat', type=int, default=3, help="Loads per URL and profile")
+    args = parser.parse_args()
+    Config.require_pass_credentials()
+
+    urls = [DEFAULT_URL] + args.url
+    if args.pass_id:
+        urls.append(PROFILE_URL.format(pass_id=args.pass_id))
+
+    results = {
+        'full': bench_profile(False, urls, args.repeat, Config.HEADLESS),
+        'lean': bench_profile(True, urls, args.repeat, Config.HEADLESS),
+    }
+
+    print(f"{'profile':<6} {'seconds':>9} {'KiB':>10}  url")
+    for profile, measurements in results.items():
+        for url, m in measurements.items():
+            print(f"{profile:<6} {m['median_seconds']:>9.3f} {m['median_bytes'] / 1024:>10.1f}  {url}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of JSON encoding (serialization.py): results files and step 8 request bodies.
+
+Builds a synthetic cohort with datetime course times (as after step 7), then times:
+- results files: the former json.dump(indent=2) with a datetime hook, against serialization.dump_file,
+  compact and pretty, with each available backend, in the full and the course-table formats;
+- request bodies: the former payload copy with isoformat() per field, encoded by requests (json=),
+  against step 8's payload encoded by serialization.dumps.
+Every output is checked to decode to the same document.
+
+Usage:
+    python tools/bench_serialization.py [--users 600] [--groups 12] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from requests.models import complexjson
+
+from course_store import compact_results
+from serialization import dump_file, dumps, orjson
+from steps.step8_submit_to_api import _course_payload
+from course_store_check import synthetic_results
+
+def with_datetimes(results):
+    """Course times as datetimes, as after step 7 (group courses are shared between users: converted once)."""
+    for entry in results['all_plannings'].values():
+        for course in entry['planning']:
+            for field in ('start_time', 'end_time'):
+                if isinstance(course[field], str):
+                    course[field] = datetime.fromisoformat(course[field])
+    return results
+
+def former_serializer(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+def former_save(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=former_serializer)
+
+def former_body(course, user_email):
+    payload = course.copy()
+    payload["user_email"] = user_email
+    if isinstance(payload.get('start_time'), datetime):
+        payload['start_time'] = payload['start_time'].isoformat()
+    if isinstance(payload.get('end_time'), datetime):
+        payload['end_time'] = payload['end_time'].isoformat()
+    # What requests does with json=.
+    return complexjson.dumps(payload, allow_nan=False).encode('utf-8')
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of results file and request body encoding.")
+    parser.add_argument('--users', type=int, default=600, help="Users of the synthetic cohort")
+    parser.add_argument('--groups', type=int, default=12, help="Groups of the synthetic cohort")
+    parser.add_argument('--repeat', type=int, default=3, help="Timings are the best of this many")
+    args = parser.parse_args()
+
+    results = with_datetimes(synthetic_results(args.users, args.groups))
+    backends = ['json'] + (['orjson'] if orjson is not None else [])
+    if orjson is None:
+        print("orjson is not installed: only the json module backend is timed.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.json')
+        for label, data in (('full', results), ('course table', compact_results(results))):
+            former_save(data, path)
+            with open(path, 'rb') as f:
+                expected = json.load(f)
+            size = os.path.getsize(path)
+            former = best_of(args.repeat, lambda: former_save(data, path))
+            print(f"\nResults file, {label} format ({len(results['all_plannings'])} users):")
+            print(f"  {'json.dump indent=2 (former)':32} {former * 1000:8.0f} ms {size / 1e6:7.1f} MB")
+            for backend in backends:
+                for pretty in (False, True):
+                    seconds = best_of(args.repeat, lambda: dump_file(data, path, pretty=pretty, backend=backend))
+                    with open(path, 'rb') as f:
+                        assert json.load(f) == expected, f"{backend} output differs"
+                    name = f"{backend} {'pretty' if pretty else 'compact'}"
+                    print(f"  {name:32} {seconds * 1000:8.0f} ms {os.path.getsize(path) / 1e6:7.1f} MB "
+                          f"({former / seconds:.1f}x)")
+
+    pairs = [(course, entry['email']) for entry in results['all_plannings'].values() for course in entry['planning']]
+    for (course, email), body in zip(pairs[:200], (dumps(_course_payload(c, e)) for c, e in pairs[:200])):
+        assert json.loads(body) == json.loads(former_body(course, email)), "Request bodies differ"
+    former = best_of(args.repeat, lambda: [former_body(c, e) for c, e in pairs])
+    print(f"\nRequest bodies ({len(pairs)} courses):")
+    print(f"  {'copy + isoformat + requests json=':36} {former * 1e6 / len(pairs):6.1f} us/course")
+    for backend in backends:
+        seconds = best_of(args.repeat, lambda: [dumps(_course_payload(c, e), backend=backend) for c, e in pairs])
+        print(f"  {'step 8 payload, ' + backend:36} {seconds * 1e6 / len(pairs):6.1f} us/course ({former / seconds:.1f}x)")
+
+if __name__ == "__main__":
+    main()
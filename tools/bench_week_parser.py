@@ -0,0 +1,94 @@
+"""
+Benchmark of step 6 week parsing: HTML snapshot parsing, inline or overlapped in worker processes.
+
+Builds synthetic agenda weeks in the markup of the PASS 'frm1' iframe from the cell texts of
+tools/fixtures/cell_texts.json, checks that parsing the HTML snapshot gives the same courses as
+parsing what WebDriver reads, then times one user (9 weeks) with a simulated navigation delay:
+parsing each week before navigating to the next, versus handing it to a process pool.
+
+Usage:
+    python tools/bench_week_parser.py [--weeks 9] [--navigation 0.3] [--workers 2]
+"""
+import argparse
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.week_parser import parse_week_html, parse_recorded_week
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'cell_texts.json')
+DAYS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi']
+
+def build_week(cells, rows=24):
+    """Synthetic agenda week (January 2025, days 6 to 10) and the raw week WebDriver would read from it."""
+    header = "Agenda de l'étudiant Janvier 2025"
+    day_headers = [f"{day} {6 + i}" for i, day in enumerate(DAYS)]
+    parts = ['<html><body><div id="DivVis"><table><tbody><tr><td></td><td></td><td><a href="#">&gt;</a></td></tr></tbody></table></div>',
+             f'<table><tr><td class="AuthentificationMenu">{html.escape(header)}</td></tr></table>',
+             '<table><tr class="fondTresClair"><td>&nbsp;</td>' + ''.join(f'<td>{d}</td>' for d in day_headers) + '</tr>']
+    raw_cells = []
+    for row in range(rows):
+        parts.append(f'<tr><td bgcolor="#DDDDDD">{8 + row // 2}h</td>')
+        for j in range(len(DAYS)):
+            cell = cells[(row * len(DAYS) + j) % len(cells)]
+            if (row + j) % 3:
+                parts.append('<td bgcolor="#EDEDED">&nbsp;</td>')
+                continue
+            lines = cell['text'].split('\n')
+            body = '<br>'.join(html.escape(line) for line in lines[1:])
+            parts.append(f'<td bgcolor="#FFCC99"><font size="1"><b>{html.escape(lines[0])}</b><br>{body}</font></td>')
+            raw_cells.append((j, cell['title'], cell['text']))
+        parts.append('</tr>')
+    parts.append('</table></body></html>')
+    return ''.join(parts), {'header': header, 'day_headers': day_headers, 'cells': raw_cells}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of HTML week parsing and its overlap with navigation.")
+    parser.add_argument('--weeks', type=int, default=9)
+    parser.add_argument('--navigation', type=float, default=0.3, help="Simulated navigation time per week (seconds)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=24, help="Agenda rows per week")
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    week_html, raw_week = build_week(cells, args.rows)
+
+    from_html, from_webdriver = parse_week_html(week_html), parse_recorded_week(raw_week)
+    if from_html != from_webdriver:
+        raise SystemExit("HTML snapshot parsing differs from parsing the cells read through WebDriver.")
+
+    repeat = 50
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse_week_html(week_html)
+    parse_seconds = (time.perf_counter() - started) / repeat
+    print(f"{len(from_html)} courses per week, parsed from HTML in {parse_seconds * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    for _ in range(args.weeks):
+        time.sleep(args.navigation)
+        parse_week_html(week_html)
+    serial = time.perf_counter() - started
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pool.submit(parse_week_html, week_html).result()  # Start the workers outside of the timing.
+        started = time.perf_counter()
+        futures = []
+        for _ in range(args.weeks):
+            time.sleep(args.navigation)
+            futures.append(pool.submit(parse_week_html, week_html))
+        for future in futures:
+            future.result()
+        overlapped = time.perf_counter() - started
+
+    print(f"{args.weeks} weeks with {args.navigation * 1000:.0f} ms navigation each: "
+          f"parse then navigate {serial:.2f}s, parse in {args.workers} workers {overlapped:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Size and memory of a run's plannings with and without the shared course table (course_store.py).
+
+Writes the results file in both formats, checks that the course-table format expands back to the
+same plannings (also through the streaming reader of the replay mode), and compares file sizes
+and the memory held by the plannings.
+
+Usage:
+    python tools/course_store_check.py data/scraper_results_<timestamp>.json
+    python tools/course_store_check.py --synthetic 600 --groups 12
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_store import CourseStore, compact_results, expand_results
+from replay import iter_plannings
+
+def synthetic_results(users, groups, own_courses=5):
+    """A cohort of users in groups sharing their courses, plus a few courses of their own."""
+    rng = random.Random(0)
+    monday = datetime(2025, 1, 6)
+
+    def course(day, hour, title, group):
+        start = monday + timedelta(days=day, hours=hour)
+        return {'date': start.strftime('%Y-%m-%d'), 'title': title, 'start_time': start.isoformat(),
+                'end_time': (start + timedelta(minutes=90)).isoformat(), 'teacher': f"TEACHER {rng.randint(1, 40)}",
+                'room': f"B0{rng.randint(1, 5)}-{rng.randint(100, 130)}", 'group': group}
+
+    group_courses = {g: [course(d, h, f"UE {g}-{d}-{h}", f"G{g}") for d in range(0, 60, 1) if d % 7 < 5 for h in (8, 10, 14)]
+                     for g in range(groups)}
+    all_plannings = {}
+    for user_id in range(1, users + 1):
+        own = [course(rng.randrange(60), 16, f"Option {user_id}-{i}", f"O{user_id}") for i in range(own_courses)]
+        all_plannings[str(user_id)] = {'url': '', 'email': f"user{user_id}@imt-atlantique.net", 'scraped_at': monday.isoformat(),
+                                       'planning': group_courses[user_id % groups] + own, 'incomplete_weeks': []}
+    return {'processed': users, 'success': users, 'failed': 0, 'failures': [], 'all_plannings': all_plannings}
+
+def planning_memory(results, intern):
+    """Bytes allocated by loading the plannings (each user's own copies, or interned in a CourseStore)."""
+    text = json.dumps(results['all_plannings'])
+    tracemalloc.start()
+    all_plannings = json.loads(text)
+    if intern:
+        store = CourseStore()
+        for entry in all_plannings.values():
+            entry['planning'] = store.intern(entry['planning'])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description="Check of the shared course table on a results file.")
+    parser.add_argument('results_file', nargs='?', help="scraper_results_*.json (default: synthetic cohort)")
+    parser.add_argument('--synthetic', type=int, default=600, help="Users of the synthetic cohort")
+    parser.add_argument('--groups', type=int, default=12, help="Groups of the synthetic cohort")
+    args = parser.parse_args()
+
+    if args.results_file:
+        with open(args.results_file, 'r', encoding='utf-8') as f:
+            results = expand_results(json.load(f))
+    else:
+        results = synthetic_results(args.synthetic, args.groups)
+
+    compact = compact_results(results)
+    assert expand_results(compact)['all_plannings'] == results['all_plannings'], "Expanded plannings differ"
+    with tempfile.TemporaryDirectory() as tmp:
+        sizes = {}
+        for name, data in (('full', results), ('course table', compact)):
+            path = os.path.join(tmp, f"{name}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            sizes[name] = os.path.getsize(path)
+        streamed = dict(iter_plannings(os.path.join(tmp, 'course table.json'), chunk_size=1 << 16))
+        assert streamed == {str(k): v for k, v in results['all_plannings'].items()}, "Streamed plannings differ"
+
+    references = sum(len(entry.get('planning') or []) for entry in results['all_plannings'].values())
+    print(f"{len(results['all_plannings'])} users, {references} course references, {len(compact['courses'])} distinct courses")
+    print(f"Results file: {sizes['full'] / 1e6:.1f} MB full, {sizes['course table'] / 1e6:.1f} MB with the course table "
+          f"({1 - sizes['course table'] / sizes['full']:.0%} smaller)")
+    full_memory, interned_memory = planning_memory(results, False), planning_memory(results, True)
+    print(f"Plannings in memory: {full_memory / 1e6:.1f} MB as copies, {interned_memory / 1e6:.1f} MB interned")
+
+if __name__ == "__main__":
+    main()
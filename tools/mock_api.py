@@ -0,0 +1,199 @@
+"""
+Local mock of the Transat API, for checking the scraper's API traffic without the real server.
+
+Serves the endpoints used by ApiClient: login, the paged user list (with ETags and
+304 Not Modified answers; ignore_page makes it answer every page with the first), course creation (409 Conflict on a repeated Idempotency-Key), the
+shared-course endpoints (courses by content key, user plannings as references) and pass_id caching. Every request is recorded; fail_courses makes the next course posts fail with 503.
+
+Usage:
+    python tools/mock_api.py [--port 3000] [--users 500] [--latency 0.05]
+
+or in-process:
+    api = MockApi(users=make_users(500)).start()
+    ... ApiClient(base_api_url=api.url) ...
+    api.stop()
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TOKEN = 'mock-token'
+
+def make_users(count, start=1):
+    """Synthetic users shaped like the API's."""
+    return [{'id': i, 'first_name': f"First{i}", 'last_name': f"Last{i}",
+             'email': f"first{i}.last{i}@imt-atlantique.net", 'pass_id': None}
+            for i in range(start, start + count)]
+
+class MockApi:
+    def __init__(self, users=None, latency=0.0, port=0):
+        """
+        Args:
+            users (list): The user list served by GET /api/planning/users
+            latency (float): Delay (seconds) added to every response
+            port (int): Port to listen on, 0 picks a free one
+        """
+        self.users = users if users is not None else make_users(100)
+        self.latency = latency
+        self.requests = []
+        self.courses = []
+        self.fail_courses = 0
+        # Answer every page of the user list with the first one, like an API without paging support.
+        self.ignore_page = False
+        self.shared_courses = {}
+        self.course_refs = {}
+        self._idempotency_keys = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method=None, path_prefix='', status=None) -> int:
+        """Number of recorded requests matching a method, a path prefix and a status."""
+        with self._lock:
+            return sum(1 for m, p, s in self.requests
+                       if (method is None or m == method) and p.startswith(path_prefix) and (status is None or s == status))
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload=None, headers=None):
+                body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                if payload is not None:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with api._lock:
+                    api.requests.append((self.command, urlparse(self.path).path, status))
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'null')
+
+            def _authorized(self):
+                if self.headers.get('Authorization') != f"Bearer {TOKEN}":
+                    self._reply(401, {'error': 'Unauthorized'})
+                    return False
+                return True
+
+            def do_GET(self):
+                time.sleep(api.latency)
+                url = urlparse(self.path)
+                if url.path != '/api/planning/users':
+                    return self._reply(404, {'error': 'Not found'})
+                if not self._authorized():
+                    return
+                query = parse_qs(url.query)
+                users = api.users
+                if 'limit' in query:
+                    limit = int(query['limit'][0])
+                    page = 1 if api.ignore_page else int(query.get('page', ['1'])[0])
+                    users = users[(page - 1) * limit:page * limit]
+                body = json.dumps(users)
+                etag = f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    return self._reply(304, headers={'ETag': etag})
+                self._reply(200, users, headers={'ETag': etag})
+
+            def do_POST(self):
+                time.sleep(api.latency)
+                path = urlparse(self.path).path
+                if path == '/api/auth/login':
+                    return self._reply(200, {'token': TOKEN})
+                if path == '/api/planning/courses':
+                    if not self._authorized():
+                        return
+                    course = self._read_json()
+                    key = self.headers.get('Idempotency-Key')
+                    with api._lock:
+                        if api.fail_courses > 0:
+                            api.fail_courses -= 1
+                            status = 503
+                        elif key and key in api._idempotency_keys:
+                            status = 409
+                        else:
+                            status = 201
+                            api.courses.append(course)
+                            if key:
+                                api._idempotency_keys.add(key)
+                    if status != 201:
+                        return self._reply(status, {'error': 'Unavailable' if status == 503 else 'Duplicate course'})
+                    return self._reply(201, {'id': len(api.courses), **course})
+                self._reply(404, {'error': 'Not found'})
+
+            def do_PUT(self):
+                time.sleep(api.latency)
+                parts = urlparse(self.path).path.strip('/').split('/')
+                if not self._authorized():
+                    return
+                if parts[:3] == ['api', 'planning', 'courses'] and len(parts) == 4:
+                    with api._lock:
+                        api.shared_courses[parts[3]] = self._read_json()
+                    return self._reply(200, {'key': parts[3]})
+                if parts == ['api', 'planning', 'users', 'courses']:
+                    body = self._read_json()
+                    with api._lock:
+                        unknown = [key for key in body['course_keys'] if key not in api.shared_courses]
+                        if not unknown:
+                            api.course_refs[body['user_email']] = body['course_keys']
+                    if unknown:
+                        return self._reply(422, {'error': f"Unknown courses: {unknown[:5]}"})
+                    return self._reply(200, {'courses': len(body['course_keys'])})
+                self._reply(404, {'error': 'Not found'})
+
+            def do_PATCH(self):
+                time.sleep(api.latency)
+                parts = urlparse(self.path).path.strip('/').split('/')
+                if parts[:3] != ['api', 'planning', 'users'] or parts[-1] != 'passid':
+                    return self._reply(404, {'error': 'Not found'})
+                if not self._authorized():
+                    return
+                pass_id = self._read_json().get('pass_id')
+                for user in api.users:
+                    if str(user['id']) == parts[3]:
+                        user['pass_id'] = pass_id
+                        return self._reply(200, user)
+                self._reply(404, {'error': 'Unknown user'})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Transat API.")
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay added to every response (seconds)")
+    args = parser.parse_args()
+
+    api = MockApi(users=make_users(args.users), latency=args.latency, port=args.port)
+    print(f"Mock API serving {args.users} users at {api.url}")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Local stand-in for PASS and its CAS login, for running the real scraper (Chrome included)
+against pages shaped like the ones it scrapes, without touching the school's servers.
+
+Serves, on two ports (PASS and CAS, as the scraper tells them apart by URL):
+- the login flow: Login.aspx and its remote authentication button, the CAS form (id fm1,
+  #username, #password, #msg), service tickets and the PASS session cookie;
+- Default.aspx with its 4 frames (the 4th named "content");
+- the directory (Annuaire): MANavigationBase holding MARecherche (#txtRecherche, #btnRecherche)
+  and MAContenu, where search results are rows with ouvrirDossierObjet() links and mailto cells;
+- profiles (Dossier.aspx) with their 'Agenda' tab opening the frm1 iframe, and agenda weeks
+  navigated with NavDat(), in the markup of tools/bench_week_parser.py.
+
+Users are those of tools/mock_api.make_users (First<i> Last<i>), with pass_id 100000 + i.
+Every user of a group (i % groups) has the same courses, so the shared-course store sees the
+cohort's sharing. session_requests expires a PASS session after that many pages, so the
+scraper's re-login (and the account pool's failover) runs too.
+
+Usage:
+    python tools/mock_pass.py [--port 8080] [--cas-port 8081] [--latency 0.05]
+
+or in-process:
+    mock = MockPass().start()
+    ... Config.PASS_BASE_URL = mock.url; Config.CAS_BASE_URL = mock.cas_url ...
+    mock.stop()
+"""
+import argparse
+import html
+import json
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+
+from bench_week_parser import DAYS, FIXTURE
+
+PASS_ID_OFFSET = 100000
+SESSION_COOKIE = 'ASP.NET_SessionId'
+CAS_COOKIE = 'CASTGC'
+MONTHS = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin', 'Juillet', 'Août',
+          'Septembre', 'Octobre', 'Novembre', 'Décembre']
+
+def pass_id_of(user_id) -> int:
+    return PASS_ID_OFFSET + int(user_id)
+
+def build_agenda_week(pass_id: int, monday: date, cells: list, group: int, rows: int = 24) -> str:
+    """The frm1 document of one agenda week: navigation arrow, header, days and course cells."""
+    header = f"Agenda de l'étudiant {MONTHS[monday.month - 1]} {monday.year}"
+    day_headers = [f"{day} {(monday + timedelta(days=i)).day}" for i, day in enumerate(DAYS)]
+    parts = ['<html><head><script>',
+             f"function NavDat(d) {{ window.location.href = 'Agenda.aspx?IdObjet={pass_id}&date=' + d; }}",
+             '</script></head><body><div id="DivVis"><table><tbody><tr>',
+             f'<td><a href="#" onclick="NavDat(\'{(monday - timedelta(weeks=1)):%Y%m%d}\');return false;">&lt;</a></td><td></td>',
+             f'<td><a href="#" onclick="NavDat(\'{(monday + timedelta(weeks=1)):%Y%m%d}\');return false;">&gt;</a></td>',
+             '</tr></tbody></table></div>',
+             f'<table><tr><td class="AuthentificationMenu">{html.escape(header)}</td></tr></table>',
+             '<table><tr class="fondTresClair"><td>&nbsp;</td>' + ''.join(f'<td>{d}</td>' for d in day_headers) + '</tr>']
+    for row in range(rows):
+        parts.append(f'<tr><td bgcolor="#DDDDDD">{8 + row // 2}h</td>')
+        for j in range(len(DAYS)):
+            if (row + j + group) % 3:
+                parts.append('<td bgcolor="#EDEDED">&nbsp;</td>')
+                continue
+            lines = cells[(row * len(DAYS) + j + group) % len(cells)]['text'].split('\n')
+            body = '<br>'.join(html.escape(line) for line in lines[1:])
+            parts.append(f'<td bgcolor="#FFCC99"><font size="1"><b>{html.escape(lines[0])}</b><br>{body}</font></td>')
+        parts.append('</tr>')
+    parts.append('</table></body></html>')
+    return ''.join(parts)
+
+class MockPass:
+    def __init__(self, users=None, groups=12, latency=0.0, session_requests=0, port=0, cas_port=0):
+        """
+        Args:
+            users (list): Users findable in the directory (as served by MockApi)
+            groups (int): Groups sharing the same agenda
+            latency (float): Delay (seconds) added to every PASS page
+            session_requests (int): Pages after which a PASS session expires, 0 for never
+            port (int): PASS port, 0 picks a free one
+            cas_port (int): CAS port, 0 picks a free one
+        """
+        from mock_api import make_users
+        self.users = users if users is not None else make_users(100)
+        self.groups = groups
+        self.latency = latency
+        self.session_requests = session_requests
+        with open(FIXTURE, 'r', encoding='utf-8') as f:
+            self.cells = json.load(f)['cells']
+        self.sessions = {}
+        self.tickets = set()
+        self.cas_sessions = set()
+        self.logins = 0
+        self.expired_sessions = 0
+        self.pages = 0
+        self._weeks = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._pass_handler())
+        self._cas_server = ThreadingHTTPServer(('127.0.0.1', cas_port), self._cas_handler())
+        self._threads = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def cas_url(self):
+        return f"http://127.0.0.1:{self._cas_server.server_address[1]}"
+
+    def start(self):
+        for server in (self._server, self._cas_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in (self._server, self._cas_server):
+            server.shutdown()
+            server.server_close()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {'pages': self.pages, 'logins': self.logins, 'expired_sessions': self.expired_sessions}
+
+    def search(self, query: str) -> list:
+        words = query.lower().split()
+        return [user for user in self.users
+                if words and all(word in f"{user['first_name']} {user['last_name']}".lower().split() for word in words)]
+
+    def week(self, pass_id: int, monday: date) -> str:
+        """Agenda weeks are built once per (group, week): users of a group share their courses."""
+        group = (pass_id - PASS_ID_OFFSET) % self.groups
+        key = (group, monday)
+        with self._lock:
+            page = self._weeks.get(key)
+        if page is None:
+            page = build_agenda_week(0, monday, self.cells, group)
+            with self._lock:
+                self._weeks[key] = page
+        return page.replace("IdObjet=0&", f"IdObjet={pass_id}&", 1)
+
+    def _pass_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body='', headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _redirect(self, location, headers=None):
+                self._reply(302, headers={'Location': location, **(headers or {})})
+
+            def _session(self):
+                """The request's PASS session id if it is still valid (counted as one page)."""
+                cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                session = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+                with mock._lock:
+                    mock.pages += 1
+                    if session not in mock.sessions:
+                        return None
+                    mock.sessions[session] += 1
+                    if mock.session_requests and mock.sessions[session] > mock.session_requests:
+                        del mock.sessions[session]
+                        mock.expired_sessions += 1
+                        return None
+                return session
+
+            def do_GET(self):
+                time.sleep(mock.latency)
+                url = urlparse(self.path)
+                query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                page = url.path.rsplit('/', 1)[-1]
+                service = f"{mock.url}/OpDotNet/Noyau/Default.aspx?"
+
+                if page == 'Login.aspx':
+                    login = f"{mock.cas_url}/cas/login?service={quote(service, safe='')}"
+                    return self._reply(200, '<html><body><div id="remoteAuth">'
+                                            f'<button onclick="window.location.href=\'{login}\'">Connexion</button>'
+                                            '</div></body></html>')
+                if page == 'Default.aspx' and 'ticket' in query:
+                    with mock._lock:
+                        valid = query['ticket'] in mock.tickets
+                        mock.tickets.discard(query['ticket'])
+                        session = secrets.token_hex(12)
+                        if valid:
+                            mock.sessions[session] = 0
+                            mock.logins += 1
+                    if not valid:
+                        return self._redirect('/OpDotNet/Noyau/Login.aspx?')
+                    return self._redirect('/OpDotNet/Noyau/Default.aspx?',
+                                          {'Set-Cookie': f"{SESSION_COOKIE}={session}; Path=/; HttpOnly"})
+                if self._session() is None:
+                    return self._redirect('/OpDotNet/Noyau/Login.aspx?')
+
+                if page == 'Default.aspx':
+                    frames = ''.join(f'<iframe name="{name}" src="/OpDotNet/Noyau/Vide.aspx"></iframe>'
+                                     for name in ('bandeau', 'menu', 'onglets', 'content'))
+                    return self._reply(200, f'<html><body>{frames}</body></html>')
+                if page == 'Accueil.aspx':
+                    return self._reply(200, '<html><body><iframe name="MANavigationBase" '
+                                            'src="/OpDotNet/Eplug/Annuaire/Navigation.aspx"></iframe></body></html>')
+                if page == 'Navigation.aspx':
+                    return self._reply(200, '<html><body>'
+                                            '<iframe name="MARecherche" src="/OpDotNet/Eplug/Annuaire/Recherche.aspx"></iframe>'
+                                            '<iframe name="MAContenu" src="/OpDotNet/Noyau/Vide.aspx"></iframe>'
+                                            '</body></html>')
+                if page == 'Recherche.aspx':
+                    return self._reply(200, '<html><body><form action="/OpDotNet/Eplug/Annuaire/Resultats.aspx" '
+                                            'method="get" target="MAContenu"><input id="txtRecherche" name="q" type="text">'
+                                            '<input id="btnRecherche" type="submit" value="Rechercher"></form></body></html>')
+                if page == 'Resultats.aspx':
+                    rows = ''.join(
+                        f'<tr><td><a href="#" onclick="ouvrirDossierObjet({pass_id_of(user["id"])}, 25);return false;">'
+                        f'{html.escape(user["last_name"].upper())} {html.escape(user["first_name"])}</a></td>'
+                        f'<td><a href="mailto:{user["email"]}">{user["email"]}</a></td></tr>'
+                        for user in mock.search(query.get('q', '')))
+                    return self._reply(200, f'<html><body><table>{rows}</table></body></html>')
+                if page == 'Dossier.aspx':
+                    agenda = f"/OpDotNet/Eplug/Agenda/Agenda.aspx?IdObjet={int(query.get('IdObjet', 0))}"
+                    return self._reply(200, '<html><head><script>function ComponentArt_TabStrip_TabClick(tab) {'
+                                            "document.getElementById('onglet').innerHTML = "
+                                            f"'<iframe id=\"frm1\" src=\"{agenda}\" width=\"1000\" height=\"2000\"></iframe>';"
+                                            '}</script></head><body>'
+                                            '<table onclick="ComponentArt_TabStrip_TabClick(this)"><tr><td><nobr>Agenda</nobr></td></tr></table>'
+                                            '<div id="onglet"></div></body></html>')
+                if page == 'Agenda.aspx':
+                    if 'date' in query:
+                        day = datetime.strptime(query['date'], '%Y%m%d').date()
+                    else:
+                        day = date.today()
+                    monday = day - timedelta(days=day.weekday())
+                    return self._reply(200, mock.week(int(query.get('IdObjet', 0)), monday))
+                self._reply(200, '<html><body></body></html>')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _cas_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body='', headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _service_redirect(self, service, headers=None):
+                ticket = f"ST-{secrets.token_hex(8)}"
+                with mock._lock:
+                    mock.tickets.add(ticket)
+                location = f"{service}{'' if service.endswith(('?', '&')) else '&' if '?' in service else '?'}ticket={ticket}"
+                self._reply(302, headers={'Location': location, **(headers or {})})
+
+            def _form(self, service, message=''):
+                action = f"/cas/login?service={quote(service, safe='')}"
+                display = '' if message else ' style="display:none"'
+                self._reply(200, f'<html><body><div id="msg"{display}>{html.escape(message)}</div>'
+                                 f'<form id="fm1" method="post" action="{action}">'
+                                 '<input id="username" name="username" type="text">'
+                                 '<input id="password" name="password" type="password">'
+                                 '<input type="submit" name="submit" value="Se connecter"></form></body></html>')
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                service = parse_qs(url.query).get('service', [f"{mock.url}/OpDotNet/Noyau/Default.aspx?"])[0]
+                cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                with mock._lock:
+                    signed_in = CAS_COOKIE in cookie and cookie[CAS_COOKIE].value in mock.cas_sessions
+                if signed_in:
+                    return self._service_redirect(service)
+                self._form(service)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                service = parse_qs(url.query).get('service', [f"{mock.url}/OpDotNet/Noyau/Default.aspx?"])[0]
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                if not form.get('username') or not form.get('password'):
+                    return self._form(service, "Identifiant ou mot de passe incorrect.")
+                tgc = f"TGT-{secrets.token_hex(8)}"
+                with mock._lock:
+                    mock.cas_sessions.add(tgc)
+                self._service_redirect(service, {'Set-Cookie': f"{CAS_COOKIE}={tgc}; Path=/cas; HttpOnly"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    from mock_api import make_users
+    parser = argparse.ArgumentParser(description="Local stand-in for PASS and its CAS login.")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--cas-port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--groups', type=int, default=12)
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay added to every PASS page (seconds)")
+    parser.add_argument('--session-requests', type=int, default=0, help="Pages after which a session expires (0: never)")
+    args = parser.parse_args()
+
+    mock = MockPass(users=make_users(args.users), groups=args.groups, latency=args.latency,
+                    session_requests=args.session_requests, port=args.port, cas_port=args.cas_port).start()
+    print(f"Mock PASS serving {args.users} users at {mock.url} (CAS at {mock.cas_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Query the room/teacher occupancy index written after each full run (OUTPUT_DIR/occupancy_index.json.gz).
+
+Usage:
+    python tools/occupancy_query.py room "B02-101 (Amphi Nord)" --at 2025-01-06T10:00
+    python tools/occupancy_query.py teacher "DUPONT Jean" --at 2025-01-06T10:00
+    python tools/occupancy_query.py free --at 2025-01-06T10:00 --until 2025-01-06T11:30
+    python tools/occupancy_query.py check data/scraper_results_<timestamp>.json
+
+The check command builds the index from a results file, compares random queries with a
+brute-force scan of the plannings (how these questions were answered before) and times both.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_store import expand_results
+from steps.step7b_occupancy_index import OccupancyIndex, step7b_build_occupancy_index
+
+def brute_force_in_room(all_plannings, room, moment):
+    found = set()
+    for entry in all_plannings.values():
+        for course in entry.get('planning') or []:
+            start, end = datetime.fromisoformat(course['start_time']), datetime.fromisoformat(course['end_time'])
+            if course.get('room') == room and start <= moment < end:
+                found.add((start, end, course.get('title') or '', course.get('group') or ''))
+    return sorted(found)
+
+def check(results_file, queries):
+    with open(results_file, 'r', encoding='utf-8') as f:
+        all_plannings = expand_results(json.load(f))['all_plannings']
+    index = step7b_build_occupancy_index(all_plannings)
+    courses = [c for entry in all_plannings.values() for c in entry.get('planning') or [] if c.get('room')]
+    if not courses:
+        raise SystemExit("No course with a room in the results file.")
+
+    samples = []
+    for course in random.Random(0).choices(courses, k=queries):
+        start = datetime.fromisoformat(course['start_time'])
+        samples.append((course['room'], start + timedelta(minutes=random.Random(start.minute).randint(0, 30))))
+
+    started = time.perf_counter()
+    brute = [brute_force_in_room(all_plannings, room, moment) for room, moment in samples]
+    brute_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    indexed = [index.in_room(room, moment) for room, moment in samples]
+    index_seconds = time.perf_counter() - started
+
+    for expected, got in zip(brute, indexed):
+        got = sorted((c['start_time'], c['end_time'], c['title'], c['group']) for c in got)
+        assert got == expected, f"Index answer {got} differs from brute force {expected}"
+    print(f"{queries} room queries match. Brute force: {brute_seconds / queries * 1e6:.0f} µs/query, "
+          f"index: {index_seconds / queries * 1e6:.1f} µs/query.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the room/teacher occupancy index.")
+    parser.add_argument('command', choices=['room', 'teacher', 'free', 'check'])
+    parser.add_argument('name', nargs='?', help="Room or teacher (room/teacher), results file (check)")
+    parser.add_argument('--index', default=os.path.join(os.getenv('OUTPUT_DIR', '/app/data'), 'occupancy_index.json.gz'))
+    parser.add_argument('--at', type=datetime.fromisoformat, help="Time of the query (YYYY-MM-DDTHH:MM)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="End of the slot (free)")
+    parser.add_argument('--queries', type=int, default=1000, help="Random queries to compare (check)")
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        check(args.name, args.queries)
+        return
+    index = OccupancyIndex.load(args.index)
+    if args.command == 'free':
+        for room in index.free_rooms(args.at, args.until or args.at + timedelta(minutes=1)):
+            print(room)
+        return
+    lookup = index.in_room if args.command == 'room' else index.teacher_at
+    for course in lookup(args.name, args.at):
+        print(f"{course['start_time']:%H:%M}-{course['end_time']:%H:%M}  {course['title']}  {course['group']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Check of the step 8 outbox against the local mock API (tools/mock_api.py).
+
+Queues synthetic courses, drains them, queues some of them again (the API keeps one copy), then
+makes the API fail for a while: the failed deliveries stay on disk and are delivered once it
+recovers, without duplicates. Two drainers on one outbox (sharded workers) never post the same
+course twice: each claims its own batches. Also times the delivery of the whole outbox with a simulated API latency.
+
+Usage:
+    python tools/outbox_check.py [--users 20] [--courses 30] [--latency 0.02] [--concurrency 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_client import ApiClient
+from outbox import Outbox, OutboxDrainer
+from mock_api import MockApi, make_users
+
+def make_courses(user, count):
+    return [{'date': '2025-01-06', 'title': f"Course {i}", 'start_time': f"2025-01-06T{8 + i % 10:02d}:00:00",
+             'end_time': f"2025-01-06T{9 + i % 10:02d}:00:00", 'teacher': 'DUPONT Jean', 'room': 'B02-101',
+             'group': f"G{i}", 'user_email': user['email']} for i in range(count)]
+
+def drain(outbox, client, concurrency, timeout=60):
+    drainer = OutboxDrainer(outbox, client, concurrency=concurrency, idle_interval=0.1).start()
+    drainer.stop(drain_timeout=timeout)
+    return drainer.summary()
+
+def main():
+    parser = argparse.ArgumentParser(description="Check of the outbox delivery against the mock API.")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--courses', type=int, default=30, help="Courses per user")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock API delay per response (seconds)")
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    users = make_users(args.users)
+    api = MockApi(users=users, latency=args.latency).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(os.path.join(tmp, 'outbox.sqlite'), retry_backoff=0.2)
+        client = ApiClient(base_api_url=api.url, users_cache_file=os.path.join(tmp, 'users_cache.json'))
+        client.authenticate('check@example.com', 'secret')
+        total = args.users * args.courses
+
+        queued = sum(outbox.enqueue(u['email'], make_courses(u, args.courses)) for u in users)
+        assert queued == total, f"{queued} courses queued, expected {total}"
+        started = time.perf_counter()
+        summary = drain(outbox, client, args.concurrency)
+        seconds = time.perf_counter() - started
+        assert summary['delivered'] == total and summary['pending'] == 0, summary
+        print(f"{total} courses delivered in {seconds:.2f}s ({total / seconds:.0f}/s, sequential posts would take "
+              f"about {total * args.latency:.1f}s)")
+
+        # Queuing a course twice while it is pending keeps one copy; a course delivered before
+        # (same Idempotency-Key) is answered 409 by the API and counted as delivered.
+        user = users[0]
+        assert outbox.enqueue(user['email'], make_courses(user, args.courses)) == args.courses
+        assert outbox.enqueue(user['email'], make_courses(user, args.courses)) == 0
+        summary = drain(outbox, client, args.concurrency)
+        assert summary['pending'] == 0 and len(api.courses) == total, summary
+
+        # The API fails for a while (503s); the failed courses are retried once it recovers.
+        extra = make_courses({'email': 'late@imt-atlantique.net'}, args.courses)
+        outbox.enqueue('late@imt-atlantique.net', extra)
+        api.fail_courses = args.courses // 2
+        summary = drain(outbox, client, args.concurrency)
+        assert summary['pending'] == 0 and summary['dead'] == 0, summary
+        assert len(api.courses) == total + len(extra), f"{len(api.courses)} courses stored by the API"
+        print(f"API outage: {summary['failed_attempts']} failed attempts retried, "
+              f"{len(api.courses)} courses stored, no duplicates.")
+
+        # Two drainers share the outbox: every course is claimed, hence posted, by one of them.
+        conflicts = api.count('POST', '/api/planning/courses', status=409)
+        shared = make_courses({'email': 'shared@imt-atlantique.net'}, args.courses * 4)
+        outbox.enqueue('shared@imt-atlantique.net', shared)
+        drainers = [OutboxDrainer(outbox, client, concurrency=args.concurrency, idle_interval=0.1).start()
+                    for _ in range(2)]
+        for drainer in drainers:
+            drainer.stop(drain_timeout=60)
+        delivered = [drainer.summary()['delivered'] for drainer in drainers]
+        assert sum(delivered) == len(shared), delivered
+        assert api.count('POST', '/api/planning/courses', status=409) == conflicts, "a course was posted twice"
+        # Recording the outcome of a row another drainer already delivered, or claimed since, is a no-op.
+        outbox.record([], [(10 ** 9, 'gone', True)], 'expired-drainer')
+        outbox.enqueue('claimed@imt-atlantique.net', make_courses({'email': 'claimed@imt-atlantique.net'}, 1))
+        [(row_id, _, _)] = outbox.claim(1, 'current-drainer')
+        outbox.record([], [(row_id, 'late failure', False)], 'expired-drainer')
+        assert outbox.stats()['sending'] == 1, outbox.stats()
+        outbox.record([row_id], [], 'current-drainer')
+        print(f"Two drainers: {delivered[0]} + {delivered[1]} courses delivered, none posted twice.")
+
+        # A course left dead by an earlier run is queued (and delivered) again by the next run.
+        dead = make_courses({'email': 'dead@imt-atlantique.net'}, 1)
+        outbox.enqueue('dead@imt-atlantique.net', dead)
+        [(row_id, _, _)] = outbox.claim(1, 'drainer')
+        outbox.record([], [(row_id, 'rejected', False)], 'drainer')
+        assert outbox.stats()['dead'] == 1, outbox.stats()
+        assert outbox.enqueue('dead@imt-atlantique.net', dead) == 1
+        assert outbox.enqueue('dead@imt-atlantique.net', dead) == 0
+        assert outbox.stats()['dead'] == 0 and outbox.stats()['pending'] == 1, outbox.stats()
+        print("Dead course queued again by the next run.")
+    api.stop()
+
+if __name__ == "__main__":
+    main()
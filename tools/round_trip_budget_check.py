@@ -0,0 +1,82 @@
+"""
+Check of the WebDriver round-trip budgets on the real steps (Chrome included), against the local
+stand-ins of PASS (tools/mock_pass.py) and the Transat API (tools/mock_api.py).
+
+Logs in to the mock PASS, then runs process_user (steps 3 to 8) for a few users inside
+webdriver_stats.round_trip_budget(..., strict=True): the first users have no cached pass_id (the
+directory search of steps 3 to 5 runs), the others do. A step sending more WebDriver commands than
+its budget raises RoundTripBudgetExceeded, and the script exits with status 1. The commands sent
+per step are printed for each user, to set the budgets from.
+
+Usage:
+    python tools/round_trip_budget_check.py [--users 4] [--budgets "step5=60,step6=400"] [--week-parser webdriver]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_scraper
+from api_client import ApiClient
+from config import Config
+from webdriver_stats import RoundTripBudgetExceeded, parse_budgets, round_trip_budget
+from mock_api import MockApi, make_users
+from mock_pass import MockPass, PASS_ID_OFFSET
+
+DEFAULT_BUDGETS = "step3=40,step4=40,step5=60,step6=400,step8=0"
+
+def main():
+    parser = argparse.ArgumentParser(description="WebDriver round-trip budgets of the steps, against the PASS and API mocks.")
+    parser.add_argument('--users', type=int, default=4, help="Users processed (half of them searched in the directory)")
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS, help="Commands allowed per user and step")
+    parser.add_argument('--week-parser', default=None, choices=['webdriver', 'html'], help="WEEK_PARSER (default: config)")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budgets)
+    users = make_users(args.users)
+    for user in users[args.users // 2:]:
+        user['pass_id'] = PASS_ID_OFFSET + user['id']
+    api = MockApi(users=users).start()
+    mock = MockPass(users=users).start()
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.BASE_API_URL = api.url
+        Config.PASS_BASE_URL = mock.url
+        Config.CAS_BASE_URL = mock.cas_url
+        Config.OUTPUT_DIR = tmp
+        Config.SESSION_DIR = ''
+        if args.week_parser:
+            Config.WEEK_PARSER = args.week_parser
+        driver_factory, scraper = run_scraper.create_scraper()
+        try:
+            error = scraper.ensure_logged_in('check', 'check-password')
+            if error:
+                raise SystemExit(f"Login to the mock PASS failed: {error}")
+            client = ApiClient(base_api_url=api.url, users_cache_file=os.path.join(tmp, 'users_cache.json'))
+            client.authenticate('check@example.com', 'secret')
+            for user in users:
+                snapshot = scraper.webdriver_stats.snapshot()
+                try:
+                    with round_trip_budget(scraper.webdriver_stats, budgets, strict=True):
+                        scraper.process_user(user, client)
+                    status = 'ok'
+                except RoundTripBudgetExceeded as e:
+                    failures += 1
+                    status = f"OVER BUDGET ({e})"
+                counts = scraper.webdriver_stats.counts_since(snapshot)
+                kind = 'cached pass_id' if user['pass_id'] else 'searched'
+                print(f"User #{user['id']} ({kind}): {status}; "
+                      + ", ".join(f"{step}={count}" for step, count in sorted(counts.items())))
+        finally:
+            scraper.close()
+            driver_factory.close()
+            api.stop()
+            mock.stop()
+    if failures:
+        raise SystemExit(f"{failures} user(s) over the round-trip budgets {budgets}.")
+    print(f"OK: {args.users} users within the round-trip budgets {budgets}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Check of the step 5 directory search matching (steps/step5_match_result.py), without a browser.
+
+Reads the results of a MAContenu snapshot (links opening records, mailto cells, unclosed cells of
+the old table markup), then ranks result lists: a match on the email wins over homonyms, a full
+name matches whatever the accents, case and word order, a partial match is reported as such,
+and results sharing the best score (homonyms without a matching email) or matching nothing give
+no match.
+
+Usage:
+    python tools/search_results_check.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.step5_match_result import (SCORE_EMAIL, SCORE_FULL_NAME, SCORE_PARTIAL, extract_search_results,
+                                      rank_search_results)
+
+SNAPSHOT = """
+<html><body><table>
+<tr><td><a href="#" onclick="ouvrirDossierObjet(101, 25);return false;">DUPONT Jean</a>
+    <td>Etudiant<td><a href="mailto:jean.dupont@imt-atlantique.net">jean.dupont@imt-atlantique.net</a>
+<tr><td><a href="#" onclick="ouvrirDossierObjet(102, 25);return false;">DUPONT Jean</a>
+    <td>Etudiant<td><a href="mailto:jean.dupont2@imt-atlantique.net">jean.dupont2@imt-atlantique.net</a>
+<tr><td><a href="#" onclick="ouvrirDossierObjet(103, 25);return false;">LE H&Eacute;NAFF-DUPONT Marie</a>
+    <td>Etudiant<td>
+</table></body></html>
+"""
+
+def check(label, ranking, pass_id, score, ambiguous=False):
+    match = ranking['match']
+    assert (match['pass_id'] if match else None) == pass_id, f"{label}: {ranking}"
+    assert ranking['score'] == score and ranking['ambiguous'] == ambiguous, f"{label}: {ranking}"
+    print(f"OK: {label}")
+
+def main():
+    candidates = extract_search_results(SNAPSHOT)
+    assert [c['pass_id'] for c in candidates] == [101, 102, 103], candidates
+    assert candidates[0]['email'] == 'jean.dupont@imt-atlantique.net' and candidates[2]['email'] is None, candidates
+    assert candidates[2]['name'] == 'LE HÉNAFF-DUPONT Marie', candidates
+    print("OK: snapshot read (3 results, emails of their rows)")
+
+    check("email match among homonyms",
+          rank_search_results(candidates, 'Jean', 'Dupont', 'Jean.Dupont2@imt-atlantique.net'), 102, SCORE_EMAIL)
+    check("full name match (accents, case and word order ignored)",
+          rank_search_results(candidates, 'Marie', 'Le Hénaff-Dupont', 'marie.lh@imt-atlantique.net'), 103, SCORE_FULL_NAME)
+    check("partial match (last name only)",
+          rank_search_results(candidates[2:], 'Maria', 'Le Henaff-Dupont'), 103, SCORE_PARTIAL)
+    check("homonyms without a matching email are ambiguous",
+          rank_search_results(candidates, 'Jean', 'Dupont', 'j.dupont@imt-atlantique.net'), None, SCORE_FULL_NAME,
+          ambiguous=True)
+    check("no result matching", rank_search_results(candidates, 'Paul', 'Martin'), None, 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Soak benchmark: a long run of the real scraper (run_full_scrape, Chrome included) against the
+local stand-ins of PASS (tools/mock_pass.py) and the Transat API (tools/mock_api.py), to catch
+what only shows after thousands of users: memory or file descriptors that keep growing, user
+latency or throughput that decays, output piling up on disk.
+
+Every --interval seconds, a sampler records: users done, resident memory of this process and
+of its Chrome processes (chromedriver and browsers), its other child processes (parse workers),
+open file descriptors, threads, and the size of OUTPUT_DIR, of ./data (debug HTML and
+screenshots) and of the log. Each user's time in process_user_supervised is recorded too.
+--rounds runs the whole user list again with the same scraper, as the refresh worker of
+health_server.py lives across runs.
+
+The checks fit each metric against users done, over the samples after --warmup of the users
+(browser start, caches filling), and compare:
+- growth per 1000 users of memory, fds and threads with the --max-* limits;
+- the median user latency of the last quarter of the users with the first (--max-latency-decay);
+- users per minute of the last quarter of the samples with the first (--min-throughput-ratio);
+- disk growth per user.
+The report (samples, latencies, checks) is written as JSON; the exit status is 1 if a check fails.
+A saved report can be checked again with other limits with --analyze.
+
+Runs in a temporary working directory (or --work-dir), which it leaves behind for inspection.
+
+Usage:
+    python tools/soak.py [--users 2000] [--groups 12] [--accounts 1] [--rounds 1] [--latency 0.02]
+                         [--interval 10] [--max-minutes 0] [--report soak_report.json]
+    python tools/soak.py --analyze soak_report.json [--warmup 0.2] [--max-rss-growth 50] ...
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(TOOLS_DIR))
+
+from browser_supervisor import _process_table, process_rss_bytes
+
+MB = 1024 * 1024
+# Metric of a sample -> (its scale for the report, its unit, the option limiting its growth per 1000 users).
+GROWTH_CHECKS = {
+    'rss_bytes': (MB, 'MB', 'max_rss_growth'),
+    'chrome_rss_bytes': (MB, 'MB', 'max_chrome_rss_growth'),
+    'fds': (1, 'fds', 'max_fd_growth'),
+    'threads': (1, 'threads', 'max_thread_growth'),
+}
+DISK_METRICS = ('output_bytes', 'data_bytes', 'log_bytes')
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+def _descendants(table: dict, root: int) -> list:
+    children = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    found, stack = [], [root]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+class Sampler:
+    def __init__(self, interval: float, paths: dict):
+        """
+        Samples this process and its children every interval seconds, in a background thread.
+
+        Args:
+            interval (float): Seconds between samples.
+            paths (dict): Name -> directory or file whose size is sampled as '<name>_bytes'.
+        """
+        self.interval = interval
+        self.paths = paths
+        self.samples = []
+        self.latencies = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def record_user(self, user_id, seconds: float, success: bool):
+        with self._lock:
+            self.latencies.append({'user': user_id, 'seconds': round(seconds, 3), 'success': success,
+                                   'at': round(time.monotonic() - self._started, 1)})
+
+    def sample(self) -> dict:
+        table = _process_table()
+        children = _descendants(table, os.getpid())
+        chrome = [pid for pid in children if any('chrome' in arg for arg in table[pid][1])]
+        others = [pid for pid in children if pid not in set(chrome)]
+        with self._lock:
+            users = len(self.latencies)
+        sample = {
+            'at': round(time.monotonic() - self._started, 1),
+            'users': users,
+            'rss_bytes': process_rss_bytes([os.getpid()]),
+            'chrome_rss_bytes': process_rss_bytes(chrome),
+            'chrome_processes': len(chrome),
+            'children_rss_bytes': process_rss_bytes(others),
+            'fds': len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None,
+            'threads': threading.active_count(),
+        }
+        for name, path in self.paths.items():
+            sample[f'{name}_bytes'] = _dir_bytes(path) if os.path.isdir(path) else (
+                os.path.getsize(path) if os.path.exists(path) else 0)
+        return sample
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(self.sample())
+
+    def start(self):
+        self._started = time.monotonic()
+        self.samples.append(self.sample())
+        self._thread = threading.Thread(target=self._run, name='soak-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.sample())
+
+def slope(xs: list, ys: list) -> float:
+    """Least-squares slope of ys against xs (0 when xs do not vary)."""
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+def analyze(samples: list, latencies: list, limits: dict) -> list:
+    """
+    Check the samples and latencies of a run against limits (see the --max-* options).
+
+    Returns:
+        list: {'check', 'value', 'limit', 'unit', 'ok'} per check; 'ok' is None when there is too little data.
+    """
+    total = samples[-1]['users'] if samples else 0
+    warm = [s for s in samples if s['users'] >= total * limits['warmup']]
+    checks = []
+    enough = len(warm) >= 3 and warm[-1]['users'] > warm[0]['users']
+
+    for metric, (scale, unit, option) in GROWTH_CHECKS.items():
+        points = [(s['users'], s[metric]) for s in warm if s.get(metric) is not None]
+        value = slope(*zip(*points)) * 1000 / scale if enough and len(points) >= 3 else None
+        checks.append({'check': f"{metric} growth per 1000 users", 'value': value, 'limit': limits[option],
+                       'unit': unit, 'ok': None if value is None else value <= limits[option]})
+
+    for metric in DISK_METRICS:
+        points = [(s['users'], s.get(metric, 0)) for s in warm]
+        value = slope(*zip(*points)) / 1024 if enough else None
+        limit = limits['max_disk_per_user'] if metric != 'log_bytes' else None
+        checks.append({'check': f"{metric} per user", 'value': value, 'limit': limit, 'unit': 'KB',
+                       'ok': None if value is None or limit is None else value <= limit})
+
+    # Latency: successful users after the warm-up, first quarter against last quarter.
+    timed = [l['seconds'] for l in latencies[int(len(latencies) * limits['warmup']):] if l['success']]
+    quarter = len(timed) // 4
+    value = statistics.median(timed[-quarter:]) / statistics.median(timed[:quarter]) if quarter >= 5 else None
+    checks.append({'check': "median user latency, last quarter / first", 'value': value,
+                   'limit': limits['max_latency_decay'], 'unit': 'x',
+                   'ok': None if value is None else value <= limits['max_latency_decay']})
+
+    # Throughput: users per minute over the first and last quarter of the samples after the warm-up.
+    value = None
+    if enough and len(warm) >= 8:
+        quarter = len(warm) // 4
+        rates = []
+        for window in (warm[:quarter + 1], warm[-quarter - 1:]):
+            seconds = window[-1]['at'] - window[0]['at']
+            rates.append((window[-1]['users'] - window[0]['users']) * 60 / seconds if seconds else 0.0)
+        value = rates[1] / rates[0] if rates[0] else None
+    checks.append({'check': "users per minute, last quarter / first", 'value': value,
+                   'limit': limits['min_throughput_ratio'], 'unit': 'x',
+                   'ok': None if value is None else value >= limits['min_throughput_ratio']})
+    return checks
+
+def print_report(report: dict):
+    samples, latencies = report['samples'], report['latencies']
+    if samples:
+        first, last = samples[0], samples[-1]
+        print(f"{last['users']} users in {last['at'] / 60:.1f} min, "
+              f"{sum(1 for l in latencies if not l['success'])} failed; "
+              f"RSS {first['rss_bytes'] / MB:.0f} -> {last['rss_bytes'] / MB:.0f} MB, "
+              f"Chrome {last['chrome_rss_bytes'] / MB:.0f} MB ({last['chrome_processes']} processes), "
+              f"fds {first['fds']} -> {last['fds']}, threads {first['threads']} -> {last['threads']}")
+    for check in report['checks']:
+        value = '-' if check['value'] is None else f"{check['value']:.2f}"
+        limit = '' if check['limit'] is None else f" (limit {check['limit']})"
+        status = 'info' if check['limit'] is None else {True: 'ok', False: 'FAIL', None: 'n/a'}[check['ok']]
+        print(f"  {status:4} {check['check']:45} {value:>10} {check['unit']}{limit}")
+
+def run_soak(args, work_dir: str) -> dict:
+    """Run the scraper against the mocks in work_dir; returns the samples and latencies."""
+    # Imported here so that --analyze runs without Selenium.
+    from mock_api import MockApi, make_users
+    from mock_pass import MockPass
+    from config import Config
+    import run_scraper
+    from logging_setup import setup_logging_from_config
+    from scraper import TransatPassScraper
+    from serialization import set_backend
+
+    os.chdir(work_dir)
+    os.makedirs('data', exist_ok=True)
+    output_dir = os.path.join(work_dir, 'output')
+    log_file = os.path.join(work_dir, 'soak.log')
+    accounts = [(f"soak{i}", 'soak-password') for i in range(args.accounts)]
+
+    users = make_users(args.users)
+    api = MockApi(users=users, latency=args.latency).start()
+    mock = MockPass(users=users, groups=args.groups, latency=args.latency,
+                    session_requests=args.session_requests).start()
+    Config.BASE_API_URL = api.url
+    Config.PASS_BASE_URL = mock.url
+    Config.CAS_BASE_URL = mock.cas_url
+    Config.OUTPUT_DIR = output_dir
+    Config.SESSION_DIR = os.path.join(work_dir, 'session')
+    Config.PASS_ACCOUNTS_FILE = os.path.join(work_dir, 'pass_accounts.txt')
+    with open(Config.PASS_ACCOUNTS_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(f"{username}:{password}\n" for username, password in accounts)
+    Config.RUN_DEADLINE_MINUTES = args.max_minutes
+    Config.LOG_LEVEL = args.log_level
+    Config.LOG_JSON = False
+    os.makedirs(output_dir, exist_ok=True)
+    setup_logging_from_config(log_file=log_file)
+    set_backend(Config.JSON_BACKEND)
+
+    sampler = Sampler(args.interval, {'output': output_dir, 'data': os.path.join(work_dir, 'data'), 'log': log_file})
+    process_user_supervised = TransatPassScraper.process_user_supervised
+
+    def timed(scraper, user, *rest, **kwargs):
+        started = time.monotonic()
+        success = False
+        try:
+            entry = process_user_supervised(scraper, user, *rest, **kwargs)
+            success = True
+            return entry
+        finally:
+            sampler.record_user(user.get('id'), time.monotonic() - started, success)
+
+    TransatPassScraper.process_user_supervised = timed
+    driver_factory, scraper = run_scraper.create_scraper()
+    runs = []
+    sampler.start()
+    try:
+        for round_number in range(args.rounds):
+            result = scraper.run_full_scrape(*accounts[0], accounts=accounts[1:])
+            if 'error' in result:
+                raise SystemExit(f"Round {round_number + 1} failed: {result['error']}")
+            run_scraper.save_results(result, output_dir)
+            runs.append({'success': result['success'], 'failed': result['failed'],
+                         'deferred': len(result.get('deferred') or []), 'browser': result.get('browser'),
+                         'accounts': result.get('accounts')})
+            print(f"Round {round_number + 1}/{args.rounds}: {result['success']} users, {result['failed']} failed")
+    finally:
+        scraper.close()
+        driver_factory.close()
+        sampler.stop()
+        TransatPassScraper.process_user_supervised = process_user_supervised
+        api.stop()
+        mock.stop()
+    return {'samples': sampler.samples, 'latencies': sampler.latencies, 'runs': runs,
+            'mock_pass': mock.summary(), 'api_requests': len(api.requests)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak benchmark of the scraper against local PASS and API stand-ins.")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--groups', type=int, default=12, help="Groups of users sharing an agenda")
+    parser.add_argument('--accounts', type=int, default=1, help="PASS accounts (browsers) scraping in parallel")
+    parser.add_argument('--rounds', type=int, default=1, help="Runs over the user list with the same scraper")
+    parser.add_argument('--latency', type=float, default=0.02, help="Delay added to every mock response (seconds)")
+    parser.add_argument('--session-requests', type=int, default=0,
+                        help="PASS pages after which a mock session expires (0: never)")
+    parser.add_argument('--interval', type=float, default=10.0, help="Seconds between samples")
+    parser.add_argument('--max-minutes', type=float, default=0.0,
+                        help="Stop admitting users after this long (RUN_DEADLINE_MINUTES), 0 for no limit")
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--work-dir', help="Working directory (default: a new temporary one)")
+    parser.add_argument('--report', help="Report file (default: soak_report.json in the working directory)")
+    parser.add_argument('--analyze', metavar='REPORT', help="Check a saved report again instead of running")
+    parser.add_argument('--warmup', type=float, default=0.2, help="Fraction of the users left out of the fits")
+    parser.add_argument('--max-rss-growth', type=float, default=50.0, help="MB per 1000 users")
+    parser.add_argument('--max-chrome-rss-growth', type=float, default=100.0, help="MB per 1000 users")
+    parser.add_argument('--max-fd-growth', type=float, default=10.0, help="File descriptors per 1000 users")
+    parser.add_argument('--max-thread-growth', type=float, default=5.0, help="Threads per 1000 users")
+    parser.add_argument('--max-disk-per-user', type=float, default=200.0, help="KB written to output or data per user")
+    parser.add_argument('--max-latency-decay', type=float, default=1.25)
+    parser.add_argument('--min-throughput-ratio', type=float, default=0.8)
+    args = parser.parse_args()
+    limits = {name: getattr(args, name) for name in ('warmup', 'max_rss_growth', 'max_chrome_rss_growth', 'max_fd_growth',
+                                                     'max_thread_growth', 'max_disk_per_user', 'max_latency_decay',
+                                                     'min_throughput_ratio')}
+
+    if args.analyze:
+        with open(args.analyze, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        report_path = None
+    else:
+        work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix='transat-soak-'))
+        os.makedirs(work_dir, exist_ok=True)
+        report_path = os.path.abspath(args.report) if args.report else os.path.join(work_dir, 'soak_report.json')
+        print(f"Soak run of {args.users} users x {args.rounds} round(s) in {work_dir}")
+        report = run_soak(args, work_dir)
+        report['options'] = vars(args)
+
+    report['limits'] = limits
+    report['checks'] = analyze(report['samples'], report['latencies'], limits)
+    print_report(report)
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {report_path}")
+    if any(check['ok'] is False for check in report['checks']):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Check of the paged, conditional user-list fetching against the local mock API.
+
+Runs ApiClient.iter_users three times over the same cache file: a cold fetch (every page
+downloaded), an unchanged list (every page answered 304) and a list with one user edited
+(only that page downloaded again). Also compares the time to the first user with the time
+to the whole list, which is how long processing used to wait before starting. Finally checks
+that the listing ends when the API ignores the page parameter (every page is the first one),
+and after USERS_MAX_PAGES pages, and that an expired token does not cut the listing.
+
+Usage:
+    python tools/users_fetch_check.py [--users 1000] [--page-size 100] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_client import ApiClient
+from mock_api import MockApi, make_users
+
+def fetch(api, cache_file, page_size):
+    client = ApiClient(base_api_url=api.url, users_cache_file=cache_file)
+    client.authenticate('scraper@example.com', 'secret')
+    start = time.monotonic()
+    users = client.iter_users(page_size=page_size)
+    first = next(users)
+    time_to_first = time.monotonic() - start
+    all_users = [first, *users]
+    return all_users, time_to_first, time.monotonic() - start, dict(client.users_fetch_stats)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check paged and conditional user-list fetching.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help="Mock API delay per response (seconds)")
+    args = parser.parse_args()
+
+    api = MockApi(users=make_users(args.users), latency=args.latency).start()
+    # The listing ends on the first short page (empty when the last page is full).
+    pages = args.users // args.page_size + 1
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, 'users_cache.json')
+
+            users, first, total, stats = fetch(api, cache_file, args.page_size)
+            assert users == api.users, "Paged listing differs from the user list"
+            assert stats['pages'] == pages and stats['not_modified'] == 0, stats
+            print(f"cold:      first user after {first * 1000:.0f} ms, whole list after {total * 1000:.0f} ms, {stats}")
+
+            users, first, total, stats = fetch(api, cache_file, args.page_size)
+            assert users == api.users, "Cached listing differs from the user list"
+            assert stats['not_modified'] == pages and stats['bytes'] == 0, stats
+            print(f"unchanged: first user after {first * 1000:.0f} ms, whole list after {total * 1000:.0f} ms, {stats}")
+
+            api.users[args.users // 2]['pass_id'] = 123456
+            users, first, total, stats = fetch(api, cache_file, args.page_size)
+            assert users == api.users, "Listing misses the edited user"
+            assert stats['not_modified'] == pages - 1, stats
+            print(f"one edit:  first user after {first * 1000:.0f} ms, whole list after {total * 1000:.0f} ms, {stats}")
+
+            # An API ignoring ?page= answers page 2 with page 1: the listing ends there, without duplicates.
+            api.ignore_page = True
+            users, _, _, stats = fetch(api, os.path.join(tmp, 'ignored_cache.json'), args.page_size)
+            assert users == api.users[:args.page_size] and stats['pages'] == 2, stats
+            api.ignore_page = False
+            print(f"no paging: listing ended after {stats['pages']} pages with {len(users)} distinct users")
+
+            client = ApiClient(base_api_url=api.url, users_cache_file=os.path.join(tmp, 'capped_cache.json'))
+            client.authenticate('scraper@example.com', 'secret')
+            users = list(client.iter_users(page_size=args.page_size, max_pages=3))
+            assert len(users) == 3 * args.page_size and client.users_fetch_stats['pages'] == 3
+            assert not os.path.exists(os.path.join(tmp, 'capped_cache.json')), "A cut listing replaced the cache"
+            print(f"capped:    listing cut after 3 pages ({len(users)} users)")
+
+            # The token expires while the first users are processed: later pages authenticate again.
+            client = ApiClient(base_api_url=api.url, users_cache_file=os.path.join(tmp, 'expired_cache.json'))
+            client.authenticate('scraper@example.com', 'secret')
+            users = client.iter_users(page_size=args.page_size)
+            listed = [next(users)]
+            client.token = 'expired'
+            listed.extend(users)
+            assert listed == api.users, "Listing cut by an expired token"
+            print(f"expired:   token renewed during the listing ({len(listed)} users)")
+    finally:
+        api.stop()
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local multi-process check of the sharded run work queue (no browser, no API).
+
+Enqueues synthetic users, runs several worker processes against the same SQLite file
+(one of them dies while holding a lease, so its user must be reclaimed), then checks that
+the merged results match a single-node run over the same users. Finally checks that a user whose
+every lease expires is marked failed once its attempts are exhausted.
+
+Usage:
+    python tools/work_queue_smoke.py [--users 200] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import WorkQueue
+
+RUN_ID = 'smoke'
+LEASE_SECONDS = 2
+
+def fake_process_user(user):
+    """Deterministic stand-in for TransatPassScraper.process_user."""
+    if user['id'] % 17 == 0:
+        raise Exception(f"Failed at step 6: synthetic failure for user {user['id']}")
+    return {'url': f"profile/{user['id']}", 'scraped_at': '2025-01-01 06:00:00',
+            'planning': [{'title': f"Course {user['id']}"}], 'incomplete_weeks': []}
+
+def single_node_results(users):
+    """What run_full_scrape would report for the same users."""
+    results = {'processed': 0, 'success': 0, 'failed': 0, 'failures': [], 'all_plannings': {}}
+    for user in users:
+        results['processed'] += 1
+        try:
+            results['all_plannings'][user['id']] = fake_process_user(user)
+            results['success'] += 1
+        except Exception as e:
+            results['failed'] += 1
+            results['failures'].append({'user_id': user['id'], 'name': f"{user['first_name']} {user['last_name']}", 'error': str(e)})
+    return results
+
+def worker(queue_path, worker_id, crash_after=None):
+    work_queue = WorkQueue(queue_path, lease_seconds=LEASE_SECONDS, max_attempts=2)
+    handled = 0
+    while True:
+        user = work_queue.claim(RUN_ID, worker_id)
+        if user is None:
+            if work_queue.is_finished(RUN_ID):
+                return
+            time.sleep(0.2)
+            continue
+        if crash_after is not None and handled == crash_after:
+            os._exit(1)  # Die while holding the lease.
+        handled += 1
+        with work_queue.lease_heartbeat(RUN_ID, user['id'], worker_id):
+            time.sleep(0.005)
+            try:
+                entry = fake_process_user(user)
+            except Exception as e:
+                work_queue.fail(RUN_ID, user['id'], worker_id, str(e))
+                continue
+        work_queue.complete(RUN_ID, user['id'], worker_id, entry)
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process smoke test of the work queue.")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    users = [{'id': i, 'first_name': f"First{i}", 'last_name': f"Last{i}"} for i in range(1, args.users + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_path = os.path.join(tmp, 'work_queue.sqlite')
+        work_queue = WorkQueue(queue_path, lease_seconds=LEASE_SECONDS, max_attempts=2)
+        work_queue.enqueue(RUN_ID, users)
+
+        processes = [multiprocessing.Process(target=worker, args=(queue_path, 'crashing', 3))]
+        processes += [multiprocessing.Process(target=worker, args=(queue_path, f"worker-{i}"))
+                      for i in range(args.workers - 1)]
+        start = time.monotonic()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        merged = work_queue.merged_results(RUN_ID)
+        # SQLite round-trips the plannings through JSON: compare with string user ids.
+        expected = single_node_results(users)
+        expected['all_plannings'] = {str(k): v for k, v in expected['all_plannings'].items()}
+        merged['all_plannings'] = {str(k): v for k, v in merged['all_plannings'].items()}
+        if merged != expected:
+            raise SystemExit("Merged results differ from the single-node run.")
+        print(f"OK: {args.users} users over {args.workers} processes in {time.monotonic() - start:.1f}s, "
+              f"merged results match the single-node run.")
+
+        # A user whose leases keep expiring (it crashes every worker) is failed after max_attempts claims.
+        work_queue = WorkQueue(queue_path, lease_seconds=0, max_attempts=2)
+        work_queue.enqueue('poison', users[:1])
+        claims = 0
+        while work_queue.claim('poison', 'doomed') is not None:
+            claims += 1
+            time.sleep(0.01)
+        if claims != 2 or work_queue.progress('poison')['failed'] != 1:
+            raise SystemExit(f"Poison user claimed {claims} times: {work_queue.progress('poison')}")
+        print("OK: a user whose leases keep expiring is failed after 2 claims.")
+
+        # A failure once step 8 has started is final: the user is not handed to another worker.
+        work_queue = WorkQueue(queue_path, max_attempts=3)
+        work_queue.enqueue('posted', users[:1])
+        work_queue.claim('posted', 'poster')
+        work_queue.fail('posted', users[0]['id'], 'poster', 'failed during step 8', final=True)
+        if work_queue.claim('posted', 'other') is not None or work_queue.progress('posted')['failed'] != 1:
+            raise SystemExit(f"User failed during step 8 was claimed again: {work_queue.progress('posted')}")
+        print("OK: a user failed during step 8 is not claimed again.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from logging_setup import current_log_context
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+class RoundTripBudgetExceeded(AssertionError):
+    """A step sent more WebDriver commands than its budget allows."""
+
+def parse_budgets(spec: str) -> dict:
+    """Parse "step5=200,step6=3000" into {step: max commands}."""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        step, _, limit = item.partition('=')
+        budgets[step.strip()] = int(limit)
+    return budgets
+
+def _summary(by_step: dict, by_command: dict) -> dict:
+    """Summary of {step: [count, seconds]} and {command: [count, seconds]} totals, busiest first."""
+    as_dict = lambda totals: {key: {'count': count, 'seconds': round(seconds, 3)}
+                              for key, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][0])}
+    return {
+        'commands': sum(count for count, _ in by_step.values()),
+        'seconds': round(sum(seconds for _, seconds in by_step.values()), 3),
+        'by_step': as_dict(by_step),
+        'by_command': as_dict(by_command),
+    }
+
+class WebDriverCommandStats:
+    def __init__(self):
+        """
+        Count and time of the WebDriver commands (HTTP round-trips to chromedriver), by step and command.
+
+        The step is read from the log context of the calling thread (see logging_setup.log_context),
+        '-' outside of any step.
+        """
+        self._lock = threading.Lock()
+        # (step, command) -> [count, total seconds]
+        self._stats = defaultdict(lambda: [0, 0.0])
+
+    def record(self, command: str, seconds: float):
+        step = current_log_context().get('step') or '-'
+        with self._lock:
+            entry = self._stats[(step, command)]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def snapshot(self) -> dict:
+        """Copy of the counters, to diff against later (see counts_since)."""
+        with self._lock:
+            return {key: tuple(entry) for key, entry in self._stats.items()}
+
+    def counts_since(self, snapshot: dict) -> dict:
+        """Commands sent per step since the snapshot was taken."""
+        counts = defaultdict(int)
+        for key, (count, _) in self.snapshot().items():
+            counts[key[0]] += count - snapshot.get(key, (0, 0.0))[0]
+        return {step: count for step, count in counts.items() if count}
+
+    def summary(self) -> dict:
+        """Totals for the run metadata: overall, by step and by command (count and seconds)."""
+        by_step, by_command = defaultdict(lambda: [0, 0.0]), defaultdict(lambda: [0, 0.0])
+        for (step, command), (count, seconds) in self.snapshot().items():
+            for entry in (by_step[step], by_command[command]):
+                entry[0] += count
+                entry[1] += seconds
+        return _summary(by_step, by_command)
+
+def merge_summaries(summaries) -> dict:
+    """Sum WebDriverCommandStats.summary() outputs (one per browser) into one summary of the same shape."""
+    by_step, by_command = defaultdict(lambda: [0, 0.0]), defaultdict(lambda: [0, 0.0])
+    for summary in summaries:
+        for totals, key in ((by_step, 'by_step'), (by_command, 'by_command')):
+            for name, entry in summary[key].items():
+                totals[name][0] += entry['count']
+                totals[name][1] += entry['seconds']
+    return _summary(by_step, by_command)
+
+def instrument_driver(driver, stats: WebDriverCommandStats):
+    """
+    Route every command of the driver (elements included: they go through driver.execute)
+    through stats. Instrumenting an already instrumented driver only switches its stats.
+    """
+    if not hasattr(driver, '_command_stats'):
+        execute = driver.execute
+
+        def counted_execute(driver_command, params=None):
+            started = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                driver._command_stats.record(driver_command, time.perf_counter() - started)
+
+        driver.execute = counted_execute
+    driver._command_stats = stats
+    return driver
+
+@contextmanager
+def round_trip_budget(stats: WebDriverCommandStats, budgets: dict, strict=True):
+    """
+    Check the WebDriver commands sent per step during the block against budgets ({step: max commands}).
+    The check also runs when the block raises (a failed user's commands are counted too); an exceeded
+    budget is then only logged, so the block's own exception is the one raised.
+
+    Args:
+        strict (bool): Raise RoundTripBudgetExceeded (tests) instead of logging a warning (runs)
+    """
+    snapshot = stats.snapshot()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        _check_budgets(stats.counts_since(snapshot), budgets, strict and not failed)
+
+def _check_budgets(counts: dict, budgets: dict, strict: bool):
+    """Raise RoundTripBudgetExceeded (strict) or log a warning for the steps over budget."""
+    exceeded = {step: (counts[step], limit) for step, limit in budgets.items() if counts.get(step, 0) > limit}
+    if exceeded:
+        message = ", ".join(f"{step}: {count} commands (budget {limit})" for step, (count, limit) in exceeded.items())
+        if strict:
+            raise RoundTripBudgetExceeded(message)
+        logger.warning("WebDriver round-trip budget exceeded: %s", message)
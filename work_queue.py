@@ -0,0 +1,253 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+# Set up a logger for this module. It will inherit the root logger's configuration.
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    user_json TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_json TEXT,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (run_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS leases_claim ON leases (run_id, status, seq);
+CREATE TABLE IF NOT EXISTS workers (
+    run_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (run_id, worker_id)
+);
+"""
+
+def _json_default(obj):
+    """Serialize the datetimes of plannings like save_results does."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+class WorkQueue:
+    def __init__(self, path: str, lease_seconds: int = 600, max_attempts: int = 3):
+        """
+        Work queue of users to scrape, shared by the containers of a sharded run through an SQLite file.
+
+        A coordinator enqueues the users of a run; workers claim one user at a time under a lease,
+        renew it with heartbeats while scraping, then complete or fail it. Leases that are not
+        renewed in time (worker crashed or stuck) are handed out again.
+
+        Args:
+            path (str): SQLite database file, on a volume shared by every container.
+            lease_seconds (int): Time a claimed user stays reserved without a heartbeat.
+            max_attempts (int): Claims of a user before its failure is final.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads and processes.
+        # isolation_level=None lets BEGIN IMMEDIATE take the write lock before reading.
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, run_id: str, users: list):
+        """Register a run and its users, in processing order."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO runs (run_id, created_at, total) VALUES (?, ?, ?)",
+                         (run_id, time.time(), len(users)))
+            conn.executemany(
+                "INSERT OR IGNORE INTO leases (run_id, seq, user_id, user_json) VALUES (?, ?, ?, ?)",
+                [(run_id, seq, str(user.get('id')), json.dumps(user)) for seq, user in enumerate(users)]
+            )
+            conn.execute("COMMIT")
+        logger.info("Enqueued %s users for run %s.", len(users), run_id)
+
+    def latest_run_id(self, created_after: float = 0.0):
+        """The most recently enqueued run, or None (also if it was enqueued before created_after, a timestamp)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT run_id FROM runs WHERE created_at > ? ORDER BY created_at DESC LIMIT 1",
+                               (created_after,)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, run_id: str, worker_id: str):
+        """
+        Lease the next pending user, or a user whose lease expired. An expired lease counts as a failed
+        attempt: a user whose claims are exhausted (max_attempts, e.g. a user crashing every worker)
+        is marked failed instead of being handed out again.
+
+        Returns:
+            dict: The user, or None if nothing is claimable right now.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            exhausted = conn.execute(
+                "UPDATE leases SET status = 'failed', lease_expires = NULL, updated_at = ?, "
+                "error = COALESCE(error, 'Lease expired on every attempt (worker crashed or stuck)') "
+                "WHERE run_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, run_id, now, self.max_attempts)
+            ).rowcount
+            row = conn.execute(
+                "SELECT user_id, user_json, status, worker_id FROM leases "
+                "WHERE run_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ? AND attempts < ?)) "
+                "ORDER BY seq LIMIT 1",
+                (run_id, now, self.max_attempts)
+            ).fetchone()
+            if exhausted:
+                logger.warning("%s user(s) failed after their last lease expired (%s attempts).",
+                               exhausted, self.max_attempts)
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            user_id, user_json, status, previous_worker = row
+            conn.execute(
+                "UPDATE leases SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE run_id = ? AND user_id = ?",
+                (worker_id, now + self.lease_seconds, now, run_id, user_id)
+            )
+            conn.execute("COMMIT")
+        if status == 'leased':
+            logger.warning("Reclaimed expired lease on user %s from worker %s.", user_id, previous_worker)
+        return json.loads(user_json)
+
+    def register_worker(self, run_id: str, worker_id: str) -> int:
+        """
+        Record that a worker is active in a run.
+
+        Returns:
+            int: Workers of the run seen within the last lease_seconds (this one included).
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (run_id, worker_id, seen_at) VALUES (?, ?, ?)",
+                         (run_id, worker_id, now))
+            return conn.execute("SELECT COUNT(*) FROM workers WHERE run_id = ? AND seen_at >= ?",
+                                (run_id, now - self.lease_seconds)).fetchone()[0]
+
+    def unregister_worker(self, run_id: str, worker_id: str):
+        """A worker leaves the run: its share of PASS goes back to the others."""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM workers WHERE run_id = ? AND worker_id = ?", (run_id, worker_id))
+
+    def heartbeat(self, run_id: str, user_id, worker_id: str) -> bool:
+        """
+        Extend the lease of a claimed user.
+
+        Returns:
+            bool: False if the lease was lost (expired and claimed by another worker).
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET lease_expires = ?, updated_at = ? "
+                "WHERE run_id = ? AND user_id = ? AND worker_id = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, run_id, str(user_id), worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, run_id: str, user_id, worker_id: str, result: dict) -> bool:
+        """Store the result of a claimed user. Returns False if the lease was lost meanwhile."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET status = 'done', result_json = ?, error = NULL, updated_at = ? "
+                "WHERE run_id = ? AND user_id = ? AND worker_id = ? AND status = 'leased'",
+                (json.dumps(result, default=_json_default), time.time(), run_id, str(user_id), worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, run_id: str, user_id, worker_id: str, error: str, final: bool = False) -> bool:
+        """
+        Record a failed attempt: the user goes back to pending until max_attempts is reached.
+        With final=True the user is marked failed right away (a retry would not be safe).
+        """
+        max_attempts = 0 if final else self.max_attempts
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE run_id = ? AND user_id = ? AND worker_id = ? AND status = 'leased'",
+                (max_attempts, error, time.time(), run_id, str(user_id), worker_id)
+            )
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def lease_heartbeat(self, run_id: str, user_id, worker_id: str):
+        """Renew the lease of a claimed user in the background for the duration of the block."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.heartbeat(run_id, user_id, worker_id):
+                    logger.warning("Lost the lease on user %s, another worker may process it.", user_id)
+                    return
+
+        thread = threading.Thread(target=beat, name=f"lease-heartbeat-{user_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def progress(self, run_id: str) -> dict:
+        """Number of users per status for a run."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM leases WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self, run_id: str) -> bool:
+        counts = self.progress(run_id)
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def merged_results(self, run_id: str) -> dict:
+        """
+        Merge the per-user outcomes of a run into the results of a single-node run_full_scrape.
+        """
+        results = {
+            'processed': 0,
+            'success': 0,
+            'failed': 0,
+            'failures': [],
+            'all_plannings': {}
+        }
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT user_json, status, result_json, error FROM leases WHERE run_id = ? ORDER BY seq",
+                (run_id,)
+            ).fetchall()
+        for user_json, status, result_json, error in rows:
+            user = json.loads(user_json)
+            user_id = user.get('id')
+            results['processed'] += 1
+            if status == 'done':
+                results['all_plannings'][user_id] = json.loads(result_json)
+                results['success'] += 1
+            else:
+                name = f"{user.get('first_name', '').strip()} {user.get('last_name', '').strip()}"
+                results['failed'] += 1
+                results['failures'].append({'user_id': user_id, 'name': name, 'error': error or f"Not processed ({status})"})
+        return results